@@ -0,0 +1,6 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .data import School
+from .server import Firefly, serve
+from .harness import Harness, Report
@@ -0,0 +1,131 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import json
+import shlex
+from typing import List, Dict
+from .data import School
+from .harness import Harness, Report
+from .parsers import compare, PARSERS
+from . import exports
+from .server import Firefly, serve, directory_page, SERVERS
+from firefly.transport import TRANSPORTS
+from argparse import ArgumentParser as ArgumentsParser, Namespace as Arguments
+
+# Commands run when none are given
+DEFAULT_COMMANDS: List[str] = [
+    'timetable',
+    'tasks',
+    'teachers search --surname smith',
+]
+
+# Add the options shared by every subcommand for tuning the simulated server
+def add_server_arguments(parser: ArgumentsParser):
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean seconds added to every response. Defaults to 0.05.')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Maximum seconds either side of --latency. Defaults to 0.02.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503. Defaults to 0.')
+    parser.add_argument('--capacity', type=int, help='Requests handled at once, beyond which requests are answered with 429 and a Retry-After of 1 second. Unlimited by default.')
+    parser.add_argument('--session-ttl', type=float, help='Idle seconds after which sessions expire. Sessions never expire by default.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated school data. Defaults to 0.')
+    parser.add_argument('--rota', type=int, default=2, help='Length of the timetable rota in weeks. Defaults to 2.')
+    parser.add_argument('--server', choices=SERVERS, default='wsgiref', help='Server to serve the simulated Firefly with. Hypercorn speaks HTTP/2 as well as HTTP/1.1, and needs `pip install hypercorn`. Defaults to wsgiref.')
+
+# Create the simulated server app from the arguments
+def create_app(args: Arguments) -> Firefly:
+    return Firefly(
+        school=School(seed=args.seed, rota=args.rota),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        session_ttl=args.session_ttl,
+        capacity=args.capacity
+    )
+
+# Serve the simulated Firefly until interrupted
+def serve_forever(args: Arguments):
+    server = serve(create_app(args), args.host, args.port, args.server)
+    print('Serving simulated Firefly on http://%s:%d (username `student`, password `password`)' % server.server_address, flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# Run ff commands against the simulated Firefly and report the latency
+def run(args: Arguments):
+    reports: List[Report] = []
+
+    for transport in args.transport:
+        with Harness(create_app(args), config={'firefly': {'transport': transport}}, server=args.server) as harness:
+            for command in args.commands or DEFAULT_COMMANDS:
+                report: Report = harness.run(shlex.split(command), runs=args.runs, concurrency=args.concurrency)
+                reports.append(report)
+
+                if not args.json:
+                    print(report, flush=True)
+
+    if args.json:
+        print(json.dumps([report.to_dict() for report in reports], indent=2))
+
+# Time the directory parsers on pages of increasing size
+def parse(args: Arguments):
+    for staff in args.staff:
+        timings = compare(staff, args.runs, args.seed)
+        print('%d staff, %d KB' % (staff, len(directory_page(School(seed=args.seed, staff=staff, tasks=0).staff)) // 1024))
+
+        for name in PARSERS:
+            print('  %-14s %7.1fms (%.1fx)' % (name, timings[name] * 1000, timings['beautifulsoup'] / timings[name]))
+
+# Check a timetable export that samples the rota against a full one
+def export(args: Arguments):
+    # Each export starts with an empty cache, but reuses the weeks it has already retrieved, as it would for real
+    with Harness(create_app(args), config={'cache': {'lessons': '43200'}}, server=args.server) as harness:
+        result: Dict[str, int] = exports.compare(harness, args.from_date, args.until_date, args.every)
+
+    sampled: str = 'one week in %d' % args.every
+
+    print('%d week rota, %d events' % (args.rota, result['events']))
+    print('  %-28s %3d requests' % ('full', result['full_requests']))
+    print('  %-28s %3d requests' % ('full, remembered', result['remembered_full_requests']))
+    print('  %-28s %3d requests, %d events missing, %d extra' % (sampled, result['smart_requests'], result['missing'], result['extra']))
+    print('  %-28s %3d requests, %d events missing, %d extra' % (sampled + ', remembered', result['remembered_smart_requests'], result['remembered_missing'], result['remembered_extra']))
+
+parser: ArgumentsParser = ArgumentsParser(prog='python -m bench', description='Simulated Firefly server and ff load harness')
+subparsers = parser.add_subparsers()
+
+serve_parser: ArgumentsParser = subparsers.add_parser('serve', description='Serve a simulated Firefly')
+serve_parser.add_argument('--host', default='127.0.0.1', help='The interface to listen on. Defaults to 127.0.0.1.')
+serve_parser.add_argument('--port', type=int, default=8080, help='The port to listen on. Defaults to 8080.')
+add_server_arguments(serve_parser)
+serve_parser.set_defaults(func=serve_forever)
+
+run_parser: ArgumentsParser = subparsers.add_parser('run', description='Run ff commands against a simulated Firefly and report p50/p95/p99 latency and throughput')
+run_parser.add_argument('commands', nargs='*', metavar='COMMAND', help='Quoted ff command lines, e.g. "timetable -d tomorrow". Defaults to a mix of timetable, tasks and directory commands.')
+run_parser.add_argument('--runs', type=int, default=20, help='Invocations per command. Defaults to 20.')
+run_parser.add_argument('--concurrency', type=int, default=1, help='Invocations run at once. Defaults to 1.')
+run_parser.add_argument('--json', action='store_true', help='Print the reports as JSON.')
+run_parser.add_argument('--transport', type=lambda names: names.split(','), default=['http1'], metavar='TRANSPORT,...', help='Comma separated transports to run the commands over in turn, out of %s, so they can be compared. HTTP/2 needs --server hypercorn. Defaults to http1.' % ', '.join(TRANSPORTS))
+add_server_arguments(run_parser)
+run_parser.set_defaults(func=run)
+
+parse_parser: ArgumentsParser = subparsers.add_parser('parse', description='Check the streaming directory parser agrees with BeautifulSoup on large results pages, and time both')
+parse_parser.add_argument('--staff', type=lambda counts: [int(count) for count in counts.split(',')], default=[100, 1000, 5000], metavar='COUNT,...', help='Comma separated numbers of staff to list on the pages. Defaults to 100,1000,5000.')
+parse_parser.add_argument('--runs', type=int, default=5, help='Times to parse each page. Defaults to 5.')
+parse_parser.add_argument('--seed', type=int, default=0, help='Seed for the generated staff. Defaults to 0.')
+parse_parser.set_defaults(func=parse)
+
+export_parser: ArgumentsParser = subparsers.add_parser('export', description='Check timetable exports that sample the rota against full exports, and count the requests each makes before and after learning the term boundaries')
+add_server_arguments(export_parser)
+export_parser.add_argument('--from', dest='from_date', default='2020-09-07', metavar='FROM', help='The date to export from. Defaults to 2020-09-07, the start of a school year.')
+export_parser.add_argument('--until', dest='until_date', metavar='UNTIL', help='The date to export until. Defaults to the end of the school year, which the exports search for.')
+export_parser.add_argument('--every', type=int, default=4, metavar='WEEKS', help='Sample one week in every WEEKS. Defaults to 4.')
+export_parser.set_defaults(func=export)
+
+args: Arguments = parser.parse_args()
+
+if hasattr(args, 'func'):
+    args.func(args)
+else:
+    parser.print_help()
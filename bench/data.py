@@ -0,0 +1,202 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import random
+from uuid import UUID
+from typing import List, Dict, Tuple
+from datetime import date as Date, time as Time, datetime as DateTime, timedelta as TimeDelta
+
+# Daily periods as (start, end) times. Break falls after P2 and lunch after P4.
+PERIODS: List[Tuple[Time, Time]] = [
+    (Time(8, 50), Time(9, 50)),
+    (Time(9, 50), Time(10, 45)),
+    (Time(11, 10), Time(12)),
+    (Time(12), Time(12, 55)),
+    (Time(14), Time(15)),
+]
+# Break, which Firefly reports as part of the preceding free period
+BREAK: Tuple[Time, Time] = (Time(10, 45), Time(11, 10))
+# Weeks of the academic year (counting from the first Monday of September) that are holidays
+HOLIDAYS: List[int] = [7, 15, 16, 22, 28, 29, 35] + list(range(42, 53))
+
+SUBJECTS: List[str] = ['Maths', 'Physics', 'Chemistry', 'Biology', 'English', 'History', 'Geography', 'French', 'Computing', 'Music']
+SURNAMES: List[str] = ['Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson', 'Davies', 'Robinson', 'Wright',
+                       'Thompson', 'Evans', 'Walker', 'White', 'Roberts', 'Green', 'Hall', 'Wood', 'Jackson', 'Clarke']
+FORENAMES: List[str] = ['Alex', 'Sam', 'Jo', 'Chris', 'Pat', 'Charlie', 'Robin', 'Jamie', 'Morgan', 'Taylor']
+
+# Deterministic fake school used by the simulated Firefly server
+class School():
+    # Create an instance
+    def __init__(self, seed: int = 0, staff: int = 300, tasks: int = 500, rota: int = 2, today: Date = None):
+        self._random: random.Random = random.Random(seed)
+        self.today: Date = today or Date.today()
+        self.rota: int = rota
+        self.user: Dict = {
+            '@guid': self._guid(),
+            '@fullname': 'Test Student',
+            '@role': 'student'
+        }
+        self.staff: List[Dict] = [self._teacher(i) for i in range(staff)]
+        self.classes: List[Dict] = [
+            {'guid': self._guid(), 'name': '11%s/%s' % (self._random.choice('XY'), subject[:2]), 'isGroup': True, 'subject': subject}
+            for subject in SUBJECTS
+        ]
+        self.setters: Dict[str, Dict] = {cls['guid']: self._random.choice(self.staff[:40]) for cls in self.classes}
+        self.timetable: List[List[List[Dict]]] = [self._week() for _ in range(rota)]
+        self.tasks: List[Dict] = [self._task(i) for i in range(tasks)]
+        # Files are drawn separately, so adding them didn't change the rest of the data
+        files_random: random.Random = random.Random(seed + 1)
+        # File names and sizes by resource ID. Worksheets are shared by the tasks of a subject.
+        self.resources: Dict[int, Tuple[str, int]] = {}
+        # Resource IDs of the files set with each task and submitted for it, by task ID
+        self.task_files: Dict[int, Dict[str, List[int]]] = {
+            task['id']: self._task_files(task, files_random) for task in self.tasks
+        }
+
+    # Generate a GUID
+    def _guid(self) -> str:
+        return str(UUID(int=self._random.getrandbits(128)))
+
+    # Generate a member of staff
+    def _teacher(self, i: int) -> Dict:
+        surname: str = SURNAMES[i % len(SURNAMES)]
+        forename: str = FORENAMES[(i // len(SURNAMES)) % len(FORENAMES)]
+
+        return {
+            'guid': self._guid(),
+            'name': 'Mx %s %s' % (forename, surname),
+            'surname': surname,
+            'picture': '/images/staff/%d.jpg' % i,
+            'roles': self._random.sample(['Teacher', 'Head of Year', 'Form Tutor', 'Head of Department'], self._random.randint(1, 2)),
+            'departments': self._random.sample(SUBJECTS, self._random.randint(1, 2)),
+            'phone': '01234 %06d' % i,
+            'email': '%s.%s%d@school.example' % (forename.lower(), surname.lower(), i)
+        }
+
+    # Generate the lessons for each day of a rota week
+    def _week(self) -> List[List[Dict]]:
+        week: List[List[Dict]] = []
+
+        for _ in range(5):
+            day: List[Dict] = []
+
+            for start, end in PERIODS:
+                if self._random.random() < 0.15:
+                    # Free period
+                    day.append(None)
+                    continue
+
+                cls: Dict = self._random.choice(self.classes)
+
+                day.append({
+                    'start': start,
+                    'end': end,
+                    'subject': cls['subject'],
+                    'chairperson': self.setters[cls['guid']]['name'],
+                    'location': '%s%d' % (self._random.choice('ABCDS'), self._random.randint(1, 20))
+                })
+
+            week.append(day)
+
+        return week
+
+    # Generate a task
+    def _task(self, i: int) -> Dict:
+        cls: Dict = self._random.choice(self.classes)
+        setter: Dict = self.setters[cls['guid']]
+        set_date: Date = self.today - TimeDelta(days=self._random.randint(0, 365))
+        due_date: Date = set_date + TimeDelta(days=self._random.randint(1, 21))
+
+        return {
+            'id': 1000 + i,
+            'title': '%s homework %d' % (cls['subject'], i),
+            'addressees': [{'guid': cls['guid'], 'name': cls['name'], 'isGroup': True}],
+            'setter': {'guid': setter['guid'], 'name': setter['name'], 'deleted': False, 'sortKey': setter['surname']},
+            'setDate': set_date.isoformat(),
+            'dueDate': due_date.isoformat(),
+            'isDone': due_date < self.today and self._random.random() < 0.8,
+            'isUnread': self._random.random() < 0.2,
+            'archived': False,
+            'descriptionContainsQuestions': False,
+            'fileSubmissionRequired': False,
+            'hasFileSubmission': False,
+            'isExcused': False,
+            'isPersonalTask': False,
+            'isResubmissionRequired': False,
+            'lastMarkedAsDoneBy': None
+        }
+
+    # Generate the files set with a task and submitted for it
+    def _task_files(self, task: Dict, files_random: random.Random) -> Dict[str, List[int]]:
+        subject: str = task['title'].split()[0]
+        worksheets: List[int] = []
+
+        for _ in range(files_random.randint(0, 2)):
+            resource_id: int = 1 + SUBJECTS.index(subject) * 10 + files_random.randrange(5)
+            self.resources[resource_id] = ('%s worksheet %d.pdf' % (subject, resource_id % 10 + 1), 4096 * (resource_id % 7 + 1) ** 3)
+            worksheets.append(resource_id)
+
+        submissions: List[int] = []
+
+        if task['isDone'] and files_random.random() < 0.5:
+            resource_id = 1000 + task['id']
+            self.resources[resource_id] = ('Submission %d.docx' % task['id'], files_random.randint(10000, 400000))
+            submissions.append(resource_id)
+
+        return {'attachments': sorted(set(worksheets)), 'submissions': submissions}
+
+    # Get the contents of a file, which are the same every time
+    def resource(self, resource_id: int) -> bytes:
+        return random.Random(resource_id).randbytes(self.resources[resource_id][1])
+
+    # Get the first Monday of the academic year containing a date
+    def year_start(self, date: Date) -> Date:
+        year: int = date.year if date.month >= 9 else date.year - 1
+        start: Date = Date(year, 9, 1)
+
+        return start + TimeDelta(days=-start.weekday() % 7)
+
+    # Determine if a date falls in the holidays
+    def is_holiday(self, date: Date) -> bool:
+        week: int = (date - self.year_start(date)).days // 7
+
+        return date.weekday() >= 5 or week < 0 or week in HOLIDAYS
+
+    # Get the planner events for a date
+    def events(self, date: Date) -> List[Dict]:
+        if self.is_holiday(date):
+            return []
+
+        week: int = (date - self.year_start(date)).days // 7
+        events: List[Dict] = []
+
+        for i, lesson in enumerate(self.timetable[week % self.rota][date.weekday()]):
+            start, end = PERIODS[i]
+
+            if lesson is None:
+                if end == BREAK[0]:
+                    # Firefly reports a free period before break as one event ending at the end of break
+                    events.append(self._event(date, start, BREAK[1]))
+                continue
+
+            events.append(self._event(date, start, end, lesson))
+
+        return events
+
+    # Create a planner event
+    def _event(self, date: Date, start: Time, end: Time, lesson: Dict = None) -> Dict:
+        lesson = lesson or {}
+
+        return {
+            'isostartdate': DateTime.combine(date, start).isoformat(),
+            'isoenddate': DateTime.combine(date, end).isoformat(),
+            'subject': lesson.get('subject'),
+            'chairperson': lesson.get('chairperson'),
+            'location': lesson.get('location')
+        }
+
+    # Search the staff directory
+    def search(self, name: str) -> List[Dict]:
+        name = (name or '').lower()
+
+        return [teacher for teacher in self.staff if name in teacher['surname'].lower()]
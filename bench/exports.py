@@ -0,0 +1,54 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import re
+import shutil
+from pathlib import Path
+from typing import List, Dict, Set
+from .harness import Harness
+
+# Get the events in a calendar file
+def read_events(path: Path) -> Set[str]:
+    return set(re.findall(r'BEGIN:VEVENT.*?END:VEVENT', path.read_text(), re.S))
+
+# Export a timetable with a fresh cache, returning the events and the planner requests made. Term boundaries
+# learned by earlier exports are forgotten unless `remember` is set.
+def export(harness: Harness, name: str, arguments: List[str], remember: bool = False) -> (Set[str], int):
+    storage_path: Path = harness.home.joinpath('.ff-timetable')
+    shutil.rmtree(storage_path.joinpath('cache'), ignore_errors=True)
+
+    if not remember:
+        for path in storage_path.glob('**/terms.json'):
+            path.unlink()
+
+    path: Path = harness.home.joinpath(name + '.ics')
+    harness.server_stats(reset=True)
+
+    if harness.invoke(['timetable', 'export', '-o', str(path)] + arguments) != 0:
+        raise RuntimeError('ff timetable export %s failed' % ' '.join(arguments))
+
+    requests: int = sum(count for route, count in harness.server_stats().items() if route.startswith('GET /planner'))
+
+    return read_events(path), requests
+
+# Export a timetable in full and by sampling the rota, both with nothing learned and then with what the first
+# full export learned, returning the requests each took and the events the sampled exports got wrong. Without
+# an until date, the exports search for the end of the school year.
+def compare(harness: Harness, from_date: str, until_date: str, every: int) -> Dict[str, int]:
+    arguments: List[str] = ['--from', from_date] + (['--until', until_date] if until_date else [])
+    smart, smart_requests = export(harness, 'smart', arguments + ['--smart', str(every)])
+    full, full_requests = export(harness, 'full', arguments)
+    _, remembered_full_requests = export(harness, 'full', arguments, remember=True)
+    remembered_smart, remembered_smart_requests = export(harness, 'smart', arguments + ['--smart', str(every)], remember=True)
+
+    return {
+        'events': len(full),
+        'full_requests': full_requests,
+        'remembered_full_requests': remembered_full_requests,
+        'smart_requests': smart_requests,
+        'missing': len(full - smart),
+        'extra': len(smart - full),
+        'remembered_smart_requests': remembered_smart_requests,
+        'remembered_missing': len(full - remembered_smart),
+        'remembered_extra': len(remembered_smart - full)
+    }
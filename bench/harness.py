@@ -0,0 +1,198 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import List, Dict
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
+from .server import Firefly, ThreadingWSGIServer, serve, USERNAME, PASSWORD
+
+# Path to the ff script
+FF_PATH: Path = Path(__file__).resolve().parent.parent.joinpath('ff')
+
+# Namespaces of ff's result cache, as in firefly.config, which creates the storage directory when it's imported
+CACHE_NAMESPACES: List[str] = ['lessons', 'tasks', 'directory']
+
+# Timings for a batch of command invocations
+class Report():
+    # Create an instance
+    def __init__(self, command: List[str], latencies: List[float], errors: int, wall_time: float, requests: Dict[str, int], transport: str = None):
+        self.command: List[str] = command
+        # Transport ff was configured with, if not the default
+        self.transport: str = transport
+        self.latencies: List[float] = sorted(latencies)
+        self.errors: int = errors
+        self.wall_time: float = wall_time
+        # Server requests by route
+        self.requests: Dict[str, int] = requests
+
+    # Get the latency at a percentile using the nearest rank method
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return float('nan')
+
+        return self.latencies[max(0, math.ceil(p / 100 * len(self.latencies)) - 1)]
+
+    # Determine if the runs made no server requests, so only timed ff answering from its local state
+    @property
+    def is_local(self) -> bool:
+        return not self.requests
+
+    # Get the command invocations completed per second
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.wall_time if self.wall_time else float('nan')
+
+    # Convert to a JSON serialisable dict
+    def to_dict(self) -> Dict:
+        return {
+            'command': self.command,
+            'transport': self.transport,
+            'runs': len(self.latencies),
+            'errors': self.errors,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'throughput': self.throughput,
+            'requests': self.requests,
+            'local': self.is_local
+        }
+
+    # Render as a human readable summary
+    def __str__(self) -> str:
+        lines: List[str] = [
+            'ff ' + ' '.join(self.command) + (' over ' + self.transport if self.transport else ''),
+            '  runs %d, errors %d, throughput %.2f/s' % (len(self.latencies), self.errors, self.throughput),
+            '  p50 %.1fms, p95 %.1fms, p99 %.1fms' % tuple(self.percentile(p) * 1000 for p in [50, 95, 99]),
+        ]
+
+        for route, count in sorted(self.requests.items()):
+            lines.append('  %5.1f x %s' % (count / max(1, len(self.latencies) + self.errors), route))
+
+        if self.is_local:
+            lines.append('  no server requests were made, so these timings don\'t measure the server or the transport')
+
+        return '\n'.join(lines)
+
+# Runs ff commands against a simulated Firefly server
+class Harness():
+    # Create an instance
+    def __init__(self, app: Firefly = None, ff_path: Path = FF_PATH, config: Dict[str, Dict[str, str]] = None, server: str = 'wsgiref'):
+        self.app: Firefly = app or Firefly()
+        self.ff_path: Path = ff_path
+        self.config: Dict[str, Dict[str, str]] = config or {}
+        # Name of the server the app is served with
+        self.server: str = server
+        self.home: Path = None
+        self._server: ThreadingWSGIServer = None
+        self._thread: threading.Thread = None
+
+    # Get the server base URL
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+
+        return 'http://%s:%d' % (host, port)
+
+    # Start the server and create a throwaway home directory holding the ff config
+    def start(self):
+        self._server = serve(self.app, server=self.server)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        self.home = Path(tempfile.mkdtemp(prefix='ff-bench-'))
+        storage_path: Path = self.home.joinpath('.ff-timetable')
+        storage_path.mkdir()
+
+        sections: Dict[str, Dict[str, str]] = {
+            'firefly': {
+                'protocol': 'http',
+                'hostname': self.url.split('://')[1],
+                'username': USERNAME,
+                'password': PASSWORD
+            },
+            # Results are cached when prefetching is enabled, which would answer every run after the first without the
+            # server, so caching stays off unless a benchmark turns it on
+            'cache': {namespace: '0' for namespace in CACHE_NAMESPACES}
+        }
+
+        for section, values in self.config.items():
+            sections.setdefault(section, {}).update(values)
+
+        storage_path.joinpath('timetable.conf').write_text(''.join(
+            '[%s]\n%s\n' % (section, ''.join('%s = %s\n' % item for item in values.items()))
+            for section, values in sections.items()
+        ))
+
+    # Stop the server and remove the home directory
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self.home, ignore_errors=True)
+
+    # Start the harness in a with statement
+    def __enter__(self) -> Harness:
+        self.start()
+        return self
+
+    # Stop the harness at the end of a with statement
+    def __exit__(self, *args):
+        self.stop()
+
+    # Run ff once, returning the exit code
+    def invoke(self, command: List[str]) -> int:
+        env: Dict[str, str] = dict(os.environ, HOME=str(self.home), ENVIRONMENT='dev')
+
+        return subprocess.run(
+            [sys.executable, str(self.ff_path), '-n'] + command,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ).returncode
+
+    # Get the server request counts, optionally resetting them
+    def server_stats(self, reset: bool = False) -> Dict[str, int]:
+        with urlopen(self.url + '/__stats' + ('?reset' if reset else '')) as response:
+            return json.load(response)
+
+    # Run a command repeatedly and time each invocation
+    def run(self, command: List[str], runs: int = 20, concurrency: int = 1, warmup: int = 1) -> Report:
+        for _ in range(warmup):
+            self.invoke(command)
+
+        self.server_stats(reset=True)
+
+        # Time a single invocation
+        def timed(_) -> float:
+            start: float = time.perf_counter()
+            code: int = self.invoke(command)
+
+            return time.perf_counter() - start if code == 0 else None
+
+        start: float = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results: List[float] = list(executor.map(timed, range(runs)))
+
+        wall_time: float = time.perf_counter() - start
+
+        return Report(
+            command=command,
+            latencies=[latency for latency in results if latency is not None],
+            errors=sum(1 for latency in results if latency is None),
+            wall_time=wall_time,
+            requests=self.server_stats(),
+            transport=self.config.get('firefly', {}).get('transport')
+        )
@@ -0,0 +1,71 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import time
+from typing import List, Dict, Callable
+from bs4 import BeautifulSoup, Tag as Element
+from firefly.resources import Teacher
+from firefly.directory import parse_directory
+from firefly.files import CHUNK_SIZE
+from .data import School
+from .server import directory_page
+
+# Parse a directory page the way the client did before it had a parser of its own, as the reference the
+# streaming parser is checked against
+def parse_with_beautifulsoup(body: bytes) -> List[Teacher]:
+    teachers: List[Teacher] = []
+    table: Element = BeautifulSoup(body.decode('utf-8'), 'lxml').select_one('#StaffResults > table')
+
+    if not table:
+        return []
+
+    for i, row in enumerate(table.find_all('tr')):
+        # Ignore table header
+        if i != 0:
+            cells = row.find_all('td')
+
+            phone_number: str = cells[4].find(string=True)
+            email_address: str = cells[4].find('a').text
+
+            teachers.append(
+                Teacher(
+                    name=cells[1].find('h3').text,
+                    picture=cells[0].find('img')['src'],
+                    roles=[role.strip() for role in cells[2].find_all(string=True) if role],
+                    departments=[department.strip() for department in cells[3].text.split(', ') if department],
+                    phone_number=phone_number.strip() if phone_number else phone_number,
+                    email_address=email_address.strip() if email_address else email_address
+                )
+            )
+
+    return teachers
+
+# Parse a directory page with the streaming parser, fed in the chunks it's downloaded in
+def parse_with_lxml(body: bytes) -> List[Teacher]:
+    return list(parse_directory((body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)), 'utf-8'))
+
+# Parsers compared by the benchmark
+PARSERS: Dict[str, Callable[[bytes], List[Teacher]]] = {
+    'beautifulsoup': parse_with_beautifulsoup,
+    'lxml': parse_with_lxml
+}
+
+# Time each parser on a directory page listing the staff of a school, checking they agree
+def compare(staff: int, runs: int, seed: int = 0) -> Dict[str, float]:
+    body: bytes = directory_page(School(seed=seed, staff=staff, tasks=0).staff).encode('utf-8')
+    results: Dict[str, List[Dict]] = {}
+    timings: Dict[str, float] = {}
+
+    for name, parse in PARSERS.items():
+        start: float = time.perf_counter()
+
+        for _ in range(runs):
+            teachers: List[Teacher] = parse(body)
+
+        timings[name] = (time.perf_counter() - start) / runs
+        results[name] = [teacher.__dict__ for teacher in teachers]
+
+    if results['lxml'] != results['beautifulsoup']:
+        raise AssertionError('The parsers disagree on a page of %d staff' % staff)
+
+    return timings
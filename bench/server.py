@@ -0,0 +1,494 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import re
+import json
+import socket
+import asyncio
+import hashlib
+import time
+import random
+import secrets
+import threading
+from .data import School
+from html import escape
+from http import HTTPStatus
+from collections import Counter
+from socketserver import ThreadingMixIn
+from typing import List, Dict, Tuple, Callable, Iterable
+from urllib.parse import parse_qs, quote, urlencode
+from datetime import date as Date, timedelta as TimeDelta
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+# Name of the session cookie
+COOKIE: str = 'ASP.NET_SessionId'
+
+# Username and password accepted by the login form
+USERNAME: str = 'student'
+PASSWORD: str = 'password'
+
+# WSGI response
+Body = Iterable[bytes]
+
+# WSGI app that behaves like the subset of Firefly used by ff
+class Firefly():
+    # Create an instance
+    def __init__(
+        self,
+        school: School = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        session_ttl: float = None,
+        capacity: int = None
+    ):
+        self.school: School = school or School()
+        # Mean seconds added to every response
+        self.latency: float = latency
+        # Maximum seconds either side of the mean latency
+        self.jitter: float = jitter
+        # Fraction of requests answered with 503
+        self.error_rate: float = error_rate
+        # Idle seconds after which a session expires, or None to never expire
+        self.session_ttl: float = session_ttl
+        # Requests handled at once, beyond which requests are answered with 429, or None for no limit
+        self.capacity: int = capacity
+        self._active: int = 0
+        # Session ID to the time it was last used
+        self.sessions: Dict[str, float] = {}
+        # Request counts by route
+        self.stats: Counter = Counter()
+        self._lock: threading.Lock = threading.Lock()
+        self._random: random.Random = random.Random()
+        self._routes: List[Tuple[str, re.Pattern, Callable, bool]] = [
+            ('GET', re.compile(r'/login/login\.aspx'), self.login_page, False),
+            ('POST', re.compile(r'/login/login\.aspx'), self.login, False),
+            ('GET', re.compile(r'/logout'), self.logout, False),
+            ('GET', re.compile(r'/planner/(day|week)/(\d{4}-\d{2}-\d{2})'), self.planner, True),
+            ('POST', re.compile(r'/api/v2/taskListing/view/self/tasks/filterBy'), self.task_listing, True),
+            ('POST', re.compile(r'/_api/1\.0/tasks/(\d+)/responses'), self.task_response, True),
+            ('GET', re.compile(r'/_api/1\.0/tasks/(\d+)'), self.task_detail, True),
+            ('GET', re.compile(r'/resource\.aspx'), self.resource, True),
+            ('GET', re.compile(r'/pupil-portal'), self.pupil_portal, True),
+            ('GET', re.compile(r'/school-directory'), self.school_directory, True),
+            ('GET', re.compile(r'/__stats'), self.get_stats, False),
+        ]
+
+    # Handle a WSGI request
+    def __call__(self, environ: Dict, start_response: Callable) -> Body:
+        method: str = environ['REQUEST_METHOD']
+        path: str = environ.get('PATH_INFO', '/')
+
+        for route_method, pattern, handler, needs_session in self._routes:
+            match: re.Match = pattern.fullmatch(path)
+
+            if match and route_method == method:
+                break
+        else:
+            return self._respond(start_response, HTTPStatus.NOT_FOUND, 'Not found')
+
+        if handler == self.get_stats:
+            return handler(environ, start_response)
+
+        with self._lock:
+            self.stats[method + ' ' + pattern.pattern] += 1
+            is_over_capacity: bool = self.capacity is not None and self._active >= self.capacity
+
+            if is_over_capacity:
+                self.stats['rejected'] += 1
+            else:
+                self._active += 1
+
+        if is_over_capacity:
+            return self._respond(start_response, HTTPStatus.TOO_MANY_REQUESTS, 'Too many requests', headers=[('Retry-After', '1')])
+
+        try:
+            self._delay()
+
+            if self._random.random() < self.error_rate:
+                return self._respond(start_response, HTTPStatus.SERVICE_UNAVAILABLE, 'Service unavailable')
+
+            return self._handle(environ, start_response, handler, needs_session, match)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    # Handle a request to a route, redirecting to the login page if it needs a session and hasn't got one
+    def _handle(self, environ: Dict, start_response: Callable, handler: Callable, needs_session: bool, match: re.Match) -> Body:
+        path: str = environ.get('PATH_INFO', '/')
+
+        if needs_session and not self._touch_session(environ):
+            if 'application/json' in environ.get('HTTP_ACCEPT', ''):
+                return self._respond(start_response, HTTPStatus.UNAUTHORIZED, '')
+
+            url: str = path + ('?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING') else '')
+
+            return self._respond(start_response, HTTPStatus.FOUND, headers=[
+                ('Location', '/login/login.aspx?' + urlencode({'prelogin': url}))
+            ])
+
+        return handler(environ, start_response, *match.groups())
+
+    # Sleep for the configured latency
+    def _delay(self):
+        delay: float = self.latency + self._random.uniform(-self.jitter, self.jitter)
+
+        if delay > 0:
+            time.sleep(delay)
+
+    # Get the session ID from the request cookies
+    def _session_id(self, environ: Dict) -> str:
+        for cookie in environ.get('HTTP_COOKIE', '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+
+            if name == COOKIE:
+                return value
+
+        return None
+
+    # Determine if the request has a live session and extend it
+    def _touch_session(self, environ: Dict) -> bool:
+        session_id: str = self._session_id(environ)
+        now: float = time.monotonic()
+
+        with self._lock:
+            last_used: float = self.sessions.get(session_id)
+
+            if last_used is None:
+                return False
+
+            if self.session_ttl is not None and now - last_used > self.session_ttl:
+                del self.sessions[session_id]
+                return False
+
+            self.sessions[session_id] = now
+
+        return True
+
+    # Read the request body
+    def _body(self, environ: Dict) -> bytes:
+        length: int = int(environ.get('CONTENT_LENGTH') or 0)
+
+        return environ['wsgi.input'].read(length) if length else b''
+
+    # Send a response
+    def _respond(
+        self,
+        start_response: Callable,
+        status: HTTPStatus,
+        body: str = '',
+        content_type: str = 'text/html; charset=utf-8',
+        headers: List[Tuple[str, str]] = None
+    ) -> Body:
+        data: bytes = body.encode('utf-8')
+
+        start_response('%d %s' % (status.value, status.phrase), [
+            ('Content-Type', content_type),
+            ('Content-Length', str(len(data)))
+        ] + (headers or []))
+
+        return [data]
+
+    # Send a JSON response
+    def _json(self, start_response: Callable, body, status: HTTPStatus = HTTPStatus.OK) -> Body:
+        return self._respond(start_response, status, json.dumps(body), 'application/json; charset=utf-8')
+
+    # Render the login page
+    def login_page(self, environ: Dict, start_response: Callable, error: str = None) -> Body:
+        query: str = environ.get('QUERY_STRING', '')
+
+        return self._respond(start_response, HTTPStatus.OK, (
+            '<html><body><div class="ff-login-box"><div class="ff-login-mainsection">'
+            '%s<form method="post" action="login.aspx%s">'
+            '<input name="username"><input name="password" type="password"></form>'
+            '</div></div></body></html>'
+        ) % (
+            '<p class="ff-login-error-message">%s</p>' % escape(error) if error else '',
+            '?' + escape(query) if query else ''
+        ))
+
+    # Handle a login form submission
+    def login(self, environ: Dict, start_response: Callable) -> Body:
+        form: Dict[str, List[str]] = parse_qs(self._body(environ).decode('utf-8'))
+
+        if form.get('username') != [USERNAME] or form.get('password') != [PASSWORD]:
+            return self.login_page(environ, start_response, 'Your username or password is incorrect')
+
+        session_id: str = secrets.token_hex(12)
+
+        with self._lock:
+            self.sessions[session_id] = time.monotonic()
+
+        redirect: str = parse_qs(environ.get('QUERY_STRING', '')).get('prelogin', ['/pupil-portal'])[0]
+
+        return self._respond(start_response, HTTPStatus.FOUND, headers=[
+            ('Location', quote(redirect, safe='/?=&-:')),
+            ('Set-Cookie', '%s=%s; path=/; HttpOnly' % (COOKIE, session_id))
+        ])
+
+    # End the session
+    def logout(self, environ: Dict, start_response: Callable) -> Body:
+        with self._lock:
+            self.sessions.pop(self._session_id(environ), None)
+
+        return self._respond(start_response, HTTPStatus.OK, '<html><body>Logged out</body></html>', headers=[
+            ('Set-Cookie', '%s=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT' % COOKIE)
+        ])
+
+    # Render the planner for a day or week
+    def planner(self, environ: Dict, start_response: Callable, period: str, date_str: str) -> Body:
+        date: Date = Date.fromisoformat(date_str)
+
+        if period == 'week':
+            date -= TimeDelta(days=date.weekday())
+            days: List[Date] = [date + TimeDelta(days=i) for i in range(7)]
+        else:
+            days = [date]
+
+        status: Dict = {
+            'events': [event for day in days for event in self.school.events(day)]
+        }
+
+        return self._respond(start_response, HTTPStatus.OK, (
+            '<html><head><script>\nvar PLANNER_INITIAL_STATUS = %s\n</script></head><body></body></html>'
+        ) % json.dumps(status))
+
+    # List tasks
+    def task_listing(self, environ: Dict, start_response: Callable) -> Body:
+        params: Dict = json.loads(self._body(environ) or b'{}')
+        tasks: List[Dict] = self.school.tasks
+
+        completion_status: str = params.get('completionStatus')
+
+        if completion_status == 'Todo':
+            tasks = [task for task in tasks if not task['isDone']]
+        elif completion_status == 'DoneOrArchived':
+            tasks = [task for task in tasks if task['isDone']]
+
+        read_status: str = params.get('readStatus')
+
+        if read_status == 'OnlyRead':
+            tasks = [task for task in tasks if not task['isUnread']]
+        elif read_status == 'OnlyUnread':
+            tasks = [task for task in tasks if task['isUnread']]
+
+        if 'dueDateFrom' in params:
+            tasks = [task for task in tasks if params['dueDateFrom'] <= task['dueDate'] <= params['dueDateTo']]
+        if params.get('owners'):
+            tasks = [task for task in tasks if task['setter']['guid'] in params['owners']]
+        if params.get('addressees'):
+            tasks = [task for task in tasks if any(a['guid'] in params['addressees'] for a in task['addressees'])]
+
+        for criterion in reversed(params.get('sortingCriteria', [])):
+            key: str = 'setDate' if criterion.get('column') == 'SetDate' else 'dueDate'
+            tasks = sorted(tasks, key=lambda task: task[key], reverse=criterion.get('order') == 'Descending')
+
+        page: int = int(params.get('page', 0))
+        page_size: int = int(params.get('pageSize', 10))
+
+        body: str = json.dumps({
+            'items': tasks[page * page_size:(page + 1) * page_size],
+            'totalCount': len(tasks)
+        })
+        etag: str = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            return self._respond(start_response, HTTPStatus.NOT_MODIFIED, headers=[('ETag', etag)])
+
+        return self._respond(start_response, HTTPStatus.OK, body, 'application/json; charset=utf-8', [('ETag', etag)])
+
+    # Mark a task as done or to do
+    def task_response(self, environ: Dict, start_response: Callable, task_id: str) -> Body:
+        task: Dict = next((task for task in self.school.tasks if task['id'] == int(task_id)), None)
+
+        if not task:
+            return self._respond(start_response, HTTPStatus.NOT_FOUND, 'Not found')
+
+        data: Dict = json.loads(parse_qs(self._body(environ).decode('utf-8'))['data'][0])
+        event: Dict = data['event']
+        is_done: bool = event['type'] == 'mark-as-done'
+
+        with self._lock:
+            if task['isDone'] == is_done:
+                return self._respond(start_response, HTTPStatus.FORBIDDEN, '')
+
+            task['isDone'] = is_done
+
+        return self._json(start_response, {
+            'description': {
+                'type': event['type'],
+                'eventGuid': secrets.token_hex(16),
+                'author': event['author'],
+                'sent': event['sent'],
+                'eventVersionId': 1
+            }
+        })
+
+    # Describe a file for the task detail
+    def _file(self, resource_id: int) -> Dict:
+        name, size = self.school.resources[resource_id]
+
+        return {'resourceId': resource_id, 'fileName': name, 'fileSize': size, 'url': '/resource.aspx?id=%d' % resource_id}
+
+    # Get a task with the files set with it and the files submitted for it
+    def task_detail(self, environ: Dict, start_response: Callable, task_id: str) -> Body:
+        task: Dict = next((task for task in self.school.tasks if task['id'] == int(task_id)), None)
+
+        if not task:
+            return self._respond(start_response, HTTPStatus.NOT_FOUND, 'Not found')
+
+        files: Dict[str, List[int]] = self.school.task_files[task['id']]
+
+        return self._json(start_response, {
+            **task,
+            'fileAttachments': [self._file(resource_id) for resource_id in files['attachments']],
+            'recipientsResponses': [{
+                'recipient': {'guid': self.school.user['@guid'], 'type': 'user'},
+                'responses': [
+                    {'event': {'type': 'add-file', 'files': [self._file(resource_id)]}} for resource_id in files['submissions']
+                ]
+            }]
+        })
+
+    # Send a file, or the byte range of it asked for, in chunks
+    def resource(self, environ: Dict, start_response: Callable) -> Body:
+        resource_id: int = int(parse_qs(environ.get('QUERY_STRING', '')).get('id', ['0'])[0])
+
+        if resource_id not in self.school.resources:
+            return self._respond(start_response, HTTPStatus.NOT_FOUND, 'Not found')
+
+        name, size = self.school.resources[resource_id]
+        etag: str = '"%d-%d"' % (resource_id, size)
+        headers: List[Tuple[str, str]] = [
+            ('Content-Type', 'application/octet-stream'),
+            ('Content-Disposition', 'attachment; filename="%s"' % name),
+            ('Accept-Ranges', 'bytes'),
+            ('ETag', etag)
+        ]
+        match: re.Match = re.fullmatch(r'bytes=(\d+)-(\d*)', environ.get('HTTP_RANGE', ''))
+        start, end = 0, size - 1
+
+        # A range of a file that has changed since would corrupt the download, so it gets the whole file instead
+        if match and environ.get('HTTP_IF_RANGE', etag) == etag:
+            start, end = int(match[1]), min(int(match[2] or size - 1), size - 1)
+
+            if start >= size:
+                start_response('416 Range Not Satisfiable', [('Content-Range', 'bytes */%d' % size), ('Content-Length', '0')])
+                return [b'']
+
+            start_response('206 Partial Content', headers + [
+                ('Content-Range', 'bytes %d-%d/%d' % (start, end, size)),
+                ('Content-Length', str(end - start + 1))
+            ])
+        else:
+            start_response('200 OK', headers + [('Content-Length', str(size))])
+
+        data: bytes = self.school.resource(resource_id)
+
+        return (data[offset:min(offset + 65536, end + 1)] for offset in range(start, end + 1, 65536))
+
+    # Render the portal home page
+    def pupil_portal(self, environ: Dict, start_response: Callable) -> Body:
+        return self._respond(start_response, HTTPStatus.OK, (
+            '<html><head><script>\nff_globals.initialPageData = %s;\n</script></head><body></body></html>'
+        ) % json.dumps({'page': {'user': self.school.user}}))
+
+    # Search the staff directory
+    def school_directory(self, environ: Dict, start_response: Callable) -> Body:
+        name: str = parse_qs(environ.get('QUERY_STRING', '')).get('name', [''])[0]
+
+        return self._respond(start_response, HTTPStatus.OK, directory_page(self.school.search(name)))
+
+    # Report request counts by route
+    def get_stats(self, environ: Dict, start_response: Callable) -> Body:
+        with self._lock:
+            stats: Dict[str, int] = dict(self.stats)
+
+            if environ.get('QUERY_STRING') == 'reset':
+                self.stats.clear()
+
+        return self._json(start_response, stats)
+
+# Render a directory page listing the staff
+def directory_page(staff: List[Dict]) -> str:
+    rows: List[str] = ['<tr><th></th><th>Name</th><th>Roles</th><th>Departments</th><th>Contact</th></tr>']
+
+    for teacher in staff:
+        rows.append(
+            '<tr><td><img src="%s"></td><td><h3>%s</h3></td><td>%s</td><td>%s</td><td>%s<br><a href="mailto:%s">%s</a></td></tr>' % (
+                escape(teacher['picture']),
+                escape(teacher['name']),
+                '<br>'.join(escape(role) for role in teacher['roles']),
+                escape(', '.join(teacher['departments'])),
+                escape(teacher['phone']),
+                escape(teacher['email']),
+                escape(teacher['email'])
+            )
+        )
+
+    return '<html><body><div id="StaffResults"><table>%s</table></div></body></html>' % ''.join(rows)
+
+# WSGI server that handles each request in a thread
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads: bool = True
+
+# WSGI request handler that doesn't log every request
+class QuietRequestHandler(WSGIRequestHandler):
+    # Discard the log message
+    def log_message(self, format: str, *args):
+        pass
+
+# Hypercorn server for the app, which speaks HTTP/2 with prior knowledge as well as HTTP/1.1 on the same port.
+# Has the methods of a socketserver, so the harness runs it the same way.
+class HypercornServer():
+    # Create an instance, listening straight away so the port is known
+    def __init__(self, app: Firefly, host: str, port: int):
+        # Hypercorn is only needed to serve HTTP/2
+        global Config, serve_hypercorn
+        from hypercorn.config import Config
+        from hypercorn.asyncio import serve as serve_hypercorn
+
+        self.app: Firefly = app
+        self.socket: socket.socket = socket.create_server((host, port))
+        self.server_address: Tuple[str, int] = self.socket.getsockname()
+        self._loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self._stopped: asyncio.Event = None
+        self._started: threading.Event = threading.Event()
+        self._finished: threading.Event = threading.Event()
+
+    # Serve until shut down
+    def serve_forever(self):
+        config: Config = Config()
+        # Hypercorn closes the socket it's given when it stops
+        config.bind = ['fd://%d' % os.dup(self.socket.fileno())]
+        config.loglevel = 'WARNING'
+        asyncio.set_event_loop(self._loop)
+        self._stopped = asyncio.Event()
+        self._started.set()
+
+        try:
+            self._loop.run_until_complete(serve_hypercorn(self.app, config, shutdown_trigger=self._stopped.wait, mode='wsgi'))
+        finally:
+            self._finished.set()
+
+    # Stop serving, waiting for serve_forever to return
+    def shutdown(self):
+        self._started.wait()
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._finished.wait()
+
+    # Close the socket
+    def server_close(self):
+        self._loop.close()
+        self.socket.close()
+
+# Servers the app can be served with
+SERVERS: List[str] = ['wsgiref', 'hypercorn']
+
+# Create a server for the app without starting it
+def serve(app: Firefly, host: str = '127.0.0.1', port: int = 0, server: str = 'wsgiref') -> ThreadingWSGIServer:
+    if server == 'hypercorn':
+        return HypercornServer(app, host, port)
+
+    return make_server(host, port, app, server_class=ThreadingWSGIServer, handler_class=QuietRequestHandler)
@@ -2,9 +2,9 @@
 # Unauthorized reproduction is prohibited.
 
 from .client import Client
-from .filters import Sort, TaskSort, DatePeriod
+from .filters import Sort, TaskSort, DatePeriod, TaskFilter
 from .events import TaskEvent, MarkAsDoneEvent, MarkAsUndoneEvent
-from .resources import User, Teacher, Lesson, Addressee, Class, Student, Task
-from .errors import FireflyError, AuthenticationError, ConfigError, InputError
+from .resources import User, Teacher, Lesson, Addressee, Class, Student, Task, TaskFile
+from .errors import FireflyError, AuthenticationError, ConfigError, InputError, ServerError
 from .enums import (Enum, TaskCompletionStatus, TaskReadStatus, TaskMarkingStatus, SortDirection,
                     SortColumn, TaskSortColumn, FilterEnum, TimetablePeriod, TaskOwner, TaskEventEnum)
\ No newline at end of file
@@ -0,0 +1,143 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import sys
+import threading
+from . import config, factories
+from .client import Client
+from .fmt import warn
+from colorama import Style
+from .errors import ConfigError, FireflyError
+from typing import List, Dict, Tuple, Callable, TextIO
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Prefix of the config sections that hold an account
+SECTION_PREFIX: str = 'account:'
+
+# State of the thread running a command for an account
+_local: threading.local = threading.local()
+
+# Clients by account name, where None is the `[firefly]` section
+_clients: Dict[str, Client] = {}
+_clients_lock: threading.Lock = threading.Lock()
+
+# Get the names of the accounts in the config file
+def names() -> List[str]:
+    return [section[len(SECTION_PREFIX):] for section in config.Parser.sections() if section.startswith(SECTION_PREFIX)]
+
+# Get the accounts chosen with --accounts or --all-accounts, or None if neither was given
+def selected(args) -> List[str]:
+    if getattr(args, 'all_accounts', False):
+        return names()
+
+    return getattr(args, 'accounts', None)
+
+# Get the account the current thread is running a command for, or None for the `[firefly]` section
+def current() -> str:
+    return getattr(_local, 'account', None)
+
+# Get the client for the current thread's account
+def client(can_ask: bool = True) -> Client:
+    account: str = current()
+
+    with _clients_lock:
+        if account not in _clients:
+            # Prompts from several threads at once would be unreadable
+            _clients[account] = factories.firefly_client(can_ask=can_ask and account is None, account=account)
+
+            if account is not None:
+                _clients[account].spinner = SilentSpinner()
+
+        return _clients[account]
+
+# Stands in for the spinner of a client whose output is captured
+class SilentSpinner():
+    # Create an instance
+    def __init__(self):
+        self.text: str = ''
+        self.color: str = None
+
+    # Ignore calls to any of the spinner methods
+    def __getattr__(self, name: str) -> Callable:
+        return lambda *args, **kwargs: None
+
+# Sends writes to the current thread's buffer, or to the real stream if it doesn't have one
+class _ThreadLocalStream():
+    # Create an instance
+    def __init__(self, stream: TextIO):
+        self.stream: TextIO = stream
+
+    # Write to the current thread's stream
+    def write(self, text: str) -> int:
+        return getattr(_local, 'stdout', self.stream).write(text)
+
+    # Flush the current thread's stream
+    def flush(self):
+        getattr(_local, 'stdout', self.stream).flush()
+
+    # Delegate everything else to the real stream
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+# Runs a command for several accounts at once, each with its own client, session and storage
+class ClientPool():
+    # Create an instance
+    def __init__(self, accounts: List[str]):
+        if not accounts:
+            raise ConfigError('Please create an `[%sNAME]` section in the config file for each account' % SECTION_PREFIX)
+
+        unknown: List[str] = [account for account in accounts if account not in names()]
+
+        if unknown:
+            raise ConfigError('Please create an `[%s%s]` section in the config file' % (SECTION_PREFIX, unknown[0]))
+
+        self.accounts: List[str] = accounts
+
+    # Run the callback for an account, returning its output and the error it raised, if any
+    def _run_one(self, account: str, callback: Callable[[], None]) -> Tuple[str, Exception]:
+        _local.account = account
+        _local.stdout = io.StringIO()
+        error: Exception = None
+
+        try:
+            callback()
+        except Exception as e:
+            error = e
+
+        output: str = _local.stdout.getvalue()
+        del _local.account, _local.stdout
+
+        return output, error
+
+    # Run the callback for every account concurrently, then print each account's output under its name,
+    # in the order the accounts were given. Raises the first unexpected error once every account is done,
+    # otherwise returns the number of accounts the command failed for.
+    def run(self, callback: Callable[[], None]) -> int:
+        stdout: TextIO = sys.stdout
+        sys.stdout = _ThreadLocalStream(stdout)
+        unexpected: Exception = None
+        failures: int = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.accounts)) as executor:
+                futures: List[Tuple[str, Future]] = [(account, executor.submit(self._run_one, account, callback)) for account in self.accounts]
+
+                for account, future in futures:
+                    output, error = future.result()
+
+                    if isinstance(error, FireflyError):
+                        output += warn(str(error)) + '\n'
+                        failures += 1
+                    elif error:
+                        unexpected = unexpected or error
+
+                    stdout.write(Style.BRIGHT + '👤 ' + account + Style.RESET_ALL + '\n' + output)
+                    stdout.flush()
+        finally:
+            sys.stdout = stdout
+
+        if unexpected:
+            raise unexpected
+
+        return failures
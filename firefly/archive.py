@@ -0,0 +1,273 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import os
+import json
+import mmap
+import struct
+import bisect
+import calendar
+from pathlib import Path
+from .lock import FileLock
+from .errors import InputError
+from .filters import DatePeriod
+from typing import List, Dict, Tuple, Iterable
+from .resources import Lesson, Teacher
+from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta
+
+# Marks the start of every column file
+MAGIC: bytes = b'FFTA'
+
+# Version of the column file layout
+VERSION: int = 1
+
+# Magic, version and item type code, padded so the items are 8 byte aligned
+HEADER: struct.Struct = struct.Struct('<4sBc2x')
+
+# Column names to their array type codes. Times are wall-clock seconds since the epoch and the
+# strings are ids into the column's dictionary, where 0 means there's no value.
+COLUMNS: Dict[str, str] = {
+    'start': 'q',
+    'end': 'q',
+    'subject': 'I',
+    'room': 'I',
+    'teacher': 'I'
+}
+
+# Columns that are dictionary encoded
+DICTIONARIES: List[str] = ['subject', 'room', 'teacher']
+
+# Convert a datetime to wall-clock seconds since the epoch, ignoring any time zone
+def to_epoch(date_time: DateTime) -> int:
+    return calendar.timegm(date_time.timetuple())
+
+# Convert wall-clock seconds since the epoch to a datetime
+def from_epoch(epoch: int) -> DateTime:
+    return DateTime(1970, 1, 1) + TimeDelta(seconds=epoch)
+
+# Convert a date to the wall-clock seconds since the epoch at its midnight
+def date_epoch(date: Date) -> int:
+    return calendar.timegm(date.timetuple())
+
+# Read-only view of the columns, memory mapped so nothing is loaded until it's sliced
+class ArchiveView():
+    # Create an instance
+    def __init__(self, archive: Archive, meta: Dict):
+        self.archive: Archive = archive
+        self.rows: int = meta['rows']
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        self.columns: Dict[str, memoryview] = {name: self._map(name, code) for name, code in COLUMNS.items()}
+        self.dictionaries: Dict[str, List[str]] = {name: archive.read_dictionary(name, meta['dictionaries'][name]) for name in DICTIONARIES}
+
+    # Memory map a column file, checking its header
+    def _map(self, name: str, code: str) -> memoryview:
+        path: Path = self.archive.column_path(name)
+
+        with path.open('rb') as f:
+            data: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._maps.append(data)
+
+        magic, version, item_code = HEADER.unpack_from(data)
+
+        if magic != MAGIC or version != VERSION or item_code != code.encode('ascii'):
+            raise ValueError('%s is not a version %d timetable archive column' % (path, VERSION))
+
+        self._views.append(memoryview(data))
+        # Ignore anything appended after the row count was last recorded, including a torn item, before the bytes
+        # are cast to items
+        self._views.append(self._views[-1][HEADER.size:HEADER.size + self.rows * struct.calcsize(code)])
+        self._views.append(self._views[-1].cast(code))
+
+        return self._views[-1]
+
+    # Get the row indices [lo, hi) of the lessons that start within the dates
+    def slice(self, period: DatePeriod) -> Tuple[int, int]:
+        start: memoryview = self.columns['start']
+
+        return (
+            bisect.bisect_left(start, date_epoch(period.from_date)),
+            bisect.bisect_left(start, date_epoch(period.until_date + TimeDelta(days=1)))
+        )
+
+    # Get the lessons that start within the dates
+    def lessons(self, period: DatePeriod) -> List[Lesson]:
+        lo, hi = self.slice(period)
+        lessons: List[Lesson] = []
+
+        # Look up a dictionary encoded value
+        def decode(column: str, i: int) -> str:
+            value_id: int = self.columns[column][i]
+            return self.dictionaries[column][value_id - 1] if value_id else None
+
+        for i in range(lo, hi):
+            teacher_name: str = decode('teacher', i)
+
+            lessons.append(Lesson(
+                start=from_epoch(self.columns['start'][i]),
+                end=from_epoch(self.columns['end'][i]),
+                subject=decode('subject', i),
+                teacher=Teacher(teacher_name) if teacher_name else None,
+                room=decode('room', i)
+            ))
+
+        return lessons
+
+    # Release the memory maps
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+
+        for data in self._maps:
+            data.close()
+
+    # Open the view in a with statement
+    def __enter__(self) -> ArchiveView:
+        return self
+
+    # Close the view at the end of a with statement
+    def __exit__(self, *args):
+        self.close()
+
+# Append-only columnar store of past lessons, kept in a directory of the storage path
+class Archive():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+
+    # Get the path of a column file
+    def column_path(self, name: str) -> Path:
+        return self.path.joinpath(name + '.col')
+
+    # Get the path of a dictionary file
+    def dictionary_path(self, name: str) -> Path:
+        return self.path.joinpath(name + '.dict')
+
+    # Get the metadata: the dates archived, the number of rows and the number of entries in each dictionary
+    def meta(self) -> Dict:
+        try:
+            with self.path.joinpath('meta.json').open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'from': None, 'until': None, 'rows': 0, 'dictionaries': {name: 0 for name in DICTIONARIES}}
+
+    # Get the dates archived, or None if nothing has been archived yet
+    def period(self) -> DatePeriod:
+        meta: Dict = self.meta()
+
+        if not meta['from']:
+            return None
+
+        return DatePeriod(Date.fromisoformat(meta['from']), Date.fromisoformat(meta['until']))
+
+    # Get the total size of the archive files in bytes
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self.path.glob('*') if path.is_file())
+
+    # Read the values of a dictionary, in id order
+    def read_dictionary(self, name: str, count: int) -> List[str]:
+        try:
+            with self.dictionary_path(name).open('rb') as f:
+                return [json.loads(line) for line, _ in zip(f, range(count))]
+        except OSError:
+            return []
+
+    # Open a read-only view of the archive
+    def view(self) -> ArchiveView:
+        return ArchiveView(self, self.meta())
+
+    # Append the lessons on the dates in the period, which must follow on from the dates already archived.
+    # Returns the number of lessons appended.
+    def append(self, period: DatePeriod, lessons: Iterable[Lesson]) -> int:
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        with FileLock(self.path.joinpath('archive.lock')):
+            meta: Dict = self.meta()
+
+            if meta['until'] and period.from_date != Date.fromisoformat(meta['until']) + TimeDelta(days=1):
+                raise InputError('The archive can only be extended from %s' % (Date.fromisoformat(meta['until']) + TimeDelta(days=1)))
+
+            self._truncate(meta)
+
+            dictionaries: Dict[str, Dict[str, int]] = {
+                name: {value: i + 1 for i, value in enumerate(self.read_dictionary(name, meta['dictionaries'][name]))}
+                for name in DICTIONARIES
+            }
+            additions: Dict[str, List[str]] = {name: [] for name in DICTIONARIES}
+
+            # Get the id of a value, adding it to the dictionary if it's new
+            def encode(column: str, value: str) -> int:
+                if not value:
+                    return 0
+
+                ids: Dict[str, int] = dictionaries[column]
+
+                if value not in ids:
+                    ids[value] = len(ids) + 1
+                    additions[column].append(value)
+
+                return ids[value]
+
+            rows: Dict[str, List[int]] = {name: [] for name in COLUMNS}
+
+            for lesson in sorted(lessons, key=lambda lesson: lesson.start):
+                if not period.from_date <= lesson.start.date() <= period.until_date:
+                    continue
+
+                rows['start'].append(to_epoch(lesson.start))
+                rows['end'].append(to_epoch(lesson.end))
+                rows['subject'].append(encode('subject', lesson.subject))
+                rows['room'].append(encode('room', lesson.room))
+                rows['teacher'].append(encode('teacher', lesson.teacher.name if lesson.teacher else None))
+
+            # Dictionaries first, so every id in the columns can be resolved
+            for name, values in additions.items():
+                if values:
+                    with self.dictionary_path(name).open('ab') as f:
+                        f.writelines(json.dumps(value).encode('utf-8') + b'\n' for value in values)
+
+            for name, code in COLUMNS.items():
+                with self.column_path(name).open('ab') as f:
+                    if f.tell() == 0:
+                        f.write(HEADER.pack(MAGIC, VERSION, code.encode('ascii')))
+
+                    f.write(struct.pack('<%d%s' % (len(rows[name]), code), *rows[name]))
+
+            # The rows only become visible once the metadata is replaced
+            self._write_meta({
+                'from': meta['from'] or period.from_date.isoformat(),
+                'until': period.until_date.isoformat(),
+                'rows': meta['rows'] + len(rows['start']),
+                'dictionaries': {name: len(dictionaries[name]) for name in DICTIONARIES}
+            })
+
+            return len(rows['start'])
+
+    # Cut off anything written by an append that didn't finish
+    def _truncate(self, meta: Dict):
+        for name, code in COLUMNS.items():
+            path: Path = self.column_path(name)
+
+            if path.exists():
+                os.truncate(path, HEADER.size + meta['rows'] * struct.calcsize(code))
+
+        for name in DICTIONARIES:
+            path = self.dictionary_path(name)
+
+            if path.exists():
+                with path.open('rb') as f:
+                    size: int = sum(len(line) for line, _ in zip(f, range(meta['dictionaries'][name])))
+
+                os.truncate(path, size)
+
+    # Replace the metadata file
+    def _write_meta(self, meta: Dict):
+        tmp_path: Path = self.path.joinpath('meta.json.tmp')
+
+        with tmp_path.open('w') as f:
+            json.dump(meta, f)
+
+        os.replace(tmp_path, self.path.joinpath('meta.json'))
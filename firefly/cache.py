@@ -0,0 +1,91 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import time
+import pickle
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from enum import Enum
+from typing import Any, Hashable
+
+# Value read from the cache
+class CacheEntry():
+    # Create an instance
+    def __init__(self, value: Any, stored_at: float):
+        self.value: Any = value
+        self.stored_at: float = stored_at
+
+    # Get the seconds since the value was stored
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+# How the client reads the cache
+class CacheMode(Enum):
+    # Serve entries that are still fresh, fetching anything else
+    NORMAL = 'normal'
+    # Serve entries of any age and never fetch, raising CacheMiss instead
+    OFFLINE = 'offline'
+    # Always fetch, replacing the entries
+    REFRESH = 'refresh'
+
+# Raised when an offline read finds nothing in the cache
+class CacheMiss(Exception):
+    pass
+
+# Cache reads made in a mode, which remembers the oldest entry served
+class CacheRead():
+    # Create an instance
+    def __init__(self, mode: CacheMode):
+        self.mode: CacheMode = mode
+        # Age in seconds of the oldest entry served
+        self.age: float = 0
+        # Whether any entry served was older than its lifetime
+        self.is_stale: bool = False
+
+    # Record an entry being served
+    def served(self, entry: CacheEntry, ttl: float):
+        self.age = max(self.age, entry.age)
+        self.is_stale = self.is_stale or entry.age > ttl
+
+# Pickles values to files in the storage directory, grouped by namespace
+class Cache():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+
+    # Get the file a key is stored in
+    def _path(self, namespace: str, key: Hashable) -> Path:
+        return self.path.joinpath(namespace, hashlib.sha1(repr(key).encode('utf-8')).hexdigest())
+
+    # Get an entry, or None if there isn't one or it is older than max_age seconds
+    def get(self, namespace: str, key: Hashable, max_age: float = None) -> CacheEntry:
+        try:
+            with self._path(namespace, key).open('rb') as f:
+                entry: CacheEntry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        if max_age is not None and entry.age > max_age:
+            return None
+
+        return entry
+
+    # Store a value
+    def put(self, namespace: str, key: Hashable, value: Any):
+        path: Path = self._path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent writers each get their own temporary file, and readers only ever see whole files
+        tmp_path: Path = path.with_name('%s.%d.%d.tmp' % (path.name, os.getpid(), threading.get_ident()))
+
+        with tmp_path.open('wb') as f:
+            pickle.dump(CacheEntry(value, time.time()), f)
+
+        os.replace(tmp_path, path)
+
+    # Remove every entry in a namespace
+    def clear(self, namespace: str):
+        shutil.rmtree(self.path.joinpath(namespace), ignore_errors=True)
@@ -3,21 +3,41 @@
 
 import re
 import json
-import pickle
+import math
+import hashlib
+import threading
+from . import trace
+from contextlib import contextmanager
 from pathlib import Path
-from .times import BREAK
+from .times import BellSchedule
 from http import HTTPStatus
 from .events import TaskEvent
+from .archive import Archive
+from .mirror import TaskMirror
+from .journal import TaskJournal
+from .files import FileStore, CHUNK_SIZE
+from .terms import TermStore
+from .complete import CompletionIndex, INDEX_NAME as COMPLETION_INDEX_NAME
+from .directory import parse_directory
+from .transport import mount as mount_transport
+from .scheduler import Scheduler, shared as shared_scheduler
+from .cache import Cache, CacheEntry, CacheMode, CacheMiss, CacheRead
+from .coalesce import Coalescer
+from .planning import plan_timetable_requests
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from .session import SessionStore
 from yaspin import yaspin as Yaspin
 from dateutil import parser as dateutil
-from .filters import TaskSort, DatePeriod
-from typing import List, Dict, Callable, Type
+from .filters import TaskSort, DatePeriod, TaskFilter
+from typing import List, Dict, Tuple, Callable, Type, Any, Hashable, Iterator, Deque
 from bs4 import BeautifulSoup, Tag as Element
 from urllib.parse import urljoin, urlparse, ParseResult as URL
-from .errors import AuthenticationError, InputError, FireflyError
+from .errors import AuthenticationError, InputError, FireflyError, ServerError
 from requests import Session, PreparedRequest as Request, Response
-from datetime import date as Date, time as Time, datetime as DateTime
-from .resources import User, Teacher, Lesson, Addressee, Class, Student, Task
+from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta
+from .resources import User, Teacher, Lesson, Addressee, Class, Student, Task, TaskFile
 from .enums import (TaskCompletionStatus, TaskReadStatus, TaskMarkingStatus, SortDirection,
                     TaskSortColumn, FilterEnum, TimetablePeriod, TaskOwner, TaskEventEnum, Recipient)
 
@@ -28,23 +48,59 @@ class Client():
     MIME_TYPE_JSON: str = 'application/json'
 
     # Create a new instance
-    def __init__(self, url: str, username: str, password: str, storage_path: Path):
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        storage_path: Path,
+        session_lifetime: float = 1200,
+        concurrency: int = 4,
+        cache_ttl: Dict[str, float] = None,
+        timeout: float = None,
+        bells: BellSchedule = None,
+        transport: str = 'http1',
+        scheduler: Scheduler = None
+    ):
         self.base_url: str = url
         self.username: str = username
         self.password: str = password
+        # Maximum requests made at once when fanning out
+        self.concurrency: int = concurrency
         self.spinner: Yaspin = Yaspin()
         self.spinner.color = 'green'
         self._client: Session = Session()
         self._client.headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.102 Safari/537.36'
         self._client.headers['Accept'] = self.MIME_TYPE_HTML # Can be overriden on a method basis
+        # Cookies and redirects are handled by the session whichever transport sends the requests
+        mount_transport(self._client, url, transport)
         self._has_authenticated: bool = False
         self._user: User = None
-        self._storage_path = storage_path
-        self._cookie_path = storage_path.joinpath('cookies')
-
-        if self._cookie_path.is_file():
-            cookies = pickle.load(self._cookie_path.open('rb'))
-            self._client.cookies.update(cookies)
+        self.storage_path: Path = storage_path
+        self._session: SessionStore = SessionStore(storage_path, lifetime=session_lifetime)
+        self._session.load(self._client.cookies)
+        self._flights: Coalescer = Coalescer()
+        self.cache: Cache = Cache(storage_path.joinpath('cache'))
+        self.archive: Archive = Archive(storage_path.joinpath('archive'))
+        self.mirror: TaskMirror = TaskMirror(storage_path.joinpath('tasks.mirror'))
+        # Responses to tasks waiting to be sent
+        self.journal: TaskJournal = TaskJournal(storage_path.joinpath('tasks.journal'))
+        # Files downloaded from tasks
+        self.files: FileStore = FileStore(storage_path.joinpath('files'))
+        # Ends of school years and holidays learned from exports
+        self.terms: TermStore = TermStore(storage_path.joinpath('terms.json'))
+        # Tasks, setters and classes that shell completion offers
+        self.completions: CompletionIndex = CompletionIndex(storage_path.joinpath(COMPLETION_INDEX_NAME))
+        # Seconds for which cached results are fresh, by cache namespace
+        self.cache_ttl: Dict[str, float] = cache_ttl or {}
+        # Seconds to wait for the server before giving up, or None to wait forever
+        self.timeout: float = timeout
+        # Times of the day that aren't lessons
+        self.bells: BellSchedule = bells or BellSchedule()
+        # Cache reads of the current thread
+        self._reads: threading.local = threading.local()
+        # Paces the requests of every client talking to the server
+        self.scheduler: Scheduler = scheduler or shared_scheduler(storage_path.joinpath('scheduler.json'), rate=50, concurrency=concurrency)
 
     # Append an endpoint to the base url
     def _url(self, endpoint: str) -> str:
@@ -59,52 +115,156 @@ class Client():
             return False
 
     # Make a request to Firefly and check if we're authenticated.
-    # If we're not, attempt to login.
-    def _request(self, method: str, endpoint: str, should_login: bool = True, **kwargs) -> Response:
+    # If we're not, attempt to login. HTML responses are parsed unless the caller parses them itself.
+    def _request(self, method: str, endpoint: str, should_login: bool = True, should_parse: bool = True, **kwargs) -> Response:
         url: str = self._url(endpoint)
 
-        response: Response = self._client.request(method, url, **kwargs)
-        request: Request = (response.history[0] if response.history else response).request
+        logged_in_at: float = self._session.logged_in_at
 
-        if response.status_code >= 500:
-            raise FireflyError('Server is down')
+        if should_login and self._session.is_expiring(self._client.cookies):
+            # Login ahead of time rather than finding out the hard way, which costs the request and a GET of the login form
+            self._login_once(logged_in_at, follow_redirects=False)
+            logged_in_at = self._session.logged_in_at
 
-        if request.headers.get('accept') == self.MIME_TYPE_HTML:
-            # Create a parser instance on the response for parsing HTML
-            response.parser: BeautifulSoup = BeautifulSoup(response.text, 'lxml')
+        with trace.span('request', method=method, url=url) as span:
+            response: Response = self.scheduler.send(url, lambda: self._client.request(method, url, **{'timeout': self.timeout, **kwargs}))
+            request: Request = (response.history[0] if response.history else response).request
 
-        if self._is_unauthenticated(response):
-            if should_login:
-                # The endpoint requires authentication.
-                response: Response = self.login(login_page=response if self._is_login_page(response) else None)
+            if span:
+                # Elapsed covers connecting and waiting for the headers of each hop, the remainder is the download
+                wait: float = sum(hop.elapsed.total_seconds() for hop in response.history + [response])
+                # Streamed bodies haven't been downloaded yet
+                span.set(status=response.status_code, bytes=None if kwargs.get('stream') else len(response.content), wait=wait,
+                         download=span.duration - wait, redirects=len(response.history))
 
-                # Try again, unless the login request has already redirected us back to the URL we want
-                return response if response.url == request.url else self._request(method, endpoint, **kwargs)
+            if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                raise ServerError('Firefly is receiving too many requests, so please try again later')
 
-            if self._has_authenticated:
-                # We think we've authenticated, but the server says we haven't
-                raise AuthenticationError('Unable to authenticate with Firefly, check your credentials')
+            if response.status_code >= 500:
+                raise ServerError('Server is down')
 
-        return response
+            # The login page is always parsed, as logging in needs its form
+            if request.headers.get('accept') == self.MIME_TYPE_HTML and (should_parse or self._is_login_page(response)):
+                # Create a parser instance on the response for parsing HTML
+                with trace.span('parse.html'):
+                    response.parser: BeautifulSoup = BeautifulSoup(response.text, 'lxml')
+
+            if self._is_unauthenticated(response):
+                if should_login:
+                    span.set(login_retry=True)
+
+                    # The endpoint requires authentication.
+                    response: Response = self._login_once(logged_in_at, login_page=response if self._is_login_page(response) else None)
+
+                    # Try again, unless the login request has already redirected us back to the URL we want
+                    return response if response and response.url == request.url else self._request(method, endpoint, should_parse=should_parse, **kwargs)
+
+                if self._has_authenticated:
+                    # We think we've authenticated, but the server says we haven't
+                    raise AuthenticationError('Unable to authenticate with Firefly, check your credentials')
+            elif should_login and response.status_code < 400:
+                self._session.touch(self._client.cookies)
+
+            return response
 
     # Determine if the server says we're unauthenticated
     def _is_unauthenticated(self, response: Response) -> bool:
         return response.status_code == HTTPStatus.UNAUTHORIZED or self._is_login_page(response)
 
-    # Determine if the response is the login page
+    # Determine if the response is, or redirects to, the login page
     def _is_login_page(self, response: Response) -> bool:
+        if response.is_redirect:
+            return 'login.aspx' in response.headers.get('location', '')
+
         return 'login.aspx' in response.url
 
-    # Make a GET request
+    # Make a GET request, sharing the response with identical GETs already in flight.
+    # Each client has its own flights, so sessions never see each other's responses.
     def _get(self, endpoint: str, **kwargs) -> Response:
-        return self._request('GET', endpoint, **kwargs)
+        key: tuple = ('GET', self._url(endpoint), json.dumps(kwargs, sort_keys=True, default=str))
+
+        return self._flights.run(key, lambda: self._request('GET', endpoint, **kwargs))
 
     # Make a POST request
     def _post(self, endpoint: str, **kwargs) -> Response:
         return self._request('POST', endpoint, **kwargs)
 
+    # Read the cache in a mode for the rest of the with statement, in the current thread and the threads it fans
+    # out to
+    @contextmanager
+    def cache_mode(self, mode: CacheMode, read: CacheRead = None) -> CacheRead:
+        previous: CacheRead = getattr(self._reads, 'read', None)
+        self._reads.read = read or CacheRead(mode)
+
+        try:
+            yield self._reads.read
+        finally:
+            self._reads.read = previous
+
+    # Wrap a function so it reads the cache in the current thread's mode when another thread calls it
+    def _in_cache_mode(self, callback: Callable) -> Callable:
+        read: CacheRead = getattr(self._reads, 'read', None)
+
+        if not read:
+            return callback
+
+        # Run the callback in the mode
+        def run(*args, **kwargs):
+            with self.cache_mode(read.mode, read):
+                return callback(*args, **kwargs)
+
+        return run
+
+    # Get a cache entry that may be served in the current mode, or None
+    def _read_cache(self, namespace: str, key: Hashable) -> CacheEntry:
+        read: CacheRead = getattr(self._reads, 'read', None)
+        ttl: float = self.cache_ttl.get(namespace, 0)
+
+        if read and read.mode == CacheMode.REFRESH:
+            return None
+
+        if read and read.mode == CacheMode.OFFLINE:
+            entry: CacheEntry = self.cache.get(namespace, key)
+
+            if entry:
+                read.served(entry, ttl)
+
+            return entry
+
+        return self.cache.get(namespace, key, ttl)
+
+    # Get a value from the cache if it may be served, otherwise compute and cache it
+    def _cached(self, namespace: str, key: Hashable, callback: Callable[[], Any]) -> Any:
+        entry: CacheEntry = self._read_cache(namespace, key)
+
+        if entry:
+            return entry.value
+
+        if getattr(self._reads, 'read', None) and self._reads.read.mode == CacheMode.OFFLINE:
+            raise CacheMiss(namespace)
+
+        value: Any = callback()
+        self.cache.put(namespace, key, value)
+
+        return value
+
     # Get the lessons for a given day
     def get_lessons(self, from_date: Date, period: TimetablePeriod = TimetablePeriod.DAY) -> List[Lesson]:
+        if period == TimetablePeriod.DAY:
+            # Answer from the week if it's cached, as the prefetcher fetches whole weeks
+            monday: Date = from_date - TimeDelta(days=from_date.weekday())
+            week: CacheEntry = self._read_cache('lessons', (TimetablePeriod.WEEK.foreign_name, monday.isoformat(), self.bells.fingerprint))
+
+            if week:
+                return [lesson for lesson in week.value if lesson.start.date() == from_date]
+
+        # Lessons split at different bells are cached apart
+        return self._cached('lessons', (period.foreign_name, from_date.isoformat(), self.bells.fingerprint), lambda: self._flights.run(
+            ('lessons', from_date, period), lambda: self._get_lessons(from_date, period)
+        ))
+
+    # Fetch and parse the lessons for a given day
+    def _get_lessons(self, from_date: Date, period: TimetablePeriod) -> List[Lesson]:
         day: int = from_date.day
 
         # https://stackoverflow.com/questions/739241/date-ordinal-output
@@ -125,7 +285,8 @@ class Client():
 
         planner_json: str = regex.search(javascript).group(1)
 
-        planner_status: Dict = json.loads(planner_json)
+        with trace.span('parse.json', bytes=len(planner_json)):
+            planner_status: Dict = json.loads(planner_json)
 
         lessons: List = []
 
@@ -136,102 +297,74 @@ class Client():
 
             return dateutil.isoparse(iso_time)
 
-        for lesson in planner_status['events']:
-            start: DateTime = parse_time(lesson.get('isostartdate'))
-            end: DateTime = parse_time(lesson.get('isoenddate'))
-            subject: str = lesson.get('subject')
-
-            p2: Lesson = None
-            p4: Lesson = None
-
-            # Firefly does not distinguish between break and free period
-            if start.time() == BREAK.start or end.time() == BREAK.end:
-                if start.time() != BREAK.start:
-                    p2 = Lesson(
-                        start=start,
-                        end=DateTime.combine(
-                            end.date(),
-                            BREAK.start
-                        )
-                    )
-                    start = DateTime.combine(
-                        start.date(),
-                        BREAK.start
-                    )
-                if end.time() != BREAK.end:
-                    p4 = Lesson(
-                        start=DateTime.combine(
-                            start.date(),
-                            BREAK.end
-                        ),
-                        end=end
-                    )
-                    end = DateTime.combine(
-                        end.date(),
-                        BREAK.end
-                    )
+        for event in planner_status['events']:
+            start: DateTime = parse_time(event.get('isostartdate'))
+            end: DateTime = parse_time(event.get('isoenddate'))
+            subject: str = event.get('subject')
 
-            teacher_name: str = lesson.get('chairperson')
+            teacher_name: str = event.get('chairperson')
             teacher: Teacher = None
 
             if teacher_name:
                 teacher = Teacher(teacher_name)
 
-            if p2:
-                lessons.append(p2)
-
-            lessons.append(
-                Lesson(
-                    start=start,
-                    end=end,
-                    subject=subject,
-                    teacher=teacher,
-                    room=lesson.get('location')
+            # Firefly does not distinguish between break and free period, so split free periods at the bells.
+            # Events with a subject, like clubs at lunch, are left whole.
+            pieces: List[Tuple[DateTime, DateTime, str]] = [(start, end, None)] if subject else self.bells.split(start, end)
+
+            for piece_start, piece_end, label in pieces:
+                lessons.append(
+                    Lesson(
+                        start=piece_start,
+                        end=piece_end,
+                        subject=subject,
+                        teacher=None if label else teacher,
+                        room=None if label else event.get('location'),
+                        label=label
+                    )
                 )
-            )
-
-            if p4:
-                lessons.append(p4)
 
         self.spinner.text = 'Retrieved ' + indicator
 
         return lessons
 
-    # Search the staff directory by surname.
-    def search_directory(self, surname: str) -> List[Teacher]:
-        self.spinner.text = 'Searching the school directory'
+    # Get the lessons between two dates, fetching the planner weeks and days that cover them concurrently
+    def get_lessons_between(self, period: DatePeriod) -> List[Lesson]:
+        requests: List[Tuple[Date, TimetablePeriod]] = plan_timetable_requests(period)
 
-        response = self._get('/school-directory', params={
-            'name': surname
-        })
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results: List[List[Lesson]] = list(executor.map(self._in_cache_mode(lambda request: self.get_lessons(*request)), requests))
 
-        teachers = []
+        lessons: Dict[tuple, Lesson] = {}
 
-        table: Element = response.parser.select_one('#StaffResults > table')
+        for lesson in (lesson for result in results for lesson in result):
+            if period.from_date <= lesson.start.date() <= period.until_date:
+                # Overlapping requests return the same lesson more than once
+                lessons.setdefault((lesson.start, lesson.end, lesson.subject, lesson.room), lesson)
 
-        if not table:
-            return []
+        self.spinner.text = 'Retrieved timetable from %s until %s' % (
+            period.from_date.strftime('%d %B'), period.until_date.strftime('%d %B')
+        )
 
-        for i, row in enumerate(table.find_all('tr')):
-            # Ignore table header
-            if i != 0:
-                cells = row.find_all('td')
+        return sorted(lessons.values(), key=lambda lesson: lesson.start)
 
-                phone_number: str = cells[4].find(text=True)
-                email_address: str = cells[4].find('a').text
+    # Search the staff directory by surname.
+    def search_directory(self, surname: str) -> List[Teacher]:
+        return self._cached('directory', surname, lambda: self._flights.run(
+            ('directory', surname), lambda: self._search_directory(surname)
+        ))
 
-                teachers.append(
-                    Teacher(
-                        name=cells[1].find('h3').text,
-                        picture=cells[0].find('img')['src'],
-                        roles=[role.strip() for role in cells[2].find_all(text=True) if role],
-                        departments=[department.strip() for department in cells[3].text.split(', ') if department],
-                        phone_number=phone_number.strip() if phone_number else phone_number,
-                        email_address=email_address.strip() if email_address else email_address
-                    )
-                )
+    # Fetch and parse the staff directory search results
+    def _search_directory(self, surname: str) -> List[Teacher]:
+        self.spinner.text = 'Searching the school directory'
+
+        # Streamed into the directory parser, which stops reading after the results
+        response: Response = self._request('GET', '/school-directory', params={
+            'name': surname
+        }, should_parse=False, stream=True)
 
-        return teachers
+        with response, trace.span('parse.directory'):
+            return list(parse_directory(response.iter_content(CHUNK_SIZE), response.encoding))
 
     # Get the first search result from the staff directory
     def get_teacher(self, surname: str) -> Teacher:
@@ -255,6 +388,112 @@ class Client():
     ) -> (List[Task], int):
         self.spinner.text = 'Retrieving tasks'
 
+        params: Dict = self._task_params(completion_status, read_status, marking_status, due, setters, addressees, sort, offset, limit)
+        tasks, total_count = self._get_task_page(params)
+        self.completions.add_tasks(tasks)
+
+        return tasks, total_count
+
+    # Get a page of tasks from the cache or Firefly, without indexing them for completion
+    def _get_task_page(self, params: Dict) -> (List[Task], int):
+        return self._cached('tasks', json.dumps(params, sort_keys=True), lambda: self._fetch_tasks(params))
+
+    # Iterate over every task matching the filters, page by page. The pages after the first are fetched a few
+    # at a time ahead of the caller, so stopping early doesn't fetch the rest. The tasks seen are indexed for
+    # completion once the listing is over, rather than page by page.
+    def iter_tasks(self, page_size: int = 100, **filters) -> Iterator[Task]:
+        self.spinner.text = 'Retrieving tasks'
+        seen: List[Task] = []
+        tasks, total_count = self._get_task_page(self._task_params(offset=0, limit=page_size, **filters))
+        pages: Iterator[int] = iter(range(1, math.ceil((total_count or 0) / page_size)))
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=self.concurrency)
+        get_task_page: Callable = self._in_cache_mode(self._get_task_page)
+        fetch: Callable[[int], Future] = lambda page: executor.submit(get_task_page, self._task_params(offset=page, limit=page_size, **filters))
+        futures: Deque[Future] = deque()
+
+        try:
+            seen.extend(tasks)
+            yield from tasks
+
+            futures.extend(fetch(page) for page in islice(pages, self.concurrency))
+
+            while futures:
+                tasks, _ = futures.popleft().result()
+                futures.extend(fetch(page) for page in islice(pages, 1))
+
+                seen.extend(tasks)
+                yield from tasks
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.completions.add_tasks(seen)
+
+    # Get a page of tasks matching a filter. If the endpoint can apply all of it, that's the page it returns.
+    # Otherwise every task passing the rest of the filter is a match, and pages are only fetched until the
+    # page of matches is full, so the total number of matches isn't known and None is returned instead.
+    def find_tasks(
+        self,
+        task_filter: TaskFilter,
+        sort: TaskSort = TaskSort(TaskSortColumn.DUE_DATE),
+        offset: int = 0,
+        limit: int = 10
+    ) -> (List[Task], int):
+        if not task_filter.is_partial():
+            return self.get_tasks(sort=sort, offset=offset, limit=limit, **task_filter.server_filters())
+
+        tasks: Iterator[Task] = self.iter_tasks(sort=sort, **task_filter.server_filters())
+
+        try:
+            matches: Iterator[Task] = (task for task in tasks if task_filter.matches(task))
+
+            # The offset counts pages, as it does for the endpoint
+            return list(islice(matches, offset * limit, (offset + 1) * limit)), None
+        finally:
+            # Stop fetching the pages ahead
+            tasks.close()
+
+    # Poll the user's set tasks, returning None instead of the tasks if they haven't changed since the
+    # validator returned by the last poll. The server's ETag is used if it sends one, otherwise a digest
+    # of the response body, so unchanged listings are never parsed.
+    def poll_tasks(self, validator: str = None, **filters) -> (List[Task], str):
+        headers: Dict = {
+            'Accept': self.MIME_TYPE_JSON,
+            'Referer': self._url('/set-tasks')
+        }
+
+        if validator and not validator.startswith('sha256:'):
+            headers['If-None-Match'] = validator
+
+        response: Response = self._post('/api/v2/taskListing/view/self/tasks/filterBy', json=self._task_params(**filters), headers=headers)
+
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            return None, validator
+
+        new_validator: str = response.headers.get('ETag') or 'sha256:' + hashlib.sha256(response.content).hexdigest()
+
+        if new_validator == validator:
+            return None, validator
+
+        with trace.span('parse.json', bytes=len(response.content)):
+            body: Dict = response.json()
+
+        tasks: List[Task] = self._parse_tasks(body)[0]
+        self.completions.add_tasks(tasks)
+
+        return tasks, new_validator
+
+    # Create the task listing request body
+    def _task_params(
+        self,
+        completion_status: TaskCompletionStatus = TaskCompletionStatus.ALL,
+        read_status: TaskReadStatus = TaskReadStatus.ALL,
+        marking_status: TaskMarkingStatus = TaskMarkingStatus.ALL,
+        due: DatePeriod = None,
+        setters: List[User] = None,
+        addressees: List[Addressee] = None,
+        sort: TaskSort = TaskSort(TaskSortColumn.DUE_DATE),
+        offset: int = 0,
+        limit: int = 10
+    ) -> Dict:
         params: Dict = {
             'ownerType': TaskOwner.SETTER.foreign_name,
             'archiveStatus': FilterEnum.ALL.foreign_name,
@@ -281,13 +520,26 @@ class Client():
         if addressees:
             params['addressees'] = [addressee.guid for addressee in addressees]
 
+        return params
+
+    # Fetch and parse a page of tasks
+    def _fetch_tasks(self, params: Dict) -> (List[Task], int):
         response = self._post('/api/v2/taskListing/view/self/tasks/filterBy', json=params, headers={
             'Accept': self.MIME_TYPE_JSON,
             'Referer': self._url('/set-tasks')
         })
 
-        body = response.json()
+        with trace.span('parse.json', bytes=len(response.content)):
+            body = response.json()
+
+        tasks, total_count = self._parse_tasks(body)
 
+        self.spinner.text = 'Retrieved tasks'
+
+        return tasks, total_count
+
+    # Parse a task listing response body
+    def _parse_tasks(self, body: Dict) -> (List[Task], int):
         tasks: List = []
 
         # Parse a date from a Firefly style string
@@ -350,12 +602,10 @@ class Client():
                 )
             )
 
-        self.spinner.text = 'Retrieved tasks'
-
         return tasks, body.get('totalCount')
 
-    # Respond to a task with an event
-    def _respond_to_task(self, task_id: int, event_type: TaskEventEnum, feedback: str = None) -> TaskEvent:
+    # Respond to a task with an event. Unless strict, a task that's already marked isn't an error and returns None.
+    def respond_to_task(self, task_id: int, event_type: TaskEventEnum, feedback: str = None, strict: bool = True) -> TaskEvent:
         response = self._post('/_api/1.0/tasks/%r/responses' % task_id, headers={
             'Referer': self._url('/set-tasks/' + str(task_id)),
             'Accept': self.MIME_TYPE_JSON
@@ -375,12 +625,24 @@ class Client():
             })
         })
 
+        # Cached task listings no longer reflect the task
+        self.cache.clear('tasks')
+
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            raise InputError('Task %d does not exist' % task_id)
+
         if response.status_code == HTTPStatus.FORBIDDEN:
-                raise InputError("Can't mark the task as %s as it's already marked as %s" % (
+            if not strict:
+                self.mirror.update(task_id, is_done=event_type == TaskEventEnum.DONE)
+                return None
+
+            raise InputError("Can't mark the task as %s as it's already marked as %s" % (
                         event_type.human_name, event_type.human_name
                     )
                 )
 
+        self.mirror.update(task_id, is_done=event_type == TaskEventEnum.DONE)
+
         event: dict = response.json()['description']
 
         event_type: TaskEventEnum = TaskEventEnum.from_foreign_name(event['type'])
@@ -394,60 +656,127 @@ class Client():
             version_id=event['eventVersionId']
         )
 
+    # Get the files set with a task and the files submitted for it
+    def get_task_files(self, task_id: int) -> List[TaskFile]:
+        self.spinner.text = 'Retrieving the files of task %d' % task_id
+
+        response: Response = self._get('/_api/1.0/tasks/%r' % task_id, headers={
+            'Referer': self._url('/set-tasks/' + str(task_id)),
+            'Accept': self.MIME_TYPE_JSON
+        })
+
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            raise InputError('Task %d does not exist' % task_id)
+
+        body: Dict = response.json()
+        files: List[TaskFile] = [
+            TaskFile(task_id, file_dict['fileName'], self._url(file_dict['url']), file_dict.get('fileSize'))
+            for file_dict in body.get('fileAttachments') or []
+        ]
+
+        for recipient in body.get('recipientsResponses') or []:
+            for event in (response_dict.get('event') or {} for response_dict in recipient.get('responses') or []):
+                files.extend(
+                    TaskFile(task_id, file_dict['fileName'], self._url(file_dict['url']), file_dict.get('fileSize'), is_submission=True)
+                    for file_dict in event.get('files') or []
+                )
+
+        return files
+
+    # Make a GET request for a file without downloading the body, which is left to be streamed
+    def stream(self, url: str, headers: Dict[str, str] = None) -> Response:
+        return self._request('GET', url, stream=True, headers={'Accept': '*/*', **(headers or {})})
+
     # Mark a task as done
     def mark_task_as_done(self, task_id: int) -> str:
-        return self._respond_to_task(task_id, TaskEventEnum.DONE)
+        return self.respond_to_task(task_id, TaskEventEnum.DONE)
 
     # Mark a task as to do
     def mark_task_as_to_do(self, task_id: int) -> str:
-        return self._respond_to_task(task_id, TaskEventEnum.UNDONE)
+        return self.respond_to_task(task_id, TaskEventEnum.UNDONE)
 
     # Get the authenticated user
     @property
     def user(self) -> User:
         if not self._user:
-            response: Response = self._get('/pupil-portal')
+            self._user = self._flights.run('user', self._get_user)
 
-            regex: re.Pattern = re.compile(r'ff_globals\.initialPageData = (.*);')
+        return self._user
 
-            javascript: str = response.parser.find(string=regex)
+    # Fetch and parse the authenticated user
+    def _get_user(self) -> User:
+        response: Response = self._get('/pupil-portal')
 
-            json_str: str = regex.search(javascript).group(1)
+        regex: re.Pattern = re.compile(r'ff_globals\.initialPageData = (.*);')
 
-            user_data: Dict = json.loads(json_str)['page']['user']
+        javascript: str = response.parser.find(string=regex)
 
-            user_cls: Type[User] = Student if user_data.get('@role') == 'student' else User
+        json_str: str = regex.search(javascript).group(1)
 
-            self._user = user_cls(
-                guid=user_data['@guid'],
-                name=user_data['@fullname']
-            )
+        user_data: Dict = json.loads(json_str)['page']['user']
 
-        return self._user
+        user_cls: Type[User] = Student if user_data.get('@role') == 'student' else User
+
+        return user_cls(
+            guid=user_data['@guid'],
+            name=user_data['@fullname']
+        )
+
+    # Login unless another thread or process has done so since the given login time, in which case
+    # its session is reused and None is returned
+    def _login_once(self, logged_in_at: float, login_page: Response = None, follow_redirects: bool = True) -> Response:
+        with self._session.lock:
+            if self._session.has_logged_in_since(logged_in_at, self._client.cookies):
+                self._has_authenticated = True
+                return None
+
+            return self.login(login_page, follow_redirects)
 
     # Request a session cookie from Firefly
-    def login(self, login_page: Response = None) -> Response:
+    def login(self, login_page: Response = None, follow_redirects: bool = True) -> Response:
+        with trace.span('login', reused_login_page=login_page is not None, cached_form=login_page is None and bool(self._session.login_url)):
+            return self._login(login_page, follow_redirects)
+
+    # Post the login form
+    def _login(self, login_page: Response = None, follow_redirects: bool = True) -> Response:
         old_spinner_text: str = self.spinner.text
         self.spinner.text = 'Logging in'
 
-        login_page = login_page or self._get('/login/login.aspx', should_login=False)
+        if login_page or not self._session.login_url:
+            login_page = login_page or self._get('/login/login.aspx', should_login=False)
 
-        form: Element = login_page.parser.select_one('body > div.ff-login-box > div.ff-login-mainsection > form')
+            form: Element = login_page.parser.select_one('body > div.ff-login-box > div.ff-login-mainsection > form')
 
-        response: Response = self._post(urljoin(login_page.url, form['action']), data={
+            action: str = urljoin(login_page.url, form['action'])
+            referer: str = login_page.url
+            is_cached: bool = False
+
+            self._session.remember_login_form(action, referer)
+        else:
+            action = self._session.login_url
+            referer = self._session.login_referer
+            is_cached = True
+
+        response: Response = self._post(action, data={
             'username': self.username,
             'password': self.password
         }, headers={
-            'Referer': login_page.url
-        }, should_login=False)
+            'Referer': referer
+        }, should_login=False, allow_redirects=follow_redirects)
 
         if response.status_code >= 400:
+            if is_cached:
+                # The form has moved, so find it again
+                self._session.forget_login_form()
+                self.spinner.text = old_spinner_text
+                return self._login(follow_redirects=follow_redirects)
+
             raise AuthenticationError('Failed to login, check your credentials')
 
         if error := response.parser.select_one('.ff-login-error-message'):
             raise AuthenticationError(error.text)
 
-        self._save_state()
+        self._session.start(self._client.cookies)
 
         self._has_authenticated = True
         self.spinner.text = old_spinner_text or 'Logged in'
@@ -462,16 +791,7 @@ class Client():
             'Referer': self._url('/pupil-portal')
         }, should_login=False)
 
-        self._save_state()
+        self._session.end(self._client.cookies)
 
         self._has_authenticated = False
         self.spinner.text = 'Logged out'
-
-    # Save the session cookie to a file so we don't have to login again until it expires
-    def _save_state(self):
-        if not self._cookie_path.is_file():
-            self._cookie_path.touch()
-
-        cookie_file = self._cookie_path.open('wb')
-
-        pickle.dump(self._client.cookies, cookie_file)
\ No newline at end of file
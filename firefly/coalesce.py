@@ -0,0 +1,41 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import threading
+from concurrent.futures import Future
+from typing import Dict, Hashable, Callable, TypeVar
+
+# Result type
+T = TypeVar('T')
+
+# Shares the result of a call with any identical calls made while it is in flight
+class Coalescer():
+    # Create an instance
+    def __init__(self):
+        self._lock: threading.Lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+    # Call the function, unless a call with the same key is in flight, in which case wait for its
+    # result instead. Exceptions are raised in every caller.
+    def run(self, key: Hashable, callback: Callable[[], T]) -> T:
+        with self._lock:
+            future: Future = self._flights.get(key)
+            is_leader: bool = future is None
+
+            if is_leader:
+                future = self._flights[key] = Future()
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result: T = callback()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
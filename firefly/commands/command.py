@@ -3,11 +3,20 @@
 
 from __future__ import annotations
 
+import io
+import re
+import sys
+import shutil
+import difflib
+import unicodedata
 from ..input import ask
+from colorama import Style
 from datetime import date as Date
-from firefly import Client, factories
-from functools import cached_property
-from typing import List, Callable, Any
+from firefly.fmt import human_age
+from contextlib import redirect_stdout
+from firefly.cache import CacheMode, CacheMiss
+from firefly import Client, accounts, config, prefetch, trace
+from typing import List, Dict, Callable, Any
 from argparse import ArgumentParser as ArgumentsParser, Namespace as Arguments
 
 # Interface for a command
@@ -50,10 +59,22 @@ class Command():
         self.parser.set_defaults(func=self)
         self.register_arguments()
 
+        if not parent:
+            self.register_global_arguments()
+
     # Register the command arguments
     def register_arguments(self):
         self.parser.add_argument('-n', '--no-interaction', action='store_true', default=False, help='Prevents %(prog)s from reading stdin, for example. Defaults to false. A config file must be present with this option.')
 
+    # Register the arguments that only the root command accepts
+    def register_global_arguments(self):
+        self.parser.add_argument('--trace', action='store_true', help='Time each request and parsing step and print a waterfall to stderr.')
+        self.parser.add_argument('--trace-json', metavar='FILE', help='Time each request and parsing step and write the spans to FILE as JSON.')
+        self.parser.add_argument('--profile', action='store_true', help='Profile CPU time and memory allocations, writing a collapsed stack file for flame graphs and an allocation report to the storage directory.')
+        accounts_group = self.parser.add_mutually_exclusive_group()
+        accounts_group.add_argument('--accounts', type=lambda names: names.split(','), metavar='NAME,...', help='Run the command for each of the comma separated accounts at once, as configured in `[account:NAME]` sections of the config file.')
+        accounts_group.add_argument('--all-accounts', action='store_true', help='Run the command for every account in the config file at once.')
+
     # Parse the command arguments
     def parse_arguments(self) -> Arguments:
         self._args: Arguments = self.parser.parse_args()
@@ -68,6 +89,21 @@ class Command():
     def args(self) -> Arguments:
         return self._args or (self.parent.args if self.parent else None)
 
+    # Get the prefetch jobs for the commands likely to follow this one
+    def prefetch_jobs(self, args: Arguments) -> List[Dict]:
+        return []
+
+    # Warm the cache in the background for the commands likely to follow this one, if prefetching is enabled
+    def prefetch(self, args: Arguments):
+        # The worker only knows the `[firefly]` account
+        if not config.Parser.getboolean('prefetch', 'enabled', fallback=False) or accounts.selected(args) is not None:
+            return
+
+        jobs: List[Dict] = self.prefetch_jobs(args)
+
+        if jobs:
+            prefetch.spawn(jobs, config.Parser.getfloat('prefetch', 'budget', fallback=20))
+
     # Get an argument or ask the user for it
     def arg_or_ask(self, arg: str):
         return getattr(self.args, arg, None) or ask(arg.capitalize())
@@ -77,7 +113,8 @@ class Command():
         self.firefly_client.spinner.start()
 
         try:
-            result = callback(self.firefly_client)
+            with trace.span('client'):
+                result = callback(self.firefly_client)
         except:
             self.firefly_client.spinner.stop()
             # Continue propagation
@@ -88,7 +125,76 @@ class Command():
 
         return result
 
+    # Print the result of the fetch straight from the cache, however old, then fetch it again if it was stale and
+    # replace what was printed. Falls back to fetching first if nothing is cached.
+    def print_stale_while_revalidate(self, fetch: Callable[[Client], Any], render: Callable[[Any], None]):
+        client: Client = self.firefly_client
+
+        # Output of pooled runs is captured, so there's nothing to replace
+        if accounts.current() is not None or not config.Parser.getboolean('cache', 'stale_while_revalidate', fallback=True):
+            render(self.print_client_state(fetch))
+            return
+
+        try:
+            with client.cache_mode(CacheMode.OFFLINE) as read:
+                stale_value = fetch(client)
+        except CacheMiss:
+            render(self.print_client_state(fetch))
+            return
+
+        if not read.is_stale:
+            render(stale_value)
+            return
+
+        stale_output: str = self._capture(render, stale_value)
+        footer: str = Style.DIM + '🕒 Cached %s ago, refreshing' % human_age(read.age) + Style.RESET_ALL + '\n'
+        sys.stdout.write(stale_output + footer)
+        sys.stdout.flush()
+
+        client.spinner.start()
+
+        try:
+            with trace.span('client'), client.cache_mode(CacheMode.REFRESH):
+                value = fetch(client)
+        finally:
+            client.spinner.stop()
+
+        output: str = self._capture(render, value)
+
+        if sys.stdout.isatty():
+            # Move to the first stale line and erase everything below it
+            sys.stdout.write('\x1b[%dF\x1b[J' % self._count_rows(stale_output + footer) + output)
+        elif output == stale_output:
+            print(Style.DIM + '✔️ Up to date' + Style.RESET_ALL)
+        else:
+            # Output that isn't a terminal can't be rewritten, so only print what changed
+            for line in difflib.unified_diff(stale_output.splitlines(), output.splitlines(), lineterm='', n=0):
+                if not line.startswith(('---', '+++', '@@')):
+                    print(line)
+
+        sys.stdout.flush()
+
+    # Get what the render callback prints for a value
+    def _capture(self, render: Callable[[Any], None], value: Any) -> str:
+        buffer: io.StringIO = io.StringIO()
+
+        with redirect_stdout(buffer):
+            render(value)
+
+        return buffer.getvalue()
+
+    # Count the terminal rows the output takes up, including the lines that wrap
+    def _count_rows(self, output: str) -> int:
+        columns: int = shutil.get_terminal_size().columns
+        rows: int = 0
+
+        for line in output.splitlines():
+            width: int = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in re.sub(r'\x1b\[[0-9;]*m', '', line))
+            rows += max(1, -(-width // columns))
+
+        return rows
+
     # Get the Firefly client
-    @cached_property
+    @property
     def firefly_client(self) -> Client:
-        return factories.firefly_client(can_ask=not self.args.no_interaction)
\ No newline at end of file
+        return accounts.client(can_ask=not self.args.no_interaction)
\ No newline at end of file
@@ -0,0 +1,76 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import sys
+import shlex
+from .. import Command
+from typing import Dict
+from firefly import complete
+from argparse import Namespace as Arguments
+
+# Completion scripts by shell. Each runs complete.py for the words on the command line so far, without site
+# packages or environment variables, which it doesn't need and which only slow Python's startup down.
+SCRIPTS: Dict[str, str] = {
+    'bash': '''# ff completion for bash. Load it in ~/.bashrc with: eval "$(ff completion bash)"
+_ff_complete() {
+    local IFS=$'\\n'
+    COMPREPLY=($(%(python)s -S -E %(complete)s bash "${COMP_WORDS[@]:1:COMP_CWORD}" 2>/dev/null))
+}
+complete -o default -F _ff_complete ff
+''',
+    'zsh': '''# ff completion for zsh. Load it in ~/.zshrc, after compinit, with: eval "$(ff completion zsh)"
+_ff_complete() {
+    local -a candidates
+    candidates=("${(@f)$(%(python)s -S -E %(complete)s zsh "${(@)words[2,CURRENT]}" 2>/dev/null)}")
+
+    if [[ -n "${candidates[1]}" ]]; then
+        _describe 'ff' candidates
+    else
+        _files
+    fi
+}
+compdef _ff_complete ff
+''',
+    'fish': '''# ff completion for fish. Save it with: ff completion fish > ~/.config/fish/completions/ff.fish
+function __ff_complete
+    set -l words (commandline -opc)
+    set -e words[1]
+    set -l current (commandline -ct)
+    set -l candidates (%(python)s -S -E %(complete)s fish $words "$current" 2>/dev/null)
+
+    if test (count $candidates) -gt 0
+        printf '%%s\\n' $candidates
+    else
+        __fish_complete_path "$current"
+    end
+end
+complete -c ff -f -a '(__ff_complete)'
+'''
+}
+
+# Prints a shell completion script
+class ShellCompletion(Command):
+    # The command name
+    name: str = 'completion'
+
+    # The command description
+    description: str = 'Print a script that completes ff commands, task IDs and GUIDs in your shell, without contacting Firefly'
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('shell', choices=list(SCRIPTS), help='The shell to complete commands in.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        root: Command = self
+
+        while root.parent:
+            root = root.parent
+
+        # Completion reads the commands from the index rather than importing them
+        complete.index_commands(complete.describe_parser(root.parser))
+
+        print(SCRIPTS[args.shell] % {
+            'python': shlex.quote(sys.executable),
+            'complete': shlex.quote(complete.__file__)
+        }, end='')
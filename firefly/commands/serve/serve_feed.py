@@ -0,0 +1,49 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .. import Command
+from colorama import Style
+from typing import Dict
+from firefly import Client
+from argparse import Namespace as Arguments
+from firefly.accounts import SilentSpinner
+from firefly.feed import Feed, FeedServer, TimetableFeed, TasksFeed
+
+# Serves the timetable as an iCalendar feed that calendar apps can subscribe to
+class ServeFeed(Command):
+    # The command name
+    name: str = 'serve'
+
+    # The command description
+    description: str = 'Serve your timetable, and optionally your tasks, as iCalendar feeds on this computer, so calendar apps can subscribe to them'
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('--host', default='127.0.0.1', help='The address to listen on (defaults to 127.0.0.1).')
+        self.parser.add_argument('--port', type=int, default=8642, help='The port to listen on (defaults to 8642).')
+        self.parser.add_argument('--weeks-before', type=int, default=2, help='Number of past weeks in the timetable feed (defaults to 2).')
+        self.parser.add_argument('--weeks-after', type=int, default=8, help='Number of future weeks in the timetable feed (defaults to 8).')
+        self.parser.add_argument('--tasks', action='store_true', help='Also serve your tasks to do as all day events on their due dates.')
+        self.parser.add_argument('--refresh', type=float, default=15 * 60, help='Seconds between refreshes of the feeds (defaults to 900). Weeks are only retrieved again once their cache lifetime has passed.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        feeds: Dict[str, Feed] = {'/timetable.ics': TimetableFeed(client, args.weeks_before, args.weeks_after)}
+
+        if args.tasks:
+            feeds['/tasks.ics'] = TasksFeed(client)
+
+        server: FeedServer = FeedServer(args.host, args.port, feeds, args.refresh)
+
+        try:
+            self.print_client_state(lambda client: server.start_refreshing())
+            # Requests are answered from the feeds, so the spinner has nothing to show from now on
+            client.spinner = SilentSpinner()
+
+            for path in feeds:
+                print('📅 Serving', Style.BRIGHT + 'http://%s:%d%s' % (args.host, args.port, path) + Style.RESET_ALL, flush=True)
+
+            server.serve_forever()
+        finally:
+            server.server_close()
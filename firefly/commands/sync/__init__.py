@@ -0,0 +1,4 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .sync_journal import SyncJournal
@@ -0,0 +1,58 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .. import Command
+from typing import List, Dict
+from colorama import Style
+from firefly.fmt import warn
+from argparse import Namespace as Arguments
+from firefly import Client, TaskEventEnum, FireflyError, journal
+
+# Lists, sends or discards the responses to tasks that haven't reached Firefly yet
+class SyncJournal(Command):
+    # The command name
+    name: str = 'sync'
+
+    # The command description
+    description: str = "List the tasks marked as done or todo that haven't been sent to Firefly yet, and the ones Firefly refused"
+
+    # Register the command arguments
+    def register_arguments(self):
+        action_group = self.parser.add_mutually_exclusive_group()
+        action_group.add_argument('--flush', action='store_true', help='Send them to Firefly now, and report the ones Firefly refused.')
+        action_group.add_argument('--discard', action='store_true', help='Forget them without sending them.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        pending: Dict[int, TaskEventEnum] = client.journal.pending()
+        # Changes Firefly refused when they were sent in the background
+        failures: List[Dict] = client.journal.failures()
+
+        if not pending and not failures:
+            print('🎉 Nothing to send')
+            return
+
+        if args.discard:
+            client.journal.discard()
+            client.journal.clear_failures()
+            print('🗑 Discarded %d changes' % len(pending))
+        elif args.flush:
+            errors: Dict[int, Exception] = self.print_client_state(lambda client: client.journal.flush(client)) if pending else {}
+
+            for failure in failures:
+                print(warn('Could not send task %d: %s' % (failure['task'], failure['error'])))
+
+            for task_id, error in errors.items():
+                print(warn('Could not send task %d: %s' % (task_id, error if isinstance(error, FireflyError) and not journal.is_transient(error) else 'Firefly is unreachable, so it will be sent again')))
+
+            client.journal.clear_failures()
+
+            if pending:
+                print(Style.DIM + 'Sent %d of %d changes.' % (len(pending) - len(errors), len(pending)) + Style.RESET_ALL)
+        else:
+            for task_id, event_type in pending.items():
+                print(Style.DIM + str(task_id) + Style.RESET_ALL, 'done' if event_type == TaskEventEnum.DONE else 'todo')
+
+            for failure in failures:
+                print(warn('%d %s: %s' % (failure['task'], 'done' if failure['event'] == TaskEventEnum.DONE.foreign_name else 'todo', failure['error'])))
@@ -3,4 +3,5 @@
 
 from .get_tasks import GetTasks
 from .undo_task import UndoTask
-from .complete_task import CompleteTask
\ No newline at end of file
+from .complete_task import CompleteTask
+from .watch_tasks import WatchTasks
\ No newline at end of file
@@ -3,16 +3,19 @@
 
 import re
 from .. import Command
-from typing import List, Dict
+from typing import List, Dict, Pattern
 from .undo_task import UndoTask
+from .task_stats import TaskStats
+from .task_files import TaskFiles
+from .watch_tasks import WatchTasks
 from colorama import Style, Back
-from firefly.fmt import human_date
+from firefly.fmt import human_date, warn
 from .complete_task import CompleteTask
 from aenum import AutoNumberEnum as Enum
 from argparse import Namespace as Arguments
 from firefly.parsers import DatePeriodParser, TaskSortParser
 from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta
-from firefly import Task, TaskCompletionStatus, TaskReadStatus, TaskMarkingStatus, TaskSortColumn, TaskSort
+from firefly import prefetch, Task, User, Class, InputError, TaskFilter, TaskEventEnum, TimetablePeriod, TaskCompletionStatus, TaskReadStatus, TaskMarkingStatus, TaskSortColumn, TaskSort
 
 # Get the user's set tasks.
 class GetTasks(Command):
@@ -25,7 +28,10 @@ class GetTasks(Command):
     # The subcommands
     subcommands: List[Command] = [
         CompleteTask,
-        UndoTask
+        UndoTask,
+        WatchTasks,
+        TaskStats,
+        TaskFiles
     ]
 
     # Register the command arguments
@@ -41,7 +47,8 @@ class GetTasks(Command):
         marking_status_group.add_argument('--unmarked', dest='marking_status', action='store_const', const=TaskMarkingStatus.UNMARKED, help='Tasks that have not been marked')
         self.parser.add_argument('--set', action=DatePeriodParser, nargs='+', metavar=('FROM', '[UNTIL]'), help='Tasks that were set no earlier than FROM, but no later than UNTIL. UNTIL defaults to FROM, so for tasks set yesterday, for example, use --set yesterday. ' + self.INTELLEGENT_DATE_HINT)
         self.parser.add_argument('--due', action=DatePeriodParser, nargs='+', metavar=('FROM', '[UNTIL]'), help='Tasks that are due no earlier than FROM, but no later than UNTIL. UNTIL defaults to FROM, so for tasks due tomorrow, for example, use --due tomorrow. ' + self.INTELLEGENT_DATE_HINT)
-        self.parser.add_argument('--subject', nargs='+', help='The class subject(s). E.g. maths, physics, english.')
+        self.parser.add_argument('--subject', nargs='+', help='The class subject(s). E.g. maths, physics, english. Tasks match if the subject is in their title or the name of a class they were set to.')
+        self.parser.add_argument('--title', metavar='PATTERN', help='Tasks with titles matching the case insensitive regular expression PATTERN.')
         self.parser.add_argument('--set-by', nargs='*', metavar='SETTER', help='Space separated list of task setter GUIDs. You can get a list of your teachers and their GUIDs by running `%(prog)s teachers`.')
         self.parser.add_argument('--set-to', nargs='*', metavar='ADDRESEE', help='Space separated list of task addressee GUIDs. You can get a list of your classes and their GUIDs by running `%(prog)s classes`.')
         self.parser.add_argument('--sort', action=TaskSortParser, nargs='+', metavar=('COLUMN', '[DIRECTION]'), default=TaskSort(TaskSortColumn.DUE_DATE), help='Order by which to sort the tasks. Supply a snake_case column (either set_date or due_date; defaults to due_date) and optionally a direction (either asc or desc; defaults to desc).')
@@ -50,22 +57,37 @@ class GetTasks(Command):
 
     # Execute the command
     def __call__(self, args: Arguments):
-        tasks, total_count = self.print_client_state(
-            lambda client: client.get_tasks(
-                completion_status=args.completion_status or TaskCompletionStatus.TO_DO,
-                read_status=args.read_status or TaskReadStatus.ALL,
-                marking_status=args.marking_status or TaskMarkingStatus.ALL,
-                sort=args.sort,
-                due=args.due,
-                setters=args.set_by,
-                addressees=args.set_to,
-                offset=args.offset,
-                limit=args.limit
-            )
+        try:
+            title: Pattern = re.compile(args.title, re.IGNORECASE) if args.title else None
+        except re.error as e:
+            raise InputError('--title is not a valid regular expression: %s' % e)
+
+        task_filter: TaskFilter = TaskFilter(
+            completion_status=args.completion_status or TaskCompletionStatus.TO_DO,
+            read_status=args.read_status or TaskReadStatus.ALL,
+            marking_status=args.marking_status or TaskMarkingStatus.ALL,
+            due=args.due,
+            setters=[User(guid) for guid in args.set_by] if args.set_by else None,
+            addressees=[Class(guid) for guid in args.set_to] if args.set_to else None,
+            set_period=args.set,
+            subjects=args.subject,
+            title=title
         )
 
+        self.print_stale_while_revalidate(
+            lambda client: client.find_tasks(task_filter, sort=args.sort, offset=args.offset, limit=args.limit),
+            lambda result: self.print_tasks(*result)
+        )
+
+    # Print a page of tasks
+    def print_tasks(self, tasks: List[Task], total_count: int):
+        # Responses that haven't reached Firefly yet
+        pending: Dict[int, TaskEventEnum] = self.firefly_client.journal.pending()
+
         for task in tasks:
-            if task.is_done:
+            is_done: bool = pending[task.id] == TaskEventEnum.DONE if task.id in pending else task.is_done
+
+            if is_done:
                 completion_status = _TaskCompletionStatusDisplay.DONE
             else:
                 if task.is_overdue():
@@ -75,17 +97,35 @@ class GetTasks(Command):
                 else:
                     completion_status = _TaskCompletionStatusDisplay.TO_DO
 
-            title: str = re.sub(r'[\r]\n', ' ', task.title)
+            title: str = re.sub(r'[\r]\n', ' ', task.title or '')
             title = title[:75] + '...' if len(title) > 75 else title
 
             print(
                 Style.DIM + str(task.id) + Style.RESET_ALL,
                 Style.BRIGHT + title + Style.RESET_ALL,
                 completion_status,
-                Style.DIM + human_date(task.due) + Style.RESET_ALL
+                Style.DIM + human_date(task.due) + (' (not yet sent)' if task.id in pending else '') + Style.RESET_ALL
             )
 
-        print(Style.DIM + 'Showing %r of %r tasks.' % (len(tasks), total_count) + Style.RESET_ALL)
+        if total_count is None:
+            # Some of the filters were applied to the tasks as they came in, so the rest weren't counted
+            print(Style.DIM + 'Showing %r matching tasks.' % len(tasks) + Style.RESET_ALL)
+        else:
+            print(Style.DIM + 'Showing %r of %r tasks.' % (len(tasks), total_count) + Style.RESET_ALL)
+
+        failures: int = len(self.firefly_client.journal.failures())
+
+        if failures:
+            print(warn('Firefly refused %d of your changes; run `ff sync` to see which' % failures))
+
+    # Prefetch the default task listing and the week holding the next school day
+    def prefetch_jobs(self, args: Arguments) -> List[Dict]:
+        next_date: Date = prefetch.next_school_day(Date.today())
+
+        return [
+            prefetch.tasks_job(),
+            prefetch.lessons_job(next_date - TimeDelta(days=next_date.weekday()), TimetablePeriod.WEEK.foreign_name)
+        ]
 
 # Holds display props on a task completion status
 class _TaskCompletionStatusDisplay(Enum):
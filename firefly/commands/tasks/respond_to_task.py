@@ -0,0 +1,44 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .. import Command
+from typing import Dict
+from argparse import Namespace as Arguments
+from firefly import Client, TaskEventEnum, FireflyError, InputError, accounts, journal
+
+# Journals a response to a task and sends it to Firefly in the background
+class RespondToTask(Command):
+    # The response made to the task
+    event_type: TaskEventEnum = None
+
+    # What the task is marked as
+    state: str = None
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('id', type=int, help='The ID of the task to mark as %s. You can retrieve a list of your tasks by running %%(prog)s tasks.' % self.state)
+        self.parser.add_argument('--wait', action='store_true', help='Wait for Firefly to accept the change, rather than sending it in the background.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        client.journal.append(args.id, self.event_type)
+        # Listings and reports show the change before Firefly has it
+        client.mirror.update(args.id, is_done=self.event_type == TaskEventEnum.DONE)
+
+        if not args.wait:
+            journal.spawn(accounts.current())
+            print('✔️ Marked task %d as %s' % (args.id, self.state))
+            return
+
+        errors: Dict[int, Exception] = self.print_client_state(lambda client: client.journal.flush(client))
+        error: Exception = errors.get(args.id)
+
+        if error and journal.is_transient(error):
+            raise InputError('Could not reach Firefly, so the change will be sent by `ff sync --flush`: %s' % error)
+        elif isinstance(error, FireflyError):
+            raise error
+        elif error:
+            raise InputError('Firefly sent a response that could not be read, so the change was not made')
+
+        print('✔️ Marked task %d as %s' % (args.id, self.state))
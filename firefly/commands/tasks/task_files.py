@@ -0,0 +1,75 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import shutil
+from .. import Command
+from pathlib import Path
+from colorama import Style
+from typing import List, Dict
+from argparse import Namespace as Arguments
+from firefly.fmt import warn, human_size
+from firefly import Client, TaskFile, FireflyError
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+
+# Downloads the files of tasks
+class TaskFiles(Command):
+    # The command name
+    name: str = 'files'
+
+    # The command description
+    description: str = 'Download the files set with tasks and the files you submitted for them'
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('ids', type=int, nargs='+', metavar='ID', help='The IDs of the tasks. You can retrieve a list of your tasks by running %(prog)s tasks.')
+        self.parser.add_argument('-o', '--output', type=Path, default=Path('.'), metavar='DIR', help='The directory to save the files to, in a directory per task. Defaults to the current directory.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        files, errors = self.print_client_state(lambda client: self.download(client, args.ids))
+        saved: int = 0
+
+        for task_file in files:
+            if task_file.url in errors:
+                continue
+
+            path: Path = args.output.joinpath(str(task_file.task_id), Path(task_file.name).name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # The stored file is shared with other tasks, so it's copied rather than linked
+            shutil.copyfile(self.firefly_client.files.get(task_file.url), path)
+            saved += 1
+
+            print('📤' if task_file.is_submission else '📎', Style.BRIGHT + str(path) + Style.RESET_ALL, Style.DIM + human_size(path.stat().st_size) + Style.RESET_ALL)
+
+        for url, error in errors.items():
+            print(warn('Could not download %s: %s' % (next(task_file.name for task_file in files if task_file.url == url), error)))
+
+        if not files:
+            print('No files')
+        else:
+            print(Style.DIM + 'Saved %d of %d files.' % (saved, len(files)) + Style.RESET_ALL)
+
+        if errors:
+            raise FireflyError('Please run %s again to resume the downloads that failed' % self.parser.prog)
+
+    # Get the files of the tasks and download each of them once, several at a time. Returns the files and the
+    # errors raised downloading them by URL.
+    def download(self, client: Client, task_ids: List[int]) -> (List[TaskFile], Dict[str, Exception]):
+        with ThreadPoolExecutor(max_workers=client.concurrency) as executor:
+            files: List[TaskFile] = [task_file for task_files in executor.map(client.get_task_files, task_ids) for task_file in task_files]
+            # The same worksheet is often set with several tasks
+            urls: List[str] = [url for url in dict.fromkeys(task_file.url for task_file in files) if not client.files.get(url)]
+            futures: Dict[Future, str] = {executor.submit(client.files.fetch, client, url): url for url in urls}
+            errors: Dict[str, Exception] = {}
+
+            for done, future in enumerate(as_completed(futures), 1):
+                client.spinner.text = 'Downloaded %d of %d files' % (done, len(futures))
+
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+
+        client.spinner.text = 'Retrieved the files of %d tasks' % len(task_ids)
+
+        return files, errors
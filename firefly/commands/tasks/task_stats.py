@@ -0,0 +1,120 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import json
+from .. import Command
+from colorama import Style
+from typing import List, Dict
+from firefly.cache import CacheEntry
+from firefly.parsers import DatePeriodParser
+from argparse import Namespace as Arguments
+from firefly.stats import TaskColumns, TaskGroup
+from firefly import Client, Task, TaskCompletionStatus, InputError
+
+# Reports the workload of the user's whole task history
+class TaskStats(Command):
+    # The command name
+    name: str = 'stats'
+
+    # The command description
+    description: str = 'Report on your workload across your whole task history: tasks due each week, tasks by setter and by class, the overdue rate and how far ahead tasks are set'
+
+    # Width of the longest bar in the weekly chart
+    BAR_WIDTH: int = 30
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('--due', action=DatePeriodParser, nargs='+', metavar=('FROM', '[UNTIL]'), help='Only report on tasks that are due no earlier than FROM, but no later than UNTIL. UNTIL defaults to FROM. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--offline', action='store_true', help='Report on the tasks mirrored by the last run, without retrieving them again.')
+        self.parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        tasks: List[Task] = self.get_tasks(args.offline)
+        columns: TaskColumns = TaskColumns.from_tasks(tasks)
+
+        if args.due:
+            columns = columns.where(columns.due_within(args.due))
+
+        if args.json:
+            print(json.dumps(self.to_dict(columns), indent=2))
+        else:
+            self.print_report(columns)
+
+    # Get the user's whole task history from the mirror, syncing it first if it's stale
+    def get_tasks(self, offline: bool) -> List[Task]:
+        client: Client = self.firefly_client
+        entry: CacheEntry = client.mirror.load()
+
+        if offline:
+            if not entry:
+                raise InputError('Your tasks have not been mirrored yet, so please run %s without --offline first' % self.parser.prog)
+
+            return entry.value
+
+        if entry and entry.age < client.cache_ttl['tasks']:
+            return entry.value
+
+        tasks: List[Task] = self.print_client_state(
+            lambda client: list(client.iter_tasks(completion_status=TaskCompletionStatus.ALL))
+        )
+        client.mirror.save(tasks)
+
+        return tasks
+
+    # Get the report as a dictionary
+    def to_dict(self, columns: TaskColumns) -> Dict:
+        total: TaskGroup = columns.total()
+
+        return {
+            'tasks': total.count,
+            'overdue': total.overdue,
+            'overdue_rate': total.overdue_rate,
+            'mean_lead_days': total.lead_days,
+            'due_per_week': [{'week': week.isoformat(), 'tasks': count} for week, count in columns.due_per_week()],
+            'setters': [group.to_dict() for group in columns.by_setter()],
+            'addressees': [group.to_dict() for group in columns.by_addressee()]
+        }
+
+    # Print the report
+    def print_report(self, columns: TaskColumns):
+        total: TaskGroup = columns.total()
+
+        if not total.count:
+            print('🎉 No tasks')
+            return
+
+        weeks = columns.due_per_week()
+        busiest: int = max(count for _, count in weeks) if weeks else 0
+
+        print(Style.BRIGHT + 'Tasks due each week' + Style.RESET_ALL)
+
+        for week, count in weeks:
+            print(Style.DIM + week.strftime('%d %b %Y') + Style.RESET_ALL, '▇' * round(count / busiest * self.BAR_WIDTH), count)
+
+        for heading, groups in [('By setter', columns.by_setter()), ('By class', columns.by_addressee())]:
+            # Personal tasks have no addressees, so there may be no classes to list
+            if not groups:
+                continue
+
+            print(Style.BRIGHT + heading + Style.RESET_ALL)
+            self.print_groups(groups)
+
+        print(Style.DIM + self.describe(total) + Style.RESET_ALL)
+
+    # Print a row for each group
+    def print_groups(self, groups: List[TaskGroup]):
+        labels: List[str] = [group.label or 'Unknown' for group in groups]
+        width: int = max(len(label) for label in labels)
+
+        for label, group in zip(labels, groups):
+            print(label.ljust(width), Style.DIM + self.describe(group) + Style.RESET_ALL)
+
+    # Describe the aggregate of a group
+    def describe(self, group: TaskGroup) -> str:
+        description: str = '%d tasks, %d overdue (%.0f%%)' % (group.count, group.overdue, group.overdue_rate * 100)
+
+        if group.lead_days is not None:
+            description += ', set %.1f days ahead on average' % group.lead_days
+
+        return description
@@ -0,0 +1,122 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import time
+import hashlib
+import subprocess
+from .. import Command
+from colorama import Style
+from typing import List, Dict, Set
+from firefly.fmt import human_date, warn
+from argparse import Namespace as Arguments
+from firefly import Client, FireflyError, Task, TaskCompletionStatus
+
+# Watch the to do list and print the tasks that change
+class WatchTasks(Command):
+    # The command name
+    name: str = 'watch'
+
+    # The command description
+    description: str = 'Watch your to do list, printing only the tasks that are added, changed or completed'
+
+    # Symbols printed for each kind of change
+    SYMBOLS: Dict[str, str] = {
+        'added': '🆕',
+        'changed': '✏️',
+        'completed': '✔️',
+        'left': '⤵️'
+    }
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('--interval', type=float, default=60, help='Seconds between polls while tasks are changing (defaults to 60).')
+        self.parser.add_argument('--max-interval', type=float, default=900, help='Seconds between polls that the interval backs off to while nothing changes (defaults to 900).')
+        self.parser.add_argument('--limit', type=int, default=100, help='Number of to do tasks to watch, soonest due first (defaults to 100).')
+        self.parser.add_argument('--exec', dest='hook', metavar='COMMAND', help='Shell command to run for each change. The change (added, changed, completed, or left when a task is pushed out of the --limit soonest due by one due sooner) and the task are passed in the FF_CHANGE, FF_TASK_ID, FF_TASK_TITLE and FF_TASK_DUE environment variables.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        snapshot_key: tuple = ('to do', args.limit)
+        entry = client.cache.get('watch', snapshot_key)
+        snapshot: Dict[int, str] = entry.value if entry else None
+        validator: str = None
+        interval: float = args.interval
+
+        while True:
+            try:
+                tasks, validator = client.poll_tasks(validator, completion_status=TaskCompletionStatus.TO_DO, limit=args.limit)
+            except FireflyError as e:
+                print(warn(str(e)), flush=True)
+                tasks = None
+
+            if tasks is not None:
+                current: Dict[int, str] = {task.id: self.digest(task) for task in tasks}
+
+                if snapshot is None:
+                    print(Style.DIM + 'Watching %d tasks' % len(current) + Style.RESET_ALL, flush=True)
+                elif self.print_changes(args, client, snapshot, current, {task.id: task for task in tasks}):
+                    interval = args.interval
+
+                snapshot = current
+                client.cache.put('watch', snapshot_key, snapshot)
+
+            time.sleep(interval)
+            # Back off while nothing changes
+            interval = min(interval * 1.5, args.max_interval)
+
+    # Hash the task attributes shown to the user
+    def digest(self, task: Task) -> str:
+        return hashlib.sha1(repr((task.title, task.due, task.set, task.is_done, task.setter.guid)).encode('utf-8')).hexdigest()
+
+    # Print the differences between two snapshots, returning whether there were any
+    def print_changes(self, args: Arguments, client: Client, old: Dict[int, str], new: Dict[int, str], tasks: Dict[int, Task]) -> bool:
+        changes: List = []
+
+        for task_id, digest in new.items():
+            if task_id not in old:
+                changes.append(('added', task_id))
+            elif old[task_id] != digest:
+                changes.append(('changed', task_id))
+
+        # Tasks leave the to do list when they're done, and the window watched when they're pushed out of it
+        missing: Set[int] = old.keys() - new.keys()
+        done: Set[int] = self.done_tasks(args, client, missing, len(changes), len(new))
+        changes += [('completed' if task_id in done else 'left', task_id) for task_id in missing]
+
+        for change, task_id in changes:
+            task: Task = tasks.get(task_id)
+            details: List[str] = [Style.BRIGHT + (task.title or '') + Style.RESET_ALL, Style.DIM + 'due ' + human_date(task.due) + Style.RESET_ALL] if task else []
+
+            print(self.SYMBOLS[change], Style.DIM + str(task_id) + Style.RESET_ALL, *details, flush=True)
+
+            if args.hook:
+                self.run_hook(args.hook, change, task_id, task)
+
+        return bool(changes)
+
+    # Get which of the tasks missing from the window watched were done. When the to do list is longer than the
+    # window, tasks added or due sooner push the last ones out of it, so the window is checked again with room for
+    # as many tasks as could have pushed them out; those still in it are to do, just no longer among the soonest due.
+    def done_tasks(self, args: Arguments, client: Client, missing: Set[int], pushed: int, size: int) -> Set[int]:
+        if not missing or size < args.limit:
+            return missing
+
+        try:
+            tasks, _ = client.poll_tasks(completion_status=TaskCompletionStatus.TO_DO, limit=args.limit + pushed)
+        except FireflyError as e:
+            print(warn(str(e)), flush=True)
+            return set()
+
+        return missing - {task.id for task in tasks}
+
+    # Run the hook command for a change
+    def run_hook(self, hook: str, change: str, task_id: int, task: Task = None):
+        subprocess.run(hook, shell=True, env=dict(
+            os.environ,
+            FF_CHANGE=change,
+            FF_TASK_ID=str(task_id),
+            FF_TASK_TITLE=task.title or '' if task else '',
+            FF_TASK_DUE=task.due.isoformat() if task and task.due else ''
+        ))
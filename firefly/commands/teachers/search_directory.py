@@ -24,10 +24,13 @@ class SearchDirectory(Command):
     def __call__(self, args: Arguments):
         surname: str = self.arg_or_ask('surname')
 
-        teachers: List[Teacher] = self.print_client_state(
-            lambda client: client.search_directory(surname)
+        self.print_stale_while_revalidate(
+            lambda client: client.search_directory(surname),
+            self.print_teachers
         )
 
+    # Print the teachers found
+    def print_teachers(self, teachers: List[Teacher]):
         if not teachers:
             print('No results found')
 
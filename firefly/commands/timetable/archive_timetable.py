@@ -0,0 +1,62 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .. import Command
+from typing import List
+from colorama import Style
+from firefly.archive import Archive
+from firefly.parsers import DateParser
+from argparse import Namespace as Arguments
+from datetime import date as Date, timedelta as TimeDelta
+from firefly import Client, Lesson, DatePeriod, InputError
+
+# Archives past timetables in the storage directory
+class ArchiveTimetable(Command):
+    # The command name
+    name: str = 'archive'
+
+    # The command description
+    description: str = 'Archive your timetable in a compact local store, so past timetables can be reported on without retrieving them again'
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('--from', action=DateParser, dest='from_date', metavar='FROM', help='The date from which to start the archive. Only needed for the first archive, as later archives carry on from the last date archived. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--until', action=DateParser, dest='until_date', metavar='UNTIL', default=Date.today() - TimeDelta(days=1), help='The last date to archive; defaults to yesterday. ' + self.INTELLEGENT_DATE_HINT)
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        archive: Archive = client.archive
+        archived: DatePeriod = archive.period()
+        from_date: Date = args.from_date
+
+        if archived:
+            next_date: Date = archived.until_date + TimeDelta(days=1)
+
+            if from_date and from_date > next_date:
+                raise InputError('The archive ends on %s, so it can only be extended from %s' % (archived.until_date, next_date))
+
+            # Skip the dates already archived
+            from_date = next_date
+        elif not from_date:
+            raise InputError('Please supply the date from which to start the archive with --from')
+
+        if from_date <= args.until_date:
+            period: DatePeriod = DatePeriod(from_date, args.until_date)
+
+            lessons: List[Lesson] = self.print_client_state(
+                lambda client: client.get_lessons_between(period)
+            )
+
+            count: int = archive.append(period, lessons)
+
+            print('🗄️ Archived %d lessons from %s until %s' % (count, period.from_date, period.until_date))
+
+        archived = archive.period()
+
+        if archived:
+            print(Style.DIM + 'The archive holds %d lessons from %s until %s in %.1f KB' % (
+                archive.meta()['rows'], archived.from_date, archived.until_date, archive.size() / 1024
+            ) + Style.RESET_ALL)
+        else:
+            print('🎉 Nothing to archive')
@@ -1,12 +1,14 @@
 # Copyright Paul Adams, 2020. All rights reserved.
 # Unauthorized reproduction is prohibited.
 
-import sys
 from .. import Command
-from typing import List
-from .event import Event, EventSet
+from typing import List, Dict, Set, IO
+from colorama import Style
+from firefly.rota import Rota, MAX_PERIOD
+from firefly.terms import find_year_end, year_horizon
+from firefly import ical
 from firefly.parsers import DateParser
-from firefly import Lesson, TimetablePeriod
+from firefly import Client, Lesson, DatePeriod, TimetablePeriod
 from argparse import Namespace as Arguments, FileType
 from datetime import date as Date, timedelta as TimeDelta
 
@@ -22,47 +24,232 @@ class ExportToCalendar(Command):
     def register_arguments(self):
         self.parser.add_argument('-o', '--output', type=FileType('w'), help='The path to which to write the calendar. Defaults to timetable-{--from as an ISO timestamp}.ics in the current directory.')
         self.parser.add_argument('--from', action=DateParser, dest='from_date', metavar='FROM', default=Date.today(), help='The date from which to start the calendar; defaults to today. ' + self.INTELLEGENT_DATE_HINT)
-        self.parser.add_argument('--until', action=DateParser, dest='until_date', metavar='UNTIL', help='The date at which to end the calendar; defaults to the end of the school year, calculated as the weekday before a holiday of length --timeout. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--until', action=DateParser, dest='until_date', metavar='UNTIL', help='The date at which to end the calendar; defaults to the end of the school year, calculated as the last week with lessons before a holiday of length --timeout. The end is searched for in a few requests, and remembered for later exports. ' + self.INTELLEGENT_DATE_HINT)
         self.parser.add_argument('--timeout', type=int, default=4, help='The activity timeout described in --until. Supply an integer number of minimum holiday weeks after which it is assumed the school year is over. Defaults to 4.')
+        self.parser.add_argument('--smart', type=int, nargs='?', const=4, metavar='WEEKS', help='Detect your rota from the first few weeks, then only retrieve one week in every WEEKS (defaults to 4) to check the rest follow it, retrieving every week around any that don\'t. Much faster, but a holiday between two weeks that were checked is missed unless an earlier export found it.')
 
     # Execute the command
     def __call__(self, args: Arguments):
-        timetable: List[Lesson] = self.get_lessons(
-            args.from_date,
-            args.until_date,
-            args.timeout
-        )
+        if args.smart:
+            lessons, sampled = self.print_client_state(
+                lambda client: self.get_lessons_by_rota(client, args.from_date, args.until_date, args.timeout, args.smart)
+            )
+        else:
+            lessons = self.print_client_state(lambda client: self.get_lessons(client, args.from_date, args.until_date, args.timeout))
+            sampled = None
 
-        events: EventSet = EventSet(
-            Event(
-                title=lesson.subject,
-                location=lesson.room,
-                start=lesson.start,
-                end=lesson.end
-            ) for lesson in timetable
-        )
+        output: IO = args.output or open('timetable-%s.ics' % args.from_date.isoformat(), 'w', newline='')
 
-        del timetable
+        with output:
+            output.write(ical.calendar('Timetable', [ical.lesson_events(lessons)]))
 
-        # with open(args.output) as output:
-        #     output.write('\n'.join(event.to_ical() for event in events))
+        print('📅 Exported %d lessons to %s' % (len(lessons), output.name))
 
-    # Get the lessons between the from and until dates
-    def get_lessons(self, from_date: Date, until_date: Date, timeout: int) -> List[Lesson]:
-        lessons: List[Lesson] = []
-        last_activity: Date = from_date
-        date: Date = from_date - TimeDelta(from_date.weekday())
+        if sampled:
+            print(Style.DIM + 'Retrieved %d of %d weeks; the rest follow your %d week rota.' % sampled + Style.RESET_ALL)
 
-        while date <= until_date if until_date else True and date - last_activity <= TimeDelta(weeks=timeout):
-            lessons += self.print_client_state(
-                lambda client: client.get_lessons(
-                    date, TimetablePeriod.WEEK
-                )
-            )
+    # Get the Monday of the last week of the school year with lessons from the week of a Monday on, or None if
+    # there are none. The end learned by an earlier export is used if the week is still the last with lessons;
+    # otherwise it's searched for. The lessons of the weeks checked are added to `probed` by Monday, if given.
+    def get_year_end(self, client: Client, monday: Date, timeout: int, probed: Dict[Date, List[Lesson]] = None) -> Date:
+        # Determine if a week has lessons
+        def is_active(week: Date) -> bool:
+            lessons: List[Lesson] = client.get_lessons(week, TimetablePeriod.WEEK)
+
+            if probed is not None:
+                probed[week] = lessons
+
+            return bool(lessons)
+
+        year_end: Date = client.terms.year_end(monday)
+        next_week: Date = year_end + TimeDelta(weeks=1) if year_end else None
+
+        if year_end and is_active(year_end) and (next_week > year_horizon(monday) or not is_active(next_week)):
+            return year_end
+
+        return find_year_end(monday, timeout, is_active)
+
+    # Group lessons by the Monday of their week, with every week from a Monday until a date
+    def group_by_week(self, lessons: List[Lesson], monday: Date, until_date: Date) -> Dict[Date, List[Lesson]]:
+        weeks: Dict[Date, List[Lesson]] = {}
+
+        while monday <= until_date:
+            weeks[monday] = []
+            monday += TimeDelta(weeks=1)
+
+        for lesson in lessons:
+            weeks[lesson.start.date() - TimeDelta(days=lesson.start.weekday())].append(lesson)
+
+        return weeks
+
+    # Get the date to export until, the until date or the end of the school year, and the Monday of the last week
+    # of the school year if it was searched for. The date is None if there are no lessons left in the year.
+    def get_until_date(self, client: Client, monday: Date, until_date: Date, timeout: int, probed: Dict[Date, List[Lesson]] = None) -> (Date, Date):
+        if until_date:
+            return until_date, None
+
+        year_end: Date = self.get_year_end(client, monday, timeout, probed)
+
+        return (year_end + TimeDelta(days=6) if year_end else None), year_end
+
+    # Retrieve every week of lessons from the from date until the until date, learning the term boundaries from them
+    def get_lessons_between(self, client: Client, from_date: Date, until_date: Date, year_end: Date) -> List[Lesson]:
+        lessons: List[Lesson] = client.get_lessons_between(DatePeriod(from_date, until_date))
+        client.terms.learn(self.group_by_week(lessons, from_date - TimeDelta(days=from_date.weekday()), until_date), year_end)
+
+        return lessons
+
+    # Get the lessons from the from date until the until date, or the end of the school year
+    def get_lessons(self, client: Client, from_date: Date, until_date: Date, timeout: int) -> List[Lesson]:
+        until_date, year_end = self.get_until_date(client, from_date - TimeDelta(days=from_date.weekday()), until_date, timeout)
+
+        if not until_date:
+            return []
+
+        return self.get_lessons_between(client, from_date, until_date, year_end)
+
+    # Get the lessons from the from date until the until date, or the end of the school year, by detecting the rota
+    # from the first weeks, then only checking one week in every few follows it. When one doesn't, the weeks up to
+    # it are retrieved too, as are the weeks of a holiday it falls in, until the rota carries on. Without an until
+    # date or an end of the year learned by an earlier export, the end is found along the way, as the last week
+    # with lessons before a holiday of `timeout` weeks, rather than searched for first. Weeks retrieved to check
+    # a learned end are reused, and checked in preference to others. Holidays learned by earlier exports are left
+    # empty rather than following the rota. Returns the lessons, and how many of how many weeks were retrieved
+    # under a rota of how many weeks, or None if no rota was found.
+    def get_lessons_by_rota(self, client: Client, from_date: Date, until_date: Date, timeout: int, every: int) -> (List[Lesson], tuple):
+        monday: Date = from_date - TimeDelta(days=from_date.weekday())
+        # Lessons of the weeks retrieved while checking the end of the year, by Monday
+        probed: Dict[Date, List[Lesson]] = {}
+        is_searching: bool = not until_date and not client.terms.year_end(monday)
+
+        if is_searching:
+            until_date, year_end = year_horizon(monday) + TimeDelta(days=6), None
+        else:
+            until_date, year_end = self.get_until_date(client, monday, until_date, timeout, probed)
+
+            if not until_date:
+                return [], None
+
+        holidays: Set[Date] = client.terms.holidays()
+        # Lessons of each week by Monday, retrieved or expected by the rota
+        weeks: Dict[Date, List[Lesson]] = {}
+        # Weeks retrieved since the rota was lost, from which it's detected again
+        retrieved: Dict[Date, List[Lesson]] = {}
+        requested: Set[Date] = set()
+        rota: Rota = None
+        period: int = None
+        is_holiday: bool = False
+
+        # Get the Mondays of the weeks from the current one, up to a number of them
+        def window(length: int) -> List[Date]:
+            return [week for week in (monday + TimeDelta(weeks=i) for i in range(length)) if week <= until_date]
 
-            if lessons:
-                last_activity = lessons[-1].end.date()
+        # Retrieve the lessons of weeks by Monday, other than those already probed
+        def retrieve(window: List[Date]) -> Dict[Date, List[Lesson]]:
+            lessons_by_week: Dict[Date, List[Lesson]] = {week: list(probed.get(week, [])) for week in window}
+            missing: List[Date] = [week for week in window if week not in probed]
 
-            date += TimeDelta(weeks=1)
+            if missing:
+                for lesson in client.get_lessons_between(DatePeriod(missing[0], missing[-1] + TimeDelta(days=6))):
+                    week: Date = lesson.start.date() - TimeDelta(days=lesson.start.weekday())
+
+                    if week in lessons_by_week and week not in probed:
+                        lessons_by_week[week].append(lesson)
+
+            requested.update(window)
+            weeks.update(lessons_by_week)
+
+            return lessons_by_week
+
+        # Determine if the `timeout` weeks before the current one were retrieved without lessons, so the year is over
+        def is_over() -> bool:
+            recent: List[Date] = [monday - TimeDelta(weeks=i) for i in range(1, timeout + 1)]
+
+            return all(week in requested and not weeks[week] for week in recent)
+
+        while monday <= until_date:
+            if is_searching and is_over():
+                break
+
+            if not rota:
+                # Retrieve whole windows until the weeks since the rota was lost follow one
+                lessons_by_week: Dict[Date, List[Lesson]] = retrieve(window(2 * MAX_PERIOD))
+                retrieved.update(lessons_by_week)
+                rota = Rota.detect(retrieved)
+
+                if rota:
+                    period, retrieved = rota.period, {}
+
+                monday = max(lessons_by_week) + TimeDelta(weeks=1)
+            elif is_holiday:
+                # Retrieve a week at a time until the holiday is over, then pick the rota up from there
+                lessons_by_week = retrieve(window(1))
+                lessons = lessons_by_week[monday]
+
+                if lessons:
+                    is_holiday = False
+
+                    if not rota.realign(monday, lessons):
+                        rota, retrieved = None, lessons_by_week
+
+                monday += TimeDelta(weeks=1)
+            else:
+                candidates: List[Date] = window(every)
+                # Known holidays would only be sampled to find them empty, and probed weeks cost nothing to check
+                sampled: Date = max([week for week in candidates if week not in holidays] or candidates, key=lambda week: (week in probed, week))
+                lessons = retrieve([sampled])[sampled]
+
+                if rota.expects(sampled, lessons):
+                    # Weeks probed are as retrieved, whatever the rota expects
+                    retrieve([week for week in candidates if week in probed])
+                    weeks.update((week, [] if week in holidays else rota.lessons(week)) for week in candidates if week not in requested)
+                    monday = candidates[-1] + TimeDelta(weeks=1)
+                    continue
+
+                earlier: List[Date] = [week for week in candidates if week < sampled and week not in requested]
+
+                # A holiday started, so walk back to the last week with lessons before it. If that week follows the
+                # rota, so do the ones before it.
+                while not lessons and earlier:
+                    week = earlier.pop()
+                    week_lessons: List[Lesson] = retrieve([week])[week]
+
+                    if week_lessons:
+                        if rota.expects(week, week_lessons):
+                            weeks.update((week, [] if week in holidays else rota.lessons(week)) for week in earlier)
+                            earlier = []
+
+                        break
+
+                # Something changed, so retrieve the weeks before it as well, and carry on after it
+                if earlier:
+                    retrieve(earlier)
+
+                if not lessons:
+                    is_holiday = True
+                elif not rota.realign(sampled, lessons):
+                    # The timetable itself changed
+                    rota, retrieved = None, {week: weeks[week] for week in candidates if week <= sampled}
+
+                monday = sampled + TimeDelta(weeks=1)
+
+        if is_searching:
+            active: List[Date] = [week for week in requested if weeks[week]]
+
+            if not active:
+                return [], None
+
+            year_end = max(active)
+            until_date = year_end + TimeDelta(days=6)
+
+        client.terms.learn({week: weeks[week] for week in requested}, year_end)
+
+        lessons = sorted(
+            (
+                lesson for week in weeks.values() for lesson in week
+                if from_date <= lesson.start.date() <= until_date
+            ),
+            key=lambda lesson: lesson.start
+        )
 
-        return lessons
\ No newline at end of file
+        return lessons, (len(requested), len(weeks), period) if period else None
@@ -3,12 +3,14 @@
 
 from .. import Command
 from colorama import Style
-from typing import Callable, List
+from typing import Callable, List, Dict
 from firefly.parsers import DateParser
 from argparse import Namespace as Arguments
 from .export_timetable import ExportToCalendar
-from datetime import date as Date, time as Time
-from firefly import TimetablePeriod, Lesson, Teacher
+from .archive_timetable import ArchiveTimetable
+from .timetable_stats import TimetableStats
+from datetime import date as Date, time as Time, timedelta as TimeDelta
+from firefly import prefetch, Client, TimetablePeriod, Lesson, Teacher, DatePeriod
 
 # Retrieves the user's timetable
 class GetTimetable(Command):
@@ -20,23 +22,55 @@ class GetTimetable(Command):
 
     # The subcommands
     subcommands: List[Command] = [
-        ExportToCalendar
+        ExportToCalendar,
+        ArchiveTimetable,
+        TimetableStats
     ]
 
     # Register the command arguments
     def register_arguments(self):
         self.parser.add_argument('-d', '--date', action=DateParser, default=Date.today(), help='The timetable date; defaults to today. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--from', action=DateParser, dest='from_date', metavar='FROM', help='Show the timetable for a range of dates starting at FROM, instead of a single --date. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--until', action=DateParser, dest='until_date', metavar='UNTIL', help='The last date of the range started by --from; defaults to --from. ' + self.INTELLEGENT_DATE_HINT)
 
     # Execute the command
     def __call__(self, args: Arguments):
-        timetable: List[Lesson] = self.print_client_state(
-            lambda client: client.get_lessons(args.date, TimetablePeriod.DAY)
-        )
+        show_dates: bool = bool(args.from_date or args.until_date)
 
+        if show_dates:
+            period: DatePeriod = DatePeriod(args.from_date or Date.today(), args.until_date)
+            fetch: Callable[[Client], List[Lesson]] = lambda client: client.get_lessons_between(period)
+        else:
+            fetch = lambda client: client.get_lessons(args.date, TimetablePeriod.DAY)
+
+        self.print_stale_while_revalidate(fetch, lambda timetable: self.print_timetable(timetable, show_dates))
+
+    # Print the timetable, or a message if it's empty
+    def print_timetable(self, timetable: List[Lesson], show_dates: bool):
         if len(timetable) < 1:
             print('🎉 No lessons in timetable')
 
+        self.print_lessons(timetable, show_dates=show_dates)
+
+    # Prefetch the week holding the next school day, or the week after the range, and the tasks
+    def prefetch_jobs(self, args: Arguments) -> List[Dict]:
+        last_date: Date = args.until_date or args.from_date or args.date
+        next_date: Date = prefetch.next_school_day(last_date)
+
+        return [
+            prefetch.lessons_job(next_date - TimeDelta(days=next_date.weekday()), TimetablePeriod.WEEK.foreign_name),
+            prefetch.tasks_job()
+        ]
+
+    # Print the lessons, with a heading for each date if asked
+    def print_lessons(self, timetable: List[Lesson], show_dates: bool = False):
+        date: Date = None
+
         for lesson in timetable:
+            if show_dates and lesson.start.date() != date:
+                date = lesson.start.date()
+                print(Style.BRIGHT + date.strftime('%A %d %B') + Style.RESET_ALL)
+
             time_format: Callable[[Time], [str]] = lambda time: time.strftime('%H:%M')
             time_period: str = time_format(lesson.start) + ' - ' + time_format(lesson.end)
 
@@ -53,4 +87,4 @@ class GetTimetable(Command):
 
             for value in [teacher_name, room]:
                 if value:
-                    print(padding + value)
\ No newline at end of file
+                    print(padding + value)
@@ -0,0 +1,98 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .. import Command
+from colorama import Style
+from typing import List, Dict
+from firefly.times import FREE_PERIOD
+from firefly.parsers import DateParser
+from argparse import Namespace as Arguments
+from datetime import date as Date, timedelta as TimeDelta
+from firefly import Client, Lesson, DatePeriod, InputError
+from firefly.stats import LessonColumns, LessonGroup, GROUPS
+
+# Reports how contact time is split between subjects, teachers, rooms or weekdays
+class TimetableStats(Command):
+    # The command name
+    name: str = 'stats'
+
+    # The command description
+    description: str = 'Total your contact time over a range of dates by subject, teacher, room or weekday'
+
+    # Labels for lessons without a value in the group
+    MISSING: Dict[str, str] = {
+        'subject': 'No subject',
+        'teacher': 'No teacher',
+        'room': 'No room'
+    }
+
+    # Register the command arguments
+    def register_arguments(self):
+        self.parser.add_argument('--from', action=DateParser, dest='from_date', metavar='FROM', help='The first date to report on; defaults to the start of the archive, or today if nothing has been archived. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--until', action=DateParser, dest='until_date', metavar='UNTIL', default=Date.today(), help='The last date to report on; defaults to today. ' + self.INTELLEGENT_DATE_HINT)
+        self.parser.add_argument('--by', choices=GROUPS, default='subject', help='The field to group lessons by; defaults to subject.')
+
+    # Execute the command
+    def __call__(self, args: Arguments):
+        client: Client = self.firefly_client
+        archived: DatePeriod = client.archive.period()
+        from_date: Date = args.from_date or (archived.from_date if archived else Date.today())
+
+        if from_date > args.until_date:
+            raise InputError('--from must not be after --until')
+
+        period: DatePeriod = DatePeriod(from_date, args.until_date)
+        columns: LessonColumns = LessonColumns.empty()
+        missing: List[DatePeriod] = [period]
+
+        if archived and archived.from_date <= period.until_date and period.from_date <= archived.until_date:
+            with client.archive.view() as view:
+                columns = LessonColumns.from_archive(view, DatePeriod(
+                    max(period.from_date, archived.from_date),
+                    min(period.until_date, archived.until_date)
+                ))
+
+            # Only retrieve the dates either side of the archive
+            missing = [
+                DatePeriod(period.from_date, archived.from_date - TimeDelta(days=1)),
+                DatePeriod(archived.until_date + TimeDelta(days=1), period.until_date)
+            ]
+            missing = [dates for dates in missing if dates.from_date <= dates.until_date]
+
+        if missing:
+            lessons: List[Lesson] = self.print_client_state(
+                lambda client: [lesson for dates in missing for lesson in client.get_lessons_between(dates)]
+            )
+            columns = columns.extend(lessons)
+
+        groups: List[LessonGroup] = columns.group(args.by, client.bells.labels + [FREE_PERIOD])
+
+        if not groups:
+            print('🎉 No lessons between %s and %s' % (period.from_date, period.until_date))
+            return
+
+        self.print_groups(args.by, groups)
+
+        print(Style.DIM + '%d lessons, %s of contact time from %s until %s' % (
+            sum(group.count for group in groups),
+            self.hours(sum(group.seconds for group in groups)),
+            period.from_date,
+            period.until_date
+        ) + Style.RESET_ALL)
+
+    # Print a row for each group
+    def print_groups(self, by: str, groups: List[LessonGroup]):
+        labels: List[str] = [group.label or self.MISSING[by] for group in groups]
+        width: int = max(len(label) for label in labels)
+
+        for label, group in zip(labels, groups):
+            print(
+                Style.BRIGHT + label.ljust(width) + Style.RESET_ALL,
+                '%4d lessons' % group.count,
+                self.hours(group.seconds).rjust(11),
+                Style.DIM + '%5.1f%%' % (group.share * 100) + Style.RESET_ALL
+            )
+
+    # Format seconds as hours
+    def hours(self, seconds: float) -> str:
+        return '%.1f hours' % (seconds / 3600)
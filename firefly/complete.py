@@ -0,0 +1,250 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+# Shell completion for ff. The completion scripts run this file with `python -S -E` each time tab is pressed, so
+# it only imports the standard library, and never the rest of the package, whose imports alone take longer than
+# completion should. Candidates come from indexes in the storage directory and never from Firefly:
+# the commands and their arguments are indexed when the completion script is generated, and the tasks, setters
+# and classes whenever tasks are retrieved.
+
+import os
+import sys
+import json
+import threading
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterable
+
+# The storage path, as in firefly.config, which can't be imported here
+PATH: Path = Path.home().joinpath('.ff-timetable')
+
+# Name of the index of tasks, setters and classes in each account's storage directory
+INDEX_NAME: str = 'completion.json'
+
+# Path of the index of commands and their arguments
+COMMANDS_PATH: Path = PATH.joinpath('commands.json')
+
+# Most recently retrieved tasks kept in the index
+MAX_TASKS: int = 500
+
+# Number of values an option or positional takes when it takes any number of them
+MANY: int = -1
+
+# Index of the tasks, setters and classes retrieved from Firefly, which completes task IDs and GUIDs
+class CompletionIndex():
+    # Create an instance
+    def __init__(self, path: Path):
+        # Only the client writes the index, so the rest of the package is only imported here
+        from .lock import FileLock
+
+        self.path: Path = path
+        self.lock: FileLock = FileLock(path.with_name(path.name + '.lock'))
+
+    # Read the index
+    def read(self) -> Dict:
+        return _read_json(self.path)
+
+    # Remember tasks and who they were set by and to, replacing what's known about them
+    def add_tasks(self, tasks: Iterable):
+        with self.lock:
+            self._add_tasks(tasks)
+
+    # Remember tasks while the index is locked
+    def _add_tasks(self, tasks: Iterable):
+        index: Dict = self.read()
+        indexed_tasks: Dict[str, Dict] = index.get('tasks', {})
+        setters: Dict[str, str] = index.get('setters', {})
+        addressees: Dict[str, str] = index.get('addressees', {})
+
+        for task in tasks:
+            # Most recent last, so the oldest are dropped first
+            indexed_tasks.pop(str(task.id), None)
+            indexed_tasks[str(task.id)] = {'title': task.title, 'done': task.is_done}
+
+            if task.setter and task.setter.guid:
+                setters[task.setter.guid] = task.setter.name
+
+            for addressee in task.addressees:
+                if addressee.guid:
+                    addressees[addressee.guid] = addressee.name
+
+        index.update(
+            tasks=dict(list(indexed_tasks.items())[-MAX_TASKS:]),
+            setters=setters,
+            addressees=addressees
+        )
+
+        _write_json(self.path, index)
+
+# Read a JSON file, or an empty object if there isn't one
+def _read_json(path: Path) -> Dict:
+    try:
+        with path.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Replace a JSON file
+def _write_json(path: Path, value: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Each writer gets its own temporary file, as in the cache
+    tmp_path: Path = path.with_name('%s.%d.%d.tmp' % (path.name, os.getpid(), threading.get_ident()))
+
+    with tmp_path.open('w') as f:
+        json.dump(value, f)
+
+    os.replace(tmp_path, path)
+
+# Index the commands, their options and positionals, as described by describe_parser
+def index_commands(tree: Dict):
+    _write_json(COMMANDS_PATH, tree)
+
+# Describe an argparse parser and its subparsers as a tree of plain values
+def describe_parser(parser) -> Dict:
+    import argparse
+
+    # Get the number of values an action takes
+    def count(action: argparse.Action) -> int:
+        if action.nargs is None or action.nargs == argparse.OPTIONAL:
+            return 1
+
+        if isinstance(action.nargs, int):
+            return action.nargs
+
+        return MANY
+
+    node: Dict = {'options': {}, 'positionals': [], 'commands': {}}
+
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            node['commands'] = {name: describe_parser(subparser) for name, subparser in action.choices.items()}
+        elif action.option_strings:
+            for option in action.option_strings:
+                node['options'][option] = {
+                    'dest': action.dest,
+                    'nargs': count(action),
+                    'choices': [str(choice) for choice in action.choices] if action.choices else None,
+                    'help': (action.help or '').replace('%(prog)s', parser.prog).replace('%%', '%').split('. ')[0]
+                }
+        else:
+            node['positionals'].append({
+                'dest': action.dest,
+                'nargs': count(action),
+                'choices': [str(choice) for choice in action.choices] if action.choices else None
+            })
+
+    return node
+
+# Get the indexes of the accounts the command line runs for
+def _account_indexes(words: List[str]) -> List[Dict]:
+    names: List[str] = []
+
+    for i, word in enumerate(words):
+        if word == '--accounts' and i + 1 < len(words):
+            names = words[i + 1].split(',')
+        elif word.startswith('--accounts='):
+            names = word.split('=', 1)[1].split(',')
+        elif word == '--all-accounts' and PATH.joinpath('accounts').is_dir():
+            names = [path.name for path in PATH.joinpath('accounts').iterdir()]
+
+    paths: List[Path] = [PATH.joinpath('accounts', name, INDEX_NAME) for name in names if name] or [PATH.joinpath(INDEX_NAME)]
+
+    return [_read_json(path) for path in paths]
+
+# Get the values that complete an argument from the indexes, with their descriptions
+def _values(command: str, dest: str, indexes: List[Dict]) -> List[Tuple[str, str]]:
+    values: List[Tuple[str, str]] = []
+
+    for index in indexes:
+        if dest in ['id', 'ids']:
+            for task_id, task in reversed(list(index.get('tasks', {}).items())):
+                # Only tasks that can be marked as done are offered to done, and the same for todo
+                if (command == 'done' and task['done']) or (command == 'todo' and not task['done']):
+                    continue
+
+                values.append((task_id, task['title']))
+        elif dest == 'set_by':
+            values.extend(index.get('setters', {}).items())
+        elif dest == 'set_to':
+            values.extend(index.get('addressees', {}).items())
+
+    return values
+
+# Get the candidates for the last word of a command line, which is being completed, with their descriptions
+def candidates(words: List[str], tree: Dict) -> List[Tuple[str, str]]:
+    *previous, current = words or ['']
+    node: Dict = tree
+    command: str = None
+    # Option whose values are being given, and how many more it takes
+    option: Dict = None
+    remaining: int = 0
+    positionals: int = 0
+    # Values given to the current positional so far
+    given: int = 0
+
+    for word in previous:
+        if word.startswith('-') and word.split('=', 1)[0] in node['options']:
+            option = node['options'][word.split('=', 1)[0]]
+            remaining = 0 if '=' in word else option['nargs']
+        elif remaining:
+            # Options that take any number of values keep taking them
+            remaining -= 1 if remaining != MANY else 0
+        elif word in node['commands']:
+            command = word
+            node = node['commands'][word]
+            positionals = given = 0
+        elif positionals < len(node['positionals']):
+            given += 1
+
+            if node['positionals'][positionals]['nargs'] != MANY and given >= node['positionals'][positionals]['nargs']:
+                positionals += 1
+                given = 0
+
+    results: List[Tuple[str, str]] = []
+
+    if remaining:
+        argument: Dict = option
+    elif positionals < len(node['positionals']) and not current.startswith('-'):
+        argument = node['positionals'][positionals]
+    else:
+        argument = None
+
+    if argument:
+        if argument['choices']:
+            results.extend((choice, '') for choice in argument['choices'])
+        else:
+            results.extend(_values(command, argument['dest'], _account_indexes(previous)))
+
+    # Options that take any number of values can be followed by anything else
+    if not remaining or remaining == MANY:
+        if current.startswith('-'):
+            results.extend((name, option['help']) for name, option in node['options'].items())
+        elif not argument:
+            results.extend((name, '') for name in node['commands'])
+
+    # Values already given aren't offered again
+    return [(value, description) for value, description in results if value.startswith(current) and value not in previous]
+
+# Print the candidates for a command line in the format a shell reads
+def main(argv: List[str]):
+    if len(argv) < 2:
+        sys.exit('Usage: complete.py bash|zsh|fish [WORD ...]')
+
+    shell: str = argv[1]
+    tree: Dict = _read_json(COMMANDS_PATH)
+
+    # The completion script hasn't been generated yet
+    if not tree:
+        return
+
+    for value, description in candidates(argv[2:], tree):
+        description = ' '.join(str(description or '').split())
+
+        if shell == 'zsh':
+            print(value.replace(':', '\\:') + (':' + description if description else ''))
+        elif shell == 'fish':
+            print(value + ('\t' + description if description else ''))
+        else:
+            print(value)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -4,7 +4,8 @@
 import os
 from .input import ask
 from pathlib import Path
-from . import fmt, factories
+from typing import Dict
+from . import fmt
 from .errors import ConfigError
 from configparser import ConfigParser, NoSectionError, NoOptionError, _UNSET
 
@@ -16,6 +17,13 @@ REPO_URL: str = 'https://github.com/pauladams8/timetable'
 PATH: Path = Path.home().joinpath('.ff-timetable')
 # The config file path
 CONFIG_PATH: Path = PATH.joinpath('timetable.conf')
+# Default seconds for which cached results are fresh, by cache namespace, when prefetching is enabled to fill the
+# cache. Otherwise results are always retrieved again unless the `[cache]` config section sets a lifetime.
+CACHE_TTL: Dict[str, float] = {
+    'lessons': 12 * 60 * 60,
+    'tasks': 5 * 60,
+    'directory': 24 * 60 * 60
+}
 # The Sentry DSN
 SENTRY_DSN = 'https://bd151808309343b7b8cc0338021a2722@o490264.ingest.sentry.io/5553897'
 
@@ -28,12 +36,23 @@ if not CONFIG_PATH.is_file():
     CONFIG_PATH.touch()
 
 # Create the config parser singleton
-Parser: ConfigParser = factories.config_parser()
+Parser: ConfigParser = ConfigParser()
+Parser.read(CONFIG_PATH)
 
 # Determine if debug mode is on
 def debug_mode() -> bool:
     return Parser.getboolean('general', 'debug', fallback=False) or os.getenv('ENVIRONMENT') == 'dev'
 
+# Get the seconds for which cached results are fresh, by cache namespace. Caching is opt-in: the defaults only apply
+# when prefetching is enabled, and the `[cache]` section overrides them either way.
+def cache_ttl(parser: ConfigParser = Parser) -> Dict[str, float]:
+    is_prefetching: bool = parser.getboolean('prefetch', 'enabled', fallback=False)
+
+    return {
+        namespace: parser.getfloat('cache', namespace, fallback=ttl if is_prefetching else 0)
+        for namespace, ttl in CACHE_TTL.items()
+    }
+
 # Get a value from the config file or ask the user if it doesn't exist
 def get(section: str, key: str, default = _UNSET, can_ask: bool = True):
     try:
@@ -0,0 +1,72 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from lxml import etree
+from .resources import Teacher
+from typing import List, Iterable, Iterator
+
+# Id of the element holding the results table
+RESULTS_ID: str = 'StaffResults'
+
+# Queries run against each row, compiled once
+CELLS: etree.XPath = etree.XPath('.//td')
+FIRST_TEXT: etree.XPath = etree.XPath('(.//text())[1]')
+ALL_TEXT: etree.XPath = etree.XPath('.//text()')
+FIRST_IMAGE_SOURCE: etree.XPath = etree.XPath('string((.//img)[1]/@src)')
+FIRST_HEADING: etree.XPath = etree.XPath('string((.//h3)[1])')
+FIRST_LINK: etree.XPath = etree.XPath('string((.//a)[1])')
+
+# Parse a row of the results table
+def parse_row(row: etree.Element) -> Teacher:
+    cells: List[etree.Element] = CELLS(row)
+    phone_number: List[str] = FIRST_TEXT(cells[4])
+    email_address: str = FIRST_LINK(cells[4])
+
+    return Teacher(
+        name=FIRST_HEADING(cells[1]),
+        picture=FIRST_IMAGE_SOURCE(cells[0]),
+        roles=[role.strip() for role in ALL_TEXT(cells[2]) if role],
+        departments=[department.strip() for department in ''.join(ALL_TEXT(cells[3])).split(', ') if department],
+        phone_number=phone_number[0].strip() if phone_number else None,
+        email_address=email_address.strip()
+    )
+
+# Parse the staff in the results table of a directory page as its body arrives, yielding each one as soon as
+# its row is complete. Rows are discarded once they're parsed, and the rest of the page isn't parsed at all.
+def parse_directory(chunks: Iterable[bytes], encoding: str = None) -> Iterator[Teacher]:
+    parser: etree.HTMLPullParser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+    table: etree.Element = None
+    rows: int = 0
+
+    for chunk in chunks:
+        parser.feed(chunk)
+
+        for event, element in parser.read_events():
+            if event == 'start':
+                # The results are the first table directly inside the results element
+                if table is None and element.tag == 'table' and element.getparent() is not None and element.getparent().get('id') == RESULTS_ID:
+                    table = element
+
+                continue
+
+            if table is None:
+                continue
+
+            if element is table:
+                return
+
+            # Rows of the results table, rather than of any table inside it
+            if element.tag == 'tr' and next(element.iterancestors('table'), None) is table:
+                rows += 1
+
+                # The first row is the header
+                if rows > 1:
+                    yield parse_row(element)
+
+                element.clear()
+
+                # Drop the rows before it too, so the table never holds more than one
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+    parser.close()
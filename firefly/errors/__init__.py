@@ -4,4 +4,5 @@
 from .input import InputError
 from .error import FireflyError
 from .config import ConfigError
-from .auth import AuthenticationError
\ No newline at end of file
+from .auth import AuthenticationError
+from .server import ServerError
\ No newline at end of file
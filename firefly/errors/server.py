@@ -0,0 +1,8 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from .error import FireflyError
+
+# Raised when Firefly is down or overloaded, so the request may succeed if it's sent again later
+class ServerError(FireflyError):
+    pass
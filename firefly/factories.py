@@ -2,30 +2,44 @@
 # Unauthorized reproduction is prohibited.
 
 from . import config
+from pathlib import Path
+from . import scheduler
 from .client import Client
-from .errors import ConfigError
-from configparser import ConfigParser, SectionProxy
+from .times import BellSchedule
 
-# Create a new configparser.ConfigParser
-def config_parser():
-    config_parser = ConfigParser()
-    config_parser.read(config.CONFIG_PATH)
+# Create a new Client for the `[firefly]` config section, or for an `[account:NAME]` section. Account sections
+# fall back to the `[firefly]` section for everything but the credentials, and keep their session and cache apart.
+def firefly_client(can_ask: bool = True, account: str = None):
+    section: str = 'account:' + account if account else 'firefly'
+    storage_path: Path = config.PATH.joinpath('accounts', account) if account else config.PATH
 
-    return config_parser
-
-# Create a new Client
-def firefly_client(can_ask: bool = True):
-    section: str = 'firefly'
-
-    # Get a config value from the Firefly section
+    # Get a config value from the Firefly or account section
     def get_config(key: str, default = config._UNSET) -> str:
+        if account and key not in ['username', 'password']:
+            default = config.Parser.get('firefly', key, fallback=default)
+
         return config.get(section, key, default, can_ask)
 
-    url: str = get_config('protocol', 'https') + '://' + get_config('hostname')
+    hostname: str = get_config('hostname')
+    url: str = get_config('protocol', 'https') + '://' + hostname
+    concurrency: int = int(get_config('concurrency', 4))
+
+    storage_path.mkdir(parents=True, exist_ok=True)
 
     return Client(
         url=url,
         username=get_config('username'),
         password=get_config('password'),
-        storage_path=config.PATH
-    )
\ No newline at end of file
+        storage_path=storage_path,
+        session_lifetime=float(get_config('session_lifetime', 1200)),
+        concurrency=concurrency,
+        cache_ttl=config.cache_ttl(),
+        bells=BellSchedule.from_config(config.Parser),
+        transport=get_config('transport', 'http1'),
+        # Every account on the server shares its rate limit
+        scheduler=scheduler.shared(
+            config.PATH.joinpath('scheduler', hostname.replace(':', '_') + '.json'),
+            rate=float(get_config('rate_limit', 50)),
+            concurrency=concurrency
+        )
+    )
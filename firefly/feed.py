@@ -0,0 +1,171 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import sys
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from . import ical
+from .client import Client
+from .fmt import warn
+from .resources import Lesson, Task
+from typing import List, Dict
+from http import HTTPStatus
+from .enums import TimetablePeriod, TaskCompletionStatus
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as Date, timedelta as TimeDelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Serialised calendar and its strong ETag
+class Document():
+    # Create an instance
+    def __init__(self, body: bytes):
+        self.body: bytes = body
+        self.etag: str = '"%s"' % hashlib.sha256(body).hexdigest()
+
+# Calendar feed, kept serialised so requests are answered without touching Firefly
+class Feed(ABC):
+    # Create an instance
+    def __init__(self, client: Client, name: str):
+        self.client: Client = client
+        self.name: str = name
+        # Serialised events by the key of the part of the feed they belong to
+        self._blocks: Dict = {}
+        # Replaced whole, so requests never see a half built document
+        self.document: Document = None
+
+    # Get the keys of the blocks that make up the feed, in order
+    @abstractmethod
+    def keys(self) -> List:
+        pass
+
+    # Serialise the events of each block
+    @abstractmethod
+    def serialise(self, keys: List) -> List[str]:
+        pass
+
+    # Serialise the blocks again and rebuild the document if any of them changed, returning whether it did
+    def refresh(self) -> bool:
+        keys: List = self.keys()
+        blocks: Dict = dict(zip(keys, self.serialise(keys)))
+
+        if self.document and blocks == self._blocks:
+            return False
+
+        self._blocks = blocks
+        self.document = Document(ical.calendar(self.name, [blocks[key] for key in keys]).encode('utf-8'))
+
+        return True
+
+# Lessons in a window of weeks around the current one, with a block per week
+class TimetableFeed(Feed):
+    # Create an instance
+    def __init__(self, client: Client, weeks_before: int, weeks_after: int):
+        super().__init__(client, 'Timetable')
+        self.weeks_before: int = weeks_before
+        self.weeks_after: int = weeks_after
+
+    # Get the Mondays of the weeks in the window
+    def keys(self) -> List[Date]:
+        today: Date = Date.today()
+        monday: Date = today - TimeDelta(days=today.weekday())
+
+        return [monday + TimeDelta(weeks=week) for week in range(-self.weeks_before, self.weeks_after + 1)]
+
+    # Serialise the lessons of each week, which come from the cache until they go stale
+    def serialise(self, keys: List[Date]) -> List[str]:
+        with ThreadPoolExecutor(max_workers=self.client.concurrency) as executor:
+            weeks: List[List[Lesson]] = list(executor.map(lambda monday: self.client.get_lessons(monday, TimetablePeriod.WEEK), keys))
+
+        return [ical.lesson_events(lessons) for lessons in weeks]
+
+# Tasks to do, as all day events on their due dates
+class TasksFeed(Feed):
+    # Create an instance
+    def __init__(self, client: Client):
+        super().__init__(client, 'Tasks')
+
+    # Get the single block key
+    def keys(self) -> List[str]:
+        return ['tasks']
+
+    # Serialise every task to do
+    def serialise(self, keys: List[str]) -> List[str]:
+        tasks: List[Task] = list(self.client.iter_tasks(completion_status=TaskCompletionStatus.TO_DO))
+
+        return [ical.task_events(tasks)]
+
+# Serves feeds over HTTP, refreshing them in the background
+class FeedServer(ThreadingHTTPServer):
+    # Don't keep the process alive for open connections
+    daemon_threads: bool = True
+
+    # Create an instance
+    def __init__(self, host: str, port: int, feeds: Dict[str, Feed], interval: float):
+        super().__init__((host, port), _FeedRequestHandler)
+        # Feeds by path
+        self.feeds: Dict[str, Feed] = feeds
+        self.interval: float = interval
+        self._stopped: threading.Event = threading.Event()
+
+    # Build every feed, then keep refreshing them every interval until the server is closed
+    def start_refreshing(self):
+        for feed in self.feeds.values():
+            feed.refresh()
+
+        threading.Thread(target=self._refresh_forever, daemon=True).start()
+
+    # Refresh the feeds every interval, keeping the last document if a refresh fails
+    def _refresh_forever(self):
+        while not self._stopped.wait(self.interval):
+            for path, feed in self.feeds.items():
+                try:
+                    feed.refresh()
+                except Exception as e:
+                    print(warn('Could not refresh %s: %s' % (path, e)), file=sys.stderr, flush=True)
+
+    # Stop refreshing and close the socket
+    def server_close(self):
+        self._stopped.set()
+        super().server_close()
+
+# Answers feed requests from the serialised documents
+class _FeedRequestHandler(BaseHTTPRequestHandler):
+    # Respond to a GET request
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    # Respond to a HEAD request
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    # Send the document for the path, or 304 if the client already has it
+    def _respond(self, send_body: bool):
+        feed: Feed = self.server.feeds.get(self.path.split('?')[0])
+
+        if not feed:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        document: Document = feed.document
+        etags: List[str] = [etag.strip() for etag in self.headers.get('If-None-Match', '').split(',')]
+
+        if document.etag in etags or '*' in etags:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', document.etag)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.send_header('Content-Length', str(len(document.body)))
+        self.send_header('ETag', document.etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(document.body)
+
+    # Keep quiet about each request
+    def log_message(self, format: str, *args):
+        pass
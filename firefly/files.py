@@ -0,0 +1,126 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from http import HTTPStatus
+from .lock import FileLock
+from requests import Response
+from .errors import FireflyError
+from typing import Dict
+
+# Bytes written to disk at a time
+CHUNK_SIZE: int = 64 * 1024
+
+# Files downloaded from Firefly, stored by the SHA-256 of their contents so a file attached to several tasks is
+# only kept once. An index maps the URL of each file to its digest, so a file is only downloaded once too.
+# Downloads are streamed to a partial file first, and resumed with a range request if they're interrupted.
+class FileStore():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.index_path: Path = path.joinpath('index.json')
+        self.lock: FileLock = FileLock(path.joinpath('index.lock'))
+
+    # Get the path a file is stored at by its digest
+    def object_path(self, digest: str) -> Path:
+        return self.path.joinpath('objects', digest[:2], digest)
+
+    # Get the path a file is downloaded to until it's complete
+    def partial_path(self, url: str) -> Path:
+        return self.path.joinpath('partial', hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    # Read the index of digests by URL
+    def _read_index(self) -> Dict[str, str]:
+        try:
+            with self.index_path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # Get the path of a file that has already been downloaded, or None
+    def get(self, url: str) -> Path:
+        digest: str = self._read_index().get(url)
+
+        if digest and self.object_path(digest).exists():
+            return self.object_path(digest)
+
+        return None
+
+    # Remember the digest of a URL
+    def _remember(self, url: str, digest: str):
+        with self.lock:
+            index: Dict[str, str] = self._read_index()
+            index[url] = digest
+            tmp_path: Path = self.index_path.with_name(self.index_path.name + '.tmp')
+
+            with tmp_path.open('w') as f:
+                json.dump(index, f)
+
+            os.replace(tmp_path, self.index_path)
+
+    # Get the path of a file, downloading it first if it hasn't been. Only the bytes missing from an earlier,
+    # interrupted download are retrieved if the server still has the same file.
+    def fetch(self, client, url: str) -> Path:
+        path: Path = self.get(url)
+
+        if path:
+            return path
+
+        partial_path: Path = self.partial_path(url)
+        # Validator of the file the partial download is part of
+        validator_path: Path = partial_path.with_suffix('.etag')
+        partial_path.parent.mkdir(parents=True, exist_ok=True)
+        offset: int = partial_path.stat().st_size if partial_path.exists() and validator_path.exists() else 0
+        headers: Dict[str, str] = {}
+
+        if offset:
+            headers['Range'] = 'bytes=%d-' % offset
+            headers['If-Range'] = validator_path.read_text()
+
+        response: Response = client.stream(url, headers)
+
+        with response:
+            if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                # The partial download is no use, so start again
+                partial_path.unlink()
+                return self.fetch(client, url)
+
+            if response.status_code not in [HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT]:
+                raise FireflyError('Could not download %s (%d)' % (url, response.status_code))
+
+            digest = hashlib.sha256()
+
+            if response.status_code == HTTPStatus.PARTIAL_CONTENT:
+                with partial_path.open('rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+
+                mode: str = 'ab'
+            else:
+                # The server sent the whole file, so whatever was downloaded before is replaced
+                mode = 'wb'
+                validator: str = response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+                if validator:
+                    validator_path.write_text(validator)
+                elif validator_path.exists():
+                    validator_path.unlink()
+
+            with partial_path.open(mode) as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+
+        path = self.object_path(digest.hexdigest())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(partial_path, path)
+
+        if validator_path.exists():
+            validator_path.unlink()
+
+        self._remember(url, digest.hexdigest())
+
+        return path
@@ -1,8 +1,10 @@
 # Copyright Paul Adams, 2020. All rights reserved.
 # Unauthorized reproduction is prohibited.
 
+from typing import List, Dict, Pattern
 from datetime import date as Date
-from .enums import SortColumn, TaskSortColumn, SortDirection, TaskCompletionStatus
+from .resources import User, Addressee, Class, Task
+from .enums import SortColumn, TaskSortColumn, SortDirection, TaskCompletionStatus, TaskReadStatus, TaskMarkingStatus
 
 # Defines how to sort results
 class Sort():
@@ -43,4 +45,67 @@ class DatePeriod():
     @property
     def until_date(self) -> Date:
         # Default to single date range
-        return self._until_date or self.from_date
\ No newline at end of file
+        return self._until_date or self.from_date
+
+# Filters on tasks. Those the task listing endpoint understands are sent with the request, and the rest are
+# applied to the tasks it returns.
+class TaskFilter():
+    # Create an instance
+    def __init__(
+            self,
+            completion_status: TaskCompletionStatus = TaskCompletionStatus.ALL,
+            read_status: TaskReadStatus = TaskReadStatus.ALL,
+            marking_status: TaskMarkingStatus = TaskMarkingStatus.ALL,
+            due: DatePeriod = None,
+            setters: List[User] = None,
+            addressees: List[Addressee] = None,
+            set_period: DatePeriod = None,
+            subjects: List[str] = None,
+            title: Pattern = None
+        ):
+        self.completion_status: TaskCompletionStatus = completion_status
+        self.read_status: TaskReadStatus = read_status
+        self.marking_status: TaskMarkingStatus = marking_status
+        self.due: DatePeriod = due
+        self.setters: List[User] = setters
+        self.addressees: List[Addressee] = addressees
+        self.set_period: DatePeriod = set_period
+        self.subjects: List[str] = [subject.lower() for subject in subjects or []]
+        self.title: Pattern = title
+
+    # Get the filters the endpoint applies, as keyword arguments to Client.get_tasks
+    def server_filters(self) -> Dict:
+        return {
+            'completion_status': self.completion_status,
+            'read_status': self.read_status,
+            'marking_status': self.marking_status,
+            'due': self.due,
+            'setters': self.setters,
+            'addressees': self.addressees
+        }
+
+    # Determine if any filters are left to apply to the tasks the endpoint returns
+    def is_partial(self) -> bool:
+        return bool(self.set_period or self.subjects or self.title)
+
+    # Determine if a task passes the filters the endpoint doesn't apply
+    def matches(self, task: Task) -> bool:
+        # Some tasks have no title
+        title: str = task.title or ''
+
+        if self.set_period and not (task.set and self.set_period.from_date <= task.set <= self.set_period.until_date):
+            return False
+
+        if self.title and not self.title.search(title):
+            return False
+
+        if self.subjects:
+            # Tasks don't have a subject, so it's looked for in the title and the names of the classes it was set to
+            names: List[str] = [title.lower()] + [
+                addressee.name.lower() for addressee in task.addressees if isinstance(addressee, Class) and addressee.name
+            ]
+
+            if not any(subject in name for subject in self.subjects for name in names):
+                return False
+
+        return True
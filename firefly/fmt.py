@@ -2,7 +2,7 @@
 # Unauthorized reproduction is prohibited.
 
 import re
-from typing import List, Dict, Generator, Type
+from typing import List, Dict, Tuple, Generator, Type
 from datetime import date as Date, timedelta as TimeDelta
 
 # Pretty print a list
@@ -63,6 +63,25 @@ def human_timedelta(delta: TimeDelta) -> str:
 
     return str(v) + ' ' + (k if v == 1 else plurals.get(k) or k + 's')
 
+# Pretty print a number of seconds in the largest whole unit, such as `3 hours`
+def human_age(seconds: float) -> str:
+    units: List[Tuple[str, int]] = [('day', 86400), ('hour', 3600), ('minute', 60), ('second', 1)]
+
+    for unit, length in units:
+        if seconds >= length or unit == 'second':
+            count: int = int(seconds // length)
+            return '%d %s' % (count, unit if count == 1 else unit + 's')
+
+# Pretty print a number of bytes, such as `1.5 MB`
+def human_size(size: int) -> str:
+    for unit in ['bytes', 'KB', 'MB']:
+        if size < 1024:
+            return ('%d %s' if unit == 'bytes' else '%.1f %s') % (size, unit)
+
+        size /= 1024
+
+    return '%.1f GB' % size
+
 # Pretty print a datetime.date
 def human_date(date: Date) -> str:
     delta: TimeDelta = date - Date.today()
@@ -0,0 +1,132 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import hashlib
+from typing import List, Iterable
+from .resources import Lesson, Task
+from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta, timezone as TimeZone
+
+# Domain of the event UIDs
+UID_DOMAIN: str = 'ff-timetable'
+
+# Line ending required by RFC 5545
+CRLF: str = '\r\n'
+
+# Escape a text value
+def escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+# Fold a content line into lines of at most 75 octets, as RFC 5545 requires
+def fold(line: str) -> str:
+    data: bytes = line.encode('utf-8')
+
+    if len(data) <= 75:
+        return line + CRLF
+
+    lines: List[str] = []
+    limit: int = 75
+
+    while data:
+        cut: int = min(limit, len(data))
+
+        # Don't split a UTF-8 sequence
+        while cut < len(data) and data[cut] & 0xC0 == 0x80:
+            cut -= 1
+
+        lines.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+        # Continuation lines start with a space, which counts towards their length
+        limit = 74
+
+    return (CRLF + ' ').join(lines) + CRLF
+
+# Format a datetime, in UTC if it has a time zone and as floating local time if it doesn't
+def format_datetime(date_time: DateTime) -> str:
+    if date_time.tzinfo:
+        return date_time.astimezone(TimeZone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    return date_time.strftime('%Y%m%dT%H%M%S')
+
+# Format a date
+def format_date(date: Date) -> str:
+    return date.strftime('%Y%m%d')
+
+# Serialise an event, all day if it's given dates rather than datetimes. Everything, DTSTAMP included, is
+# derived from the arguments, so unchanged events serialise to the same bytes.
+def event(uid: str, start: Date, end: Date, summary: str, location: str = None, description: str = None) -> str:
+    if isinstance(start, DateTime):
+        value_type: str = ''
+        format_value = format_datetime
+        stamp: DateTime = start
+    else:
+        value_type = ';VALUE=DATE'
+        format_value = format_date
+        stamp = DateTime.combine(start, DateTime.min.time())
+
+    lines: List[str] = [
+        'BEGIN:VEVENT',
+        'UID:' + uid,
+        # Naive times are local, so they're converted to UTC like the rest rather than just labelled as it
+        'DTSTAMP:' + format_datetime(stamp.astimezone(TimeZone.utc)),
+        'DTSTART' + value_type + ':' + format_value(start),
+        'DTEND' + value_type + ':' + format_value(end),
+        'SUMMARY:' + escape(summary)
+    ]
+
+    if location:
+        lines.append('LOCATION:' + escape(location))
+
+    if description:
+        lines.append('DESCRIPTION:' + escape(description))
+
+    lines.append('END:VEVENT')
+
+    return ''.join(fold(line) for line in lines)
+
+# Serialise lessons as events
+def lesson_events(lessons: Iterable[Lesson]) -> str:
+    blocks: List[str] = []
+
+    for lesson in lessons:
+        uid: str = hashlib.sha1(repr((format_datetime(lesson.start), lesson.subject)).encode('utf-8')).hexdigest() + '@' + UID_DOMAIN
+
+        blocks.append(event(
+            uid,
+            lesson.start,
+            lesson.end,
+            lesson.subject,
+            location=lesson.room,
+            description=lesson.teacher.name if lesson.teacher else None
+        ))
+
+    return ''.join(blocks)
+
+# Serialise tasks as all day events on their due dates
+def task_events(tasks: Iterable[Task]) -> str:
+    blocks: List[str] = []
+
+    for task in tasks:
+        if not task.due:
+            continue
+
+        blocks.append(event(
+            'task-%s@%s' % (task.id, UID_DOMAIN),
+            task.due,
+            task.due + TimeDelta(days=1),
+            ('✔️ ' if task.is_done else '') + (task.title or 'Untitled task'),
+            description=task.setter.name if task.setter else None
+        ))
+
+    return ''.join(blocks)
+
+# Wrap serialised events in a calendar
+def calendar(name: str, blocks: Iterable[str]) -> str:
+    return ''.join([
+        fold('BEGIN:VCALENDAR'),
+        fold('VERSION:2.0'),
+        fold('PRODID:-//Paul Adams//ff-timetable//EN'),
+        fold('CALSCALE:GREGORIAN'),
+        fold('X-WR-CALNAME:' + escape(name)),
+        *blocks,
+        fold('END:VCALENDAR')
+    ])
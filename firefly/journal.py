@@ -0,0 +1,185 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+from .lock import FileLock
+from .enums import TaskEventEnum
+from .errors import FireflyError, ServerError
+from requests.exceptions import RequestException
+from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Determine if a response that failed to send may succeed if it's sent again: Firefly couldn't be reached, or was
+# down or overloaded. Anything else, like a task that doesn't exist, will fail however many times it's sent.
+def is_transient(error: Exception) -> bool:
+    return isinstance(error, (RequestException, ServerError))
+
+# Append only log of the responses made to tasks, kept until they've been sent to Firefly so marking a task as
+# done never waits on it. Each line is a JSON object with the task ID, the event and when it was made.
+class TaskJournal():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+        # Responses Firefly refused, kept until they've been reported
+        self.failed_path: Path = path.with_name(path.name + '.failed')
+        self.lock: FileLock = FileLock(path.with_name(path.name + '.lock'))
+        # Held while replaying, so two flushes never send the same events
+        self.flush_lock: FileLock = FileLock(path.with_name(path.name + '.flush.lock'))
+
+    # Record a response to a task, only returning once it's on disk
+    def append(self, task_id: int, event_type: TaskEventEnum):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.lock, self.path.open('a') as f:
+            f.write(json.dumps({'task': task_id, 'event': event_type.foreign_name, 'at': time.time()}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Read the entries of a journal in the order they were made
+    def _read(self, path: Path = None) -> List[Dict]:
+        entries: List[Dict] = []
+
+        try:
+            with (path or self.path).open() as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Torn write from a process that was killed
+                        continue
+        except FileNotFoundError:
+            pass
+
+        return entries
+
+    # Replace the entries
+    def _write(self, entries: List[Dict]):
+        tmp_path: Path = self.path.with_name(self.path.name + '.tmp')
+
+        with tmp_path.open('w') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in entries)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+    # Collapse the entries to the last response to each task. Responses that cancel out, like marking a task as
+    # done then as to do again, leave the task where it started, so nothing is sent for it at all.
+    def _collapse(self, entries: List[Dict]) -> Dict[int, TaskEventEnum]:
+        first: Dict[int, str] = {}
+        last: Dict[int, str] = {}
+
+        for entry in entries:
+            first.setdefault(entry['task'], entry['event'])
+            last[entry['task']] = entry['event']
+
+        return {
+            task_id: TaskEventEnum.from_foreign_name(event) for task_id, event in last.items() if event == first[task_id]
+        }
+
+    # Get the response waiting to be sent for each task
+    def pending(self) -> Dict[int, TaskEventEnum]:
+        with self.lock:
+            return self._collapse(self._read())
+
+    # Forget every response waiting to be sent
+    def discard(self):
+        with self.lock:
+            self._write([])
+
+    # Get the responses Firefly refused since they were last reported, each with the task ID, the event and the error
+    def failures(self) -> List[Dict]:
+        with self.lock:
+            return self._read(self.failed_path)
+
+    # Forget the responses Firefly refused, once they've been reported
+    def clear_failures(self):
+        with self.lock:
+            if self.failed_path.exists():
+                self.failed_path.unlink()
+
+    # Send the waiting responses to Firefly at once, one per task. Responses that fail because Firefly couldn't be
+    # reached are kept to be sent again; the rest are dropped and recorded as failures. The errors raised are
+    # returned by task ID.
+    def flush(self, client) -> Dict[int, Exception]:
+        with self.flush_lock:
+            with self.lock:
+                entries: List[Dict] = self._read()
+
+            if not entries:
+                return {}
+
+            events: Dict[int, TaskEventEnum] = self._collapse(entries)
+            client.spinner.text = 'Sending %d changes to Firefly' % len(events)
+
+            # Send a response, returning the error it raised, if any
+            def send(item: Tuple[int, TaskEventEnum]) -> Exception:
+                task_id, event_type = item
+
+                try:
+                    # A task that's already marked is where the journal wants it
+                    client.respond_to_task(task_id, event_type, strict=False)
+                except Exception as e:
+                    return e
+
+            with ThreadPoolExecutor(max_workers=client.concurrency) as executor:
+                errors: Dict[int, Exception] = {
+                    task_id: error for task_id, error in zip(events, executor.map(send, events.items())) if error
+                }
+
+            with self.lock:
+                # Responses may have been made while these were being sent
+                later: List[Dict] = self._read()[len(entries):]
+                self._write([entry for entry in entries if entry['task'] in errors and is_transient(errors[entry['task']])] + later)
+
+                failures: List[Dict] = [
+                    {
+                        'task': task_id,
+                        'event': events[task_id].foreign_name,
+                        'error': str(error) if isinstance(error, FireflyError) else 'Firefly sent a response that could not be read'
+                    } for task_id, error in errors.items() if not is_transient(error)
+                ]
+
+                if failures:
+                    with self.failed_path.open('a') as f:
+                        f.writelines(json.dumps(failure) + '\n' for failure in failures)
+
+            return errors
+
+# Flush the journal in a detached worker process, so the user isn't kept waiting for Firefly
+def spawn(account: str = None):
+    kwargs: Dict = {}
+
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+
+    subprocess.Popen(
+        [sys.executable, '-m', 'firefly.journal'] + ([account] if account else []),
+        cwd=Path(__file__).resolve().parent.parent,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs
+    )
+
+# Flush the journal of the account given on the command line, then exit without a word
+def main(argv: List[str]):
+    try:
+        from . import factories
+
+        client = factories.firefly_client(can_ask=False, account=argv[1] if len(argv) > 1 else None)
+        client.journal.flush(client)
+    except BaseException:
+        pass
+    finally:
+        os._exit(0)
+
+if __name__ == '__main__':
+    main(sys.argv)
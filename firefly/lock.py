@@ -0,0 +1,61 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import IO
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the lock only excludes other threads
+    fcntl = None
+
+# Reentrant lock held across threads and processes through a file in the storage directory
+class FileLock():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self._thread_lock: threading.RLock = threading.RLock()
+        self._depth: int = 0
+        self._file: IO = None
+
+    # Block until the lock is held
+    def acquire(self):
+        self._thread_lock.acquire()
+
+        if self._depth == 0:
+            try:
+                self._file = self.path.open('a')
+
+                if fcntl:
+                    fcntl.flock(self._file, fcntl.LOCK_EX)
+            except:
+                self._thread_lock.release()
+                raise
+
+        self._depth += 1
+
+    # Release the lock
+    def release(self):
+        self._depth -= 1
+
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+            self._file.close()
+            self._file = None
+
+        self._thread_lock.release()
+
+    # Acquire the lock in a with statement
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    # Release the lock at the end of a with statement
+    def __exit__(self, *args):
+        self.release()
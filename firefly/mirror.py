@@ -0,0 +1,54 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import time
+import pickle
+from pathlib import Path
+from .lock import FileLock
+from .cache import CacheEntry
+from .resources import Task
+from typing import Iterable
+
+# Local copy of the user's whole task history, so it can be analysed without paging through the API
+class TaskMirror():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.lock: FileLock = FileLock(path.with_name(path.name + '.lock'))
+
+    # Get the mirrored tasks and when they were synced, or None if they've never been synced
+    def load(self) -> CacheEntry:
+        try:
+            with self.path.open('rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    # Replace the mirrored tasks
+    def save(self, tasks: Iterable[Task], synced_at: float = None):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.lock:
+            tmp_path: Path = self.path.with_name(self.path.name + '.tmp')
+
+            with tmp_path.open('wb') as f:
+                pickle.dump(CacheEntry(list(tasks), synced_at or time.time()), f)
+
+            os.replace(tmp_path, self.path)
+
+    # Update the attributes of a mirrored task, keeping the time the mirror was synced
+    def update(self, task_id: int, **attributes):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.lock:
+            entry: CacheEntry = self.load()
+
+            if not entry:
+                return
+
+            for task in entry.value:
+                if task.id == task_id:
+                    task.__dict__.update(attributes)
+
+            self.save(entry.value, entry.stored_at)
@@ -0,0 +1,26 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from typing import List, Tuple
+from .filters import DatePeriod
+from .enums import TimetablePeriod
+from datetime import date as Date, timedelta as TimeDelta
+
+# Plan the fewest planner requests that cover a period. Weeks the period touches on more than one day are
+# fetched whole through the week endpoint (and clipped by the caller), the rest a day at a time.
+def plan_timetable_requests(period: DatePeriod) -> List[Tuple[Date, TimetablePeriod]]:
+    requests: List[Tuple[Date, TimetablePeriod]] = []
+    monday: Date = period.from_date - TimeDelta(days=period.from_date.weekday())
+
+    while monday <= period.until_date:
+        first_day: Date = max(monday, period.from_date)
+        last_day: Date = min(monday + TimeDelta(days=6), period.until_date)
+
+        if first_day == last_day:
+            requests.append((first_day, TimetablePeriod.DAY))
+        else:
+            requests.append((monday, TimetablePeriod.WEEK))
+
+        monday += TimeDelta(weeks=1)
+
+    return requests
@@ -0,0 +1,77 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+from typing import List, Dict
+from datetime import date as Date, timedelta as TimeDelta
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Create a job that caches the lessons for a date and period
+def lessons_job(date: Date, period: str) -> Dict:
+    return {'type': 'lessons', 'date': date.isoformat(), 'period': period}
+
+# Create a job that caches the first page of to do tasks, as shown by `ff tasks`
+def tasks_job() -> Dict:
+    return {'type': 'tasks'}
+
+# Get the first weekday after a date
+def next_school_day(date: Date) -> Date:
+    date += TimeDelta(days=1)
+
+    while date.weekday() >= 5:
+        date += TimeDelta(days=1)
+
+    return date
+
+# Run the jobs in a detached worker process, so the user isn't kept waiting for them
+def spawn(jobs: List[Dict], budget: float):
+    kwargs: Dict = {}
+
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+
+    subprocess.Popen(
+        [sys.executable, '-m', 'firefly.prefetch', str(budget), json.dumps(jobs)],
+        cwd=Path(__file__).resolve().parent.parent,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs
+    )
+
+# Run a job
+def run_job(client, job: Dict):
+    from . import TimetablePeriod, TaskCompletionStatus
+
+    if job['type'] == 'lessons':
+        client.get_lessons(Date.fromisoformat(job['date']), TimetablePeriod.from_foreign_name(job['period']))
+    elif job['type'] == 'tasks':
+        client.get_tasks(completion_status=TaskCompletionStatus.TO_DO)
+
+# Run the jobs given on the command line within the time budget, then exit without a word
+def main(argv: List[str]):
+    try:
+        budget: float = float(argv[1])
+        jobs: List[Dict] = json.loads(argv[2])
+
+        from . import factories
+
+        client = factories.firefly_client(can_ask=False)
+        client.timeout = budget
+
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=client.concurrency)
+        wait([executor.submit(run_job, client, job) for job in jobs], timeout=budget)
+    except BaseException:
+        pass
+    finally:
+        # Don't wait for stragglers
+        os._exit(0)
+
+if __name__ == '__main__':
+    main(sys.argv)
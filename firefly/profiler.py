@@ -0,0 +1,108 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from collections import Counter
+from types import FrameType
+from typing import List, Dict, Iterator
+from contextlib import contextmanager
+from datetime import datetime as DateTime
+
+# Samples the call stacks of every thread at a fixed interval
+class SamplingProfiler():
+    # Create an instance
+    def __init__(self, interval: float = 0.005):
+        # Seconds between samples
+        self.interval: float = interval
+        # Collapsed stack to the number of times it was sampled
+        self.samples: Counter = Counter()
+        self._stopped: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    # Start sampling
+    def start(self):
+        self._thread.start()
+
+    # Stop sampling and wait for the sampler to finish
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    # Take samples until stopped
+    def _run(self):
+        own_id: int = threading.get_ident()
+
+        while not self._stopped.wait(self.interval):
+            names: Dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.samples[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+
+    # Convert a frame to a semicolon separated stack, outermost call first
+    def _collapse(self, thread_name: str, frame: FrameType) -> str:
+        stack: List[str] = []
+
+        while frame:
+            code = frame.f_code
+            stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+
+        stack.append(thread_name)
+
+        return ';'.join(reversed(stack))
+
+    # Render the samples in the collapsed stack format read by flamegraph.pl and speedscope
+    def collapsed(self) -> str:
+        return '\n'.join('%s %d' % (stack, count) for stack, count in self.samples.most_common())
+
+# Render the top allocation sites of a snapshot
+def allocation_report(snapshot: tracemalloc.Snapshot, top: int = 25) -> str:
+    stats: List[tracemalloc.Statistic] = snapshot.statistics('lineno')
+    current, peak = tracemalloc.get_traced_memory()
+    lines: List[str] = ['Current %.1f KiB, peak %.1f KiB' % (current / 1024, peak / 1024), '']
+
+    for i, stat in enumerate(stats[:top], 1):
+        frame: tracemalloc.Frame = stat.traceback[0]
+        lines.append('#%d %s:%d %.1f KiB in %d blocks' % (i, frame.filename, frame.lineno, stat.size / 1024, stat.count))
+
+    other: List[tracemalloc.Statistic] = stats[top:]
+
+    if other:
+        lines.append('%d other sites %.1f KiB' % (len(other), sum(stat.size for stat in other) / 1024))
+
+    return '\n'.join(lines)
+
+# Profile the CPU and memory use of the enclosed code if enabled, writing a collapsed stack file
+# and an allocation report to the directory
+@contextmanager
+def profiling(enabled: bool, directory: Path, name: str = 'ff', top: int = 25) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+
+    profiler: SamplingProfiler = SamplingProfiler()
+    tracemalloc.start()
+    profiler.start()
+
+    try:
+        yield
+    finally:
+        profiler.stop()
+        snapshot: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        report: str = allocation_report(snapshot, top)
+        tracemalloc.stop()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        prefix: Path = directory.joinpath('%s-%s' % (name, DateTime.now().strftime('%Y%m%d-%H%M%S')))
+        stacks_path: Path = prefix.with_suffix('.folded')
+        allocations_path: Path = prefix.with_suffix('.alloc.txt')
+
+        stacks_path.write_text(profiler.collapsed())
+        allocations_path.write_text(report)
+
+        print('Wrote CPU samples to %s and allocations to %s' % (stacks_path, allocations_path), file=sys.stderr)
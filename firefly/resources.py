@@ -3,7 +3,7 @@
 
 from abc import ABC
 from typing import List
-from .times import BREAK, LUNCH
+from .times import FREE_PERIOD
 from datetime import datetime as DateTime, date as Date, timedelta as TimeDelta
 
 # User account
@@ -42,32 +42,22 @@ class Teacher():
 
 # Subject taught by a teacher in a room
 class Lesson():
-    # Create an instance
+    # Create an instance. The label is the name of the bell the lesson falls in, such as break or lunch.
     def __init__(
             self,
             start: DateTime,
             end: DateTime,
             subject: str = None,
             teacher: Teacher = None,
-            room: str = None
+            room: str = None,
+            label: str = None
         ):
         self.start: DateTime = start
         self.end: DateTime = end
-        self._subject: str = subject
+        self.subject: str = label or subject or FREE_PERIOD
         self.teacher: Teacher = teacher
         self.room: str = room
 
-    # Get the subject
-    @property
-    def subject(self):
-        if self.start.time() == BREAK.start and self.end.time() == BREAK.end:
-            return 'Break'
-
-        if self.start.time() == LUNCH.start and self.end.time() == LUNCH.end:
-            return 'Lunch'
-
-        return self._subject or 'Free Period'
-
 # Recipient of a task
 class Addressee(ABC):
     # Create an instance
@@ -128,4 +118,14 @@ class Task():
 
     # Determine if the task is due soon
     def is_due_soon(self) -> bool:
-        return self.due - Date.today() < TimeDelta(days=3)
\ No newline at end of file
+        return self.due - Date.today() < TimeDelta(days=3)
+
+# File set with a task, or submitted for it
+class TaskFile():
+    # Create an instance. Attachments are set by the teacher and submissions are made by the student.
+    def __init__(self, task_id: int, name: str, url: str, size: int = None, is_submission: bool = False):
+        self.task_id: int = task_id
+        self.name: str = name
+        self.url: str = url
+        self.size: int = size
+        self.is_submission: bool = is_submission
@@ -0,0 +1,109 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import hashlib
+from .resources import Lesson
+from typing import List, Dict, Tuple
+from datetime import date as Date, timedelta as TimeDelta
+
+# Longest rota detected, in weeks
+MAX_PERIOD: int = 2
+
+# Hash the pattern of a week's lessons: what's taught when, where and by whom, whatever the week's date.
+# Weeks without lessons have no pattern, so None is returned for them.
+def week_pattern(monday: Date, lessons: List[Lesson]) -> str:
+    if not lessons:
+        return None
+
+    pattern: List[Tuple] = sorted(
+        (
+            (lesson.start.date() - monday).days,
+            lesson.start.time().isoformat(),
+            lesson.end.time().isoformat(),
+            lesson.subject,
+            lesson.room,
+            lesson.teacher.name if lesson.teacher else None
+        ) for lesson in lessons
+    )
+
+    return hashlib.sha256(repr(pattern).encode('utf-8')).hexdigest()
+
+# Timetable that repeats every `period` weeks, described by a week of lessons for each phase of the rota
+class Rota():
+    # Create an instance from the weeks of lessons for each phase, by Monday, the first of which is phase 0
+    def __init__(self, period: int, weeks: Dict[Date, List[Lesson]]):
+        self.period: int = period
+        self._anchor: Date = min(weeks)
+        # Monday, lessons and pattern for each phase
+        self._phases: Dict[int, Tuple[Date, List[Lesson], str]] = {}
+
+        for monday, lessons in weeks.items():
+            self._phases[self.phase(monday)] = (monday, lessons, week_pattern(monday, lessons))
+
+    # Detect the shortest rota the weeks follow, or None if they don't follow one. The weeks, by Monday, must be
+    # consecutive. Weeks without lessons are ignored, and every phase of the rota must be seen twice.
+    @classmethod
+    def detect(cls, weeks: Dict[Date, List[Lesson]]) -> Rota:
+        patterns: Dict[Date, str] = {
+            monday: pattern for monday, pattern in ((monday, week_pattern(monday, lessons)) for monday, lessons in weeks.items()) if pattern
+        }
+
+        for period in range(1, MAX_PERIOD + 1):
+            # Phases seen repeated a period later, by the first Monday they were seen on
+            confirmed: Dict[int, Date] = {}
+            is_consistent: bool = True
+
+            for monday, pattern in patterns.items():
+                later: str = patterns.get(monday + TimeDelta(weeks=period))
+
+                if later is None:
+                    continue
+
+                if later != pattern:
+                    is_consistent = False
+                    break
+
+                phase: int = (monday - min(patterns)).days // 7 % period
+                confirmed.setdefault(phase, monday)
+
+            if is_consistent and len(confirmed) == period:
+                return cls(period, {monday: weeks[monday] for monday in confirmed.values()})
+
+        return None
+
+    # Get the phase of the rota a week is in
+    def phase(self, monday: Date) -> int:
+        return (monday - self._anchor).days // 7 % self.period
+
+    # Determine if a week's lessons are the ones the rota expects
+    def expects(self, monday: Date, lessons: List[Lesson]) -> bool:
+        return week_pattern(monday, lessons) == self._phases[self.phase(monday)][2]
+
+    # Shift the rota so a week's lessons are the ones it expects, as happens when a rota starts again after a
+    # holiday. Returns False if the week doesn't follow the rota at all.
+    def realign(self, monday: Date, lessons: List[Lesson]) -> bool:
+        pattern: str = week_pattern(monday, lessons)
+
+        for phase, (_, _, phase_pattern) in self._phases.items():
+            if pattern and pattern == phase_pattern:
+                self._anchor += TimeDelta(weeks=self.phase(monday) - phase)
+                return True
+
+        return False
+
+    # Get the lessons the rota expects in a week
+    def lessons(self, monday: Date) -> List[Lesson]:
+        reference, lessons, _ = self._phases[self.phase(monday)]
+        offset: TimeDelta = monday - reference
+
+        return [
+            Lesson(
+                start=lesson.start + offset,
+                end=lesson.end + offset,
+                subject=lesson.subject,
+                teacher=lesson.teacher,
+                room=lesson.room
+            ) for lesson in lessons
+        ]
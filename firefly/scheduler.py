@@ -0,0 +1,221 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from .lock import FileLock
+from http import HTTPStatus
+from requests import Response
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+from requests.exceptions import RequestException
+from typing import List, Dict, Callable
+
+# Statuses the server sends when it's overloaded, which mean the request wasn't handled and can be sent again
+RETRY_STATUSES: List[int] = [HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE]
+
+# Times a request is sent again after the server says it's overloaded
+MAX_RETRIES: int = 4
+
+# Longest Retry-After that's waited out, rather than giving up on the request
+MAX_RETRY_AFTER: float = 30
+
+# Seconds waited before the first retry when the server doesn't say, doubling with each retry
+BACKOFF: float = 0.25
+
+# Factor of its usual latency, plus a margin for noise, past which a route is taken to be slowing down under load
+LATENCY_TOLERANCE: float = 2
+LATENCY_MARGIN: float = 0.05
+
+# Factor the concurrency is cut by when the server is overloaded, and when it's slowing down
+OVERLOAD_DECREASE: float = 0.5
+LATENCY_DECREASE: float = 0.75
+
+# Rate limit shared by every process through a state file, so between them they send no more than `rate`
+# requests a second, in bursts of up to `burst`. The server can also pause every process for a while.
+class TokenBucket():
+    # Create an instance
+    def __init__(self, path: Path, rate: float, burst: float = None):
+        self.path: Path = path
+        self.rate: float = rate
+        self.burst: float = burst or rate
+        self.lock: FileLock = FileLock(path.with_name(path.name + '.lock'))
+
+    # Read the state
+    def _read(self) -> Dict:
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # Replace the state
+    def _write(self, state: Dict):
+        tmp_path: Path = self.path.with_name(self.path.name + '.tmp')
+
+        with tmp_path.open('w') as f:
+            json.dump(state, f)
+
+        os.replace(tmp_path, self.path)
+
+    # Take a token, waiting until there's one and the bucket isn't paused
+    def take(self):
+        while True:
+            with self.lock:
+                state: Dict = self._read()
+                now: float = time.time()
+                tokens: float = min(self.burst, state.get('tokens', self.burst) + max(0, now - state.get('at', now)) * self.rate)
+                paused_until: float = state.get('paused_until', 0)
+
+                if now >= paused_until and tokens >= 1:
+                    state.update(tokens=tokens - 1, at=now)
+                    self._write(state)
+                    return
+
+                wait: float = max(paused_until - now, (1 - tokens) / self.rate)
+
+            time.sleep(wait)
+
+    # Stop every process taking tokens for a number of seconds
+    def pause(self, seconds: float):
+        with self.lock:
+            state: Dict = self._read()
+            state['paused_until'] = max(state.get('paused_until', 0), time.time() + seconds)
+            self._write(state)
+
+    # Get a value shared through the state, or None
+    def get(self, key: str):
+        with self.lock:
+            return self._read().get(key)
+
+    # Share a value through the state
+    def set(self, key: str, value):
+        with self.lock:
+            state: Dict = self._read()
+            state[key] = value
+            self._write(state)
+
+# Number of requests in flight at once, adjusted to what the server copes with. It grows by one request per
+# round trip while responses come back as quickly as usual, and is cut when the server says it's overloaded or
+# its responses slow down, so it settles just under the point the server starts to struggle.
+class AdaptiveLimit():
+    # Create an instance
+    def __init__(self, maximum: int, initial: float = None):
+        self.maximum: int = maximum
+        self.limit: float = min(maximum, initial or maximum)
+        self.active: int = 0
+        self._condition: threading.Condition = threading.Condition()
+        # Usual latency by route
+        self._baselines: Dict[str, float] = {}
+        self._decreased_at: float = 0
+
+    # Wait for a free slot and take it
+    def acquire(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    # Free a slot, adjusting the limit by how the request went
+    def release(self, route: str, latency: float, is_overloaded: bool = False):
+        with self._condition:
+            self.active -= 1
+            baseline: float = self._baselines.get(route, latency)
+
+            # The fastest response is the usual latency, drifting up slowly in case the server got slower for good
+            self._baselines[route] = min(latency, baseline + (latency - baseline) * 0.05)
+
+            if is_overloaded or latency > LATENCY_TOLERANCE * baseline + LATENCY_MARGIN:
+                now: float = time.monotonic()
+
+                # Requests sent at the same limit come back around the same time, so the limit is only cut once for them
+                if now - self._decreased_at > latency:
+                    self.limit = max(1, self.limit * (OVERLOAD_DECREASE if is_overloaded else LATENCY_DECREASE))
+                    self._decreased_at = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+# Sends the requests of every client talking to a server, within its rate limit and adaptive concurrency,
+# sending them again when the server says it's overloaded
+class Scheduler():
+    # Create an instance
+    def __init__(self, path: Path, rate: float, burst: float = None, concurrency: int = 4):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.bucket: TokenBucket = TokenBucket(path, rate, burst)
+        # Start from the limit the last process settled on
+        self.limit: AdaptiveLimit = AdaptiveLimit(concurrency, self.bucket.get('concurrency'))
+
+    # Get the seconds the server asked for before sending a request again, or None
+    def _retry_after(self, response: Response) -> float:
+        value: str = response.headers.get('Retry-After')
+
+        if not value:
+            return None
+
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    # Send a request, returning the response
+    def send(self, url: str, send: Callable[[], Response]) -> Response:
+        # Paths differ by IDs and dates, but requests to the same endpoint take about as long
+        route: str = re.sub(r'\d+', '#', urlparse(url).path)
+
+        for retry in range(MAX_RETRIES + 1):
+            self.bucket.take()
+            self.limit.acquire()
+            sent_at: float = time.monotonic()
+            limit: int = int(self.limit.limit)
+
+            try:
+                response: Response = send()
+            except RequestException:
+                # Connections that fail or time out are as good a sign of overload as any
+                self.limit.release(route, time.monotonic() - sent_at, is_overloaded=True)
+                raise
+
+            is_overloaded: bool = response.status_code in RETRY_STATUSES or response.status_code >= 500
+            self.limit.release(route, time.monotonic() - sent_at, is_overloaded)
+
+            if int(self.limit.limit) != limit:
+                self.bucket.set('concurrency', self.limit.limit)
+
+            if response.status_code not in RETRY_STATUSES or retry == MAX_RETRIES:
+                return response
+
+            delay: float = self._retry_after(response)
+
+            if delay is None:
+                delay = BACKOFF * 2 ** retry * random.uniform(0.5, 1.5)
+            elif delay > MAX_RETRY_AFTER:
+                return response
+
+            response.close()
+            # Every process holds off, not just this request
+            self.bucket.pause(delay)
+
+        return response
+
+# Schedulers by state file, so every client in the process talking to a server shares one
+_schedulers: Dict[Path, Scheduler] = {}
+_schedulers_lock: threading.Lock = threading.Lock()
+
+# Get the scheduler for a state file
+def shared(path: Path, rate: float, burst: float = None, concurrency: int = 4) -> Scheduler:
+    with _schedulers_lock:
+        if path not in _schedulers:
+            _schedulers[path] = Scheduler(path, rate, burst, concurrency)
+
+        return _schedulers[path]
@@ -0,0 +1,143 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import time
+import pickle
+from .lock import FileLock
+from pathlib import Path
+from typing import Dict, List
+from requests.cookies import RequestsCookieJar as CookieJar
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode, ParseResult as URL
+
+# Persists the session cookies and what we know about how long they will last
+class SessionStore():
+    # Seconds between writes of the last success time
+    TOUCH_INTERVAL: float = 30
+
+    # Create an instance
+    def __init__(self, storage_path: Path, lifetime: float = 1200, margin: float = 60):
+        self._cookie_path: Path = storage_path.joinpath('cookies')
+        self._state_path: Path = storage_path.joinpath('session')
+        # Held while logging in or saving, so concurrent threads and processes don't race to overwrite the session
+        self.lock: FileLock = FileLock(storage_path.joinpath('session.lock'))
+        # Idle seconds after which the server forgets the session (ASP.NET defaults to 20 minutes)
+        self.lifetime: float = lifetime
+        # Seconds before expiry at which the session is refreshed
+        self.margin: float = margin
+        # Time of the last authenticated response
+        self.last_success: float = None
+        # Time of the last login
+        self.logged_in_at: float = None
+        # Login form action and the page it was found on, so the form doesn't have to be fetched again
+        self.login_url: str = None
+        self.login_referer: str = None
+        self._saved_at: float = 0
+
+    # Load the cookies into the jar and read the session state
+    def load(self, cookies: CookieJar):
+        with self.lock:
+            if self._cookie_path.is_file():
+                with self._cookie_path.open('rb') as f:
+                    cookies.update(pickle.load(f))
+
+            state: Dict = self._read_state()
+
+            self.last_success = state.get('last_success')
+            self.logged_in_at = state.get('logged_in_at')
+            self.login_url = state.get('login_url')
+            self.login_referer = state.get('login_referer')
+
+    # Read the saved session state
+    def _read_state(self) -> Dict:
+        if not self._state_path.is_file():
+            return {}
+
+        with self._state_path.open('rb') as f:
+            return pickle.load(f)
+
+    # Write the cookies and session state. Unless forced, if another process has since logged in
+    # its session is loaded instead.
+    def save(self, cookies: CookieJar, force: bool = False):
+        with self.lock:
+            if not force and (self._read_state().get('logged_in_at') or 0) > (self.logged_in_at or 0):
+                self.load(cookies)
+                return
+
+            self._write(self._cookie_path, cookies)
+            self._write(self._state_path, {
+                'last_success': self.last_success,
+                'logged_in_at': self.logged_in_at,
+                'login_url': self.login_url,
+                'login_referer': self.login_referer
+            })
+
+        self._saved_at = time.time()
+
+    # Pickle an object to a file atomically, so readers never see half a file
+    def _write(self, path: Path, obj):
+        tmp_path: Path = path.with_name(path.name + '.tmp')
+
+        with tmp_path.open('wb') as f:
+            pickle.dump(obj, f)
+
+        os.replace(tmp_path, path)
+
+    # Determine if a login has happened since the given login time, in this process or another,
+    # loading its session if so
+    def has_logged_in_since(self, logged_in_at: float, cookies: CookieJar) -> bool:
+        if self.logged_in_at != logged_in_at:
+            return True
+
+        if self._read_state().get('logged_in_at') != logged_in_at:
+            self.load(cookies)
+            return True
+
+        return False
+
+    # Record an authenticated response, saving the state at most every TOUCH_INTERVAL seconds
+    def touch(self, cookies: CookieJar):
+        self.last_success = time.time()
+
+        if self.last_success - self._saved_at >= self.TOUCH_INTERVAL:
+            self.save(cookies)
+
+    # Record a login
+    def start(self, cookies: CookieJar):
+        self.logged_in_at = self.last_success = time.time()
+        self.save(cookies)
+
+    # Forget the session
+    def end(self, cookies: CookieJar):
+        self.logged_in_at = self.last_success = None
+        self.save(cookies, force=True)
+
+    # Remember the login form action, minus the URL to return to after logging in
+    def remember_login_form(self, url: str, referer: str):
+        parsed: URL = urlparse(url)
+        query: List = [(k, v) for k, v in parse_qsl(parsed.query) if k.lower() != 'prelogin']
+
+        self.login_url = urlunparse(parsed._replace(query=urlencode(query)))
+        self.login_referer = referer
+
+    # Forget the login form action
+    def forget_login_form(self):
+        self.login_url = self.login_referer = None
+
+    # Get the time at which the session expires, or None if there isn't one
+    def expires_at(self, cookies: CookieJar) -> float:
+        if not self.last_success or not len(cookies):
+            return None
+
+        expiries: List[float] = [self.last_success + self.lifetime]
+        expiries += [cookie.expires for cookie in cookies if cookie.expires]
+
+        return min(expiries)
+
+    # Determine if the session has expired or is about to
+    def is_expiring(self, cookies: CookieJar) -> bool:
+        expires_at: float = self.expires_at(cookies)
+        # Don't let the margin swallow short lifetimes
+        margin: float = min(self.margin, self.lifetime / 4)
+
+        return expires_at is None or expires_at - margin <= time.time()
@@ -0,0 +1,284 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import calendar
+import numpy as np
+from .resources import Lesson, Task
+from .filters import DatePeriod
+from typing import List, Dict, Tuple, Iterable
+from datetime import date as Date
+from .archive import ArchiveView, DICTIONARIES, to_epoch
+
+# Lesson fields that can be grouped by
+GROUPS: List[str] = DICTIONARIES + ['weekday']
+
+# Weekday of 1 January 1970
+EPOCH_WEEKDAY: int = 3
+
+# Aggregate of the lessons in a group
+class LessonGroup():
+    # Create an instance
+    def __init__(self, label: str, count: int, seconds: float, share: float):
+        self.label: str = label
+        self.count: int = count
+        self.seconds: float = seconds
+        self.share: float = share
+
+# Lessons held as arrays, with one array of codes for each dictionary encoded field
+class LessonColumns():
+    # Create an instance
+    def __init__(self, start: np.ndarray, end: np.ndarray, codes: Dict[str, np.ndarray], labels: Dict[str, List[str]]):
+        self.start: np.ndarray = start
+        self.end: np.ndarray = end
+        # Code 0 is always the missing value
+        self.codes: Dict[str, np.ndarray] = codes
+        self.labels: Dict[str, List[str]] = labels
+
+    # Create an empty instance
+    @classmethod
+    def empty(cls) -> LessonColumns:
+        return cls(
+            np.empty(0, np.int64),
+            np.empty(0, np.int64),
+            {name: np.empty(0, np.uint32) for name in DICTIONARIES},
+            {name: [None] for name in DICTIONARIES}
+        )
+
+    # Copy the lessons that start within the dates out of the archive
+    @classmethod
+    def from_archive(cls, view: ArchiveView, period: DatePeriod) -> LessonColumns:
+        lo, hi = view.slice(period)
+
+        # Copy, so the arrays outlive the memory map
+        column = lambda name, dtype: np.frombuffer(view.columns[name], dtype)[lo:hi].copy()
+
+        return cls(
+            column('start', np.int64),
+            column('end', np.int64),
+            {name: column(name, np.uint32) for name in DICTIONARIES},
+            {name: [None] + view.dictionaries[name] for name in DICTIONARIES}
+        )
+
+    # Get the number of lessons
+    def __len__(self) -> int:
+        return len(self.start)
+
+    # Get a copy with the lessons appended, encoding their fields with the same dictionaries
+    def extend(self, lessons: Iterable[Lesson]) -> LessonColumns:
+        lessons = list(lessons)
+        labels: Dict[str, List[str]] = {name: list(values) for name, values in self.labels.items()}
+        codes: Dict[str, List[int]] = {name: [] for name in DICTIONARIES}
+
+        for name in DICTIONARIES:
+            ids: Dict[str, int] = {value: i for i, value in enumerate(labels[name])}
+
+            for lesson in lessons:
+                value: str = getattr(lesson, name)
+
+                if name == 'teacher' and value:
+                    value = value.name
+
+                if value not in ids:
+                    ids[value] = len(labels[name])
+                    labels[name].append(value)
+
+                codes[name].append(ids[value])
+
+        return LessonColumns(
+            np.concatenate([self.start, np.array([to_epoch(lesson.start) for lesson in lessons], np.int64)]),
+            np.concatenate([self.end, np.array([to_epoch(lesson.end) for lesson in lessons], np.int64)]),
+            {name: np.concatenate([self.codes[name], np.array(codes[name], np.uint32)]) for name in DICTIONARIES},
+            labels
+        )
+
+    # Get a mask of the lessons that are contact time, given the subjects that aren't
+    def contact(self, non_contact: List[str]) -> np.ndarray:
+        subjects: np.ndarray = np.array(self.labels['subject'], dtype=object)
+        return ~np.isin(subjects, non_contact)[self.codes['subject']]
+
+    # Total the contact time in each group, largest first, or in day order by weekday. Lessons with one of
+    # the non contact subjects, such as the names of the bells, are left out.
+    def group(self, by: str, non_contact: List[str]) -> List[LessonGroup]:
+        mask: np.ndarray = self.contact(non_contact)
+        seconds: np.ndarray = (self.end - self.start)[mask]
+
+        if by == 'weekday':
+            keys: np.ndarray = ((self.start[mask] // 86400 + EPOCH_WEEKDAY) % 7).astype(np.intp)
+            labels: List[str] = list(calendar.day_name)
+        else:
+            keys = self.codes[by][mask].astype(np.intp)
+            labels = self.labels[by]
+
+        counts: np.ndarray = np.bincount(keys, minlength=len(labels))
+        totals: np.ndarray = np.bincount(keys, weights=seconds, minlength=len(labels))
+        total: float = totals.sum() or 1
+        order: np.ndarray = np.arange(len(labels)) if by == 'weekday' else np.argsort(-totals, kind='stable')
+
+        return [
+            LessonGroup(labels[i], int(counts[i]), float(totals[i]), float(totals[i] / total))
+            for i in order if counts[i]
+        ]
+
+# Aggregate of the tasks in a group
+class TaskGroup():
+    # Create an instance
+    def __init__(self, label: str, count: int, overdue: int, past_due: int, lead_days: float):
+        self.label: str = label
+        self.count: int = count
+        self.overdue: int = overdue
+        # Tasks that were due before today, which the overdue rate is out of
+        self.past_due: int = past_due
+        self.lead_days: float = lead_days
+
+    # Get the fraction of the tasks due before today that aren't done
+    @property
+    def overdue_rate(self) -> float:
+        return self.overdue / self.past_due if self.past_due else 0.0
+
+    # Get the aggregate as a dictionary
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.label,
+            'tasks': self.count,
+            'overdue': self.overdue,
+            'overdue_rate': self.overdue_rate,
+            'mean_lead_days': self.lead_days
+        }
+
+# Tasks held as arrays of date ordinals and codes. Tasks with several addressees are counted once for each.
+class TaskColumns():
+    # Create an instance
+    def __init__(
+            self,
+            set_date: np.ndarray,
+            due_date: np.ndarray,
+            done: np.ndarray,
+            setters: np.ndarray,
+            addressee_tasks: np.ndarray,
+            addressees: np.ndarray,
+            labels: Dict[str, List[str]],
+            today: Date
+        ):
+        # Ordinals of the set and due dates, or 0 if the task doesn't have one
+        self.set: np.ndarray = set_date
+        self.due: np.ndarray = due_date
+        self.done: np.ndarray = done
+        self.setters: np.ndarray = setters
+        # Pairs of task indices and addressee codes
+        self.addressee_tasks: np.ndarray = addressee_tasks
+        self.addressees: np.ndarray = addressees
+        self.labels: Dict[str, List[str]] = labels
+        self.today: int = today.toordinal()
+
+    # Create an instance from a list of tasks
+    @classmethod
+    def from_tasks(cls, tasks: List[Task], today: Date = None) -> TaskColumns:
+        labels: Dict[str, List[str]] = {'setter': [], 'addressee': []}
+        ids: Dict[str, Dict[str, int]] = {'setter': {}, 'addressee': {}}
+
+        # Get the code of a user, adding it to the labels if it's new
+        def encode(kind: str, user) -> int:
+            key: str = user.guid if user else None
+
+            if key not in ids[kind]:
+                ids[kind][key] = len(labels[kind])
+                labels[kind].append(user.name or user.guid if user else None)
+
+            return ids[kind][key]
+
+        pairs: List[Tuple[int, int]] = [(i, encode('addressee', addressee)) for i, task in enumerate(tasks) for addressee in task.addressees]
+
+        return cls(
+            np.fromiter((task.set.toordinal() if task.set else 0 for task in tasks), np.int64, len(tasks)),
+            np.fromiter((task.due.toordinal() if task.due else 0 for task in tasks), np.int64, len(tasks)),
+            np.fromiter((bool(task.is_done) for task in tasks), np.bool_, len(tasks)),
+            np.fromiter((encode('setter', task.setter) for task in tasks), np.intp, len(tasks)),
+            np.array([i for i, _ in pairs], np.intp),
+            np.array([code for _, code in pairs], np.intp),
+            labels,
+            today or Date.today()
+        )
+
+    # Get the number of tasks
+    def __len__(self) -> int:
+        return len(self.due)
+
+    # Get a copy with only the tasks in the mask
+    def where(self, mask: np.ndarray) -> TaskColumns:
+        # New index of each task that's kept
+        index: np.ndarray = np.cumsum(mask) - 1
+        kept: np.ndarray = mask[self.addressee_tasks]
+
+        return TaskColumns(
+            self.set[mask], self.due[mask], self.done[mask], self.setters[mask],
+            index[self.addressee_tasks[kept]], self.addressees[kept], self.labels, Date.fromordinal(self.today)
+        )
+
+    # Get a mask of the tasks due within the dates
+    def due_within(self, period: DatePeriod) -> np.ndarray:
+        return (self.due >= period.from_date.toordinal()) & (self.due <= period.until_date.toordinal())
+
+    # Get a mask of the tasks due before today that aren't done
+    def overdue(self) -> np.ndarray:
+        return self.past_due() & ~self.done
+
+    # Get a mask of the tasks that were due before today
+    def past_due(self) -> np.ndarray:
+        return (self.due > 0) & (self.due < self.today)
+
+    # Get the days between each task being set and due, and a mask of the tasks that have both dates
+    def lead_days(self) -> Tuple[np.ndarray, np.ndarray]:
+        valid: np.ndarray = (self.set > 0) & (self.due > 0)
+        return np.where(valid, self.due - self.set, 0), valid
+
+    # Aggregate all the tasks
+    def total(self) -> TaskGroup:
+        lead, valid = self.lead_days()
+
+        return TaskGroup(
+            None,
+            len(self),
+            int(self.overdue().sum()),
+            int(self.past_due().sum()),
+            float(lead[valid].mean()) if valid.any() else None
+        )
+
+    # Aggregate the tasks by code, given the index of the task each code belongs to
+    def _group(self, tasks: np.ndarray, codes: np.ndarray, labels: List[str]) -> List[TaskGroup]:
+        lead, valid = self.lead_days()
+        size: int = len(labels)
+
+        counts: np.ndarray = np.bincount(codes, minlength=size)
+        overdue: np.ndarray = np.bincount(codes, weights=self.overdue()[tasks], minlength=size)
+        past_due: np.ndarray = np.bincount(codes, weights=self.past_due()[tasks], minlength=size)
+        lead_totals: np.ndarray = np.bincount(codes, weights=lead[tasks], minlength=size)
+        lead_counts: np.ndarray = np.bincount(codes, weights=valid[tasks], minlength=size)
+
+        return [
+            TaskGroup(labels[i], int(counts[i]), int(overdue[i]), int(past_due[i]), float(lead_totals[i] / lead_counts[i]) if lead_counts[i] else None)
+            for i in np.argsort(-counts, kind='stable') if counts[i]
+        ]
+
+    # Aggregate the tasks by setter, busiest first
+    def by_setter(self) -> List[TaskGroup]:
+        return self._group(np.arange(len(self)), self.setters, self.labels['setter'])
+
+    # Aggregate the tasks by addressee, busiest first
+    def by_addressee(self) -> List[TaskGroup]:
+        return self._group(self.addressee_tasks, self.addressees, self.labels['addressee'])
+
+    # Count the tasks due in each week, from the first week a task is due in until the last
+    def due_per_week(self) -> List[Tuple[Date, int]]:
+        due: np.ndarray = self.due[self.due > 0]
+
+        if not len(due):
+            return []
+
+        # Ordinal 1 is a Monday, so weeks are counted from Mondays
+        weeks: np.ndarray = (due - 1) // 7
+        first: int = int(weeks.min())
+        counts: np.ndarray = np.bincount(weeks - first)
+
+        return [(Date.fromordinal((first + i) * 7 + 1), int(count)) for i, count in enumerate(counts)]
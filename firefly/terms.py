@@ -0,0 +1,138 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import os
+import json
+from pathlib import Path
+from .lock import FileLock
+from typing import List, Dict, Set, Callable
+from datetime import date as Date, timedelta as TimeDelta
+
+# Month and day by which every school year is over. The search for the end of a year never looks past it, or it
+# could find the start of the next year instead.
+YEAR_END: (int, int) = (8, 31)
+
+# Get the Monday of the last whole week of the school year the week of a Monday is in
+def year_horizon(monday: Date) -> Date:
+    month, day = YEAR_END
+    sunday: Date = monday + TimeDelta(days=6)
+    last_sunday: Date = Date(sunday.year + ((sunday.month, sunday.day) > (month, day)), month, day)
+    last_sunday -= TimeDelta(days=(last_sunday.weekday() + 1) % 7)
+
+    return last_sunday - TimeDelta(days=6)
+
+# Find the Monday of the last week of the school year with any lessons, from the week of a Monday on, or None if
+# there are none. Holidays during the year are shorter than `timeout` weeks, so a week without lessons is only
+# after the end of the year if none of the `timeout` weeks from it have any either. The search gallops forward
+# from the Monday in steps that double each time until it passes the end, then binary searches for the end
+# between the last two steps, so it checks O(log weeks) weeks rather than every one. Weeks are checked with
+# `is_active`, and never past the end of the school year.
+def find_year_end(monday: Date, timeout: int, is_active: Callable[[Date], bool]) -> Date:
+    # Last week known to have lessons, and first week known to have none after it, nor any week after that
+    last_active: Date = None
+    inactive_from: Date = year_horizon(monday) + TimeDelta(weeks=1)
+
+    # Find the first week with lessons from a week on, before it's known there are none, or None
+    def next_active(week: Date) -> Date:
+        for i in range(timeout):
+            candidate: Date = week + TimeDelta(weeks=i)
+
+            if candidate >= inactive_from:
+                break
+
+            if is_active(candidate):
+                return candidate
+
+        return None
+
+    step: int = 0
+
+    while monday + TimeDelta(weeks=step) < inactive_from:
+        week: Date = monday + TimeDelta(weeks=step)
+        step = max(1, 2 * step)
+
+        # Already known to have lessons after it
+        if last_active and week <= last_active:
+            continue
+
+        active: Date = next_active(week)
+
+        if not active:
+            inactive_from = week
+            break
+
+        last_active = active
+
+    if not last_active:
+        return None
+
+    while inactive_from - last_active > TimeDelta(weeks=1):
+        week = last_active + TimeDelta(weeks=(inactive_from - last_active).days // 14)
+        active = next_active(week)
+
+        if active:
+            last_active = active
+        else:
+            inactive_from = week
+
+    return last_active
+
+# Term boundaries learned from the timetable: the end of each school year and the weeks of holidays during it,
+# by Monday. Later exports start from what's known, rather than searching for them again.
+class TermStore():
+    # Create an instance
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.lock: FileLock = FileLock(path.with_name(path.name + '.lock'))
+
+    # Read the store
+    def _read(self) -> Dict[str, List[str]]:
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # Replace the store
+    def _write(self, terms: Dict[str, List[str]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = self.path.with_name(self.path.name + '.tmp')
+
+        with tmp_path.open('w') as f:
+            json.dump(terms, f)
+
+        os.replace(tmp_path, self.path)
+
+    # Get the Monday of the last week of the school year the week of a Monday is in, if it's known and not before it
+    def year_end(self, monday: Date) -> Date:
+        for end in map(Date.fromisoformat, self._read().get('ends', [])):
+            if monday <= end and year_horizon(end) == year_horizon(monday):
+                return end
+
+        return None
+
+    # Get the Mondays of the holidays known
+    def holidays(self) -> Set[Date]:
+        return set(map(Date.fromisoformat, self._read().get('holidays', [])))
+
+    # Learn the weeks of holidays from retrieved weeks of lessons by Monday: weeks without lessons between weeks
+    # with them. Weeks with lessons stop being holidays, in case they were before.
+    def learn(self, weeks: Dict[Date, List], year_end: Date = None):
+        active: List[Date] = sorted(week for week, lessons in weeks.items() if lessons)
+
+        with self.lock:
+            terms: Dict[str, List[str]] = self._read()
+            holidays: Set[Date] = set(map(Date.fromisoformat, terms.get('holidays', []))) - set(active)
+
+            if active:
+                holidays.update(week for week, lessons in weeks.items() if not lessons and active[0] < week < active[-1])
+
+            terms['holidays'] = sorted(week.isoformat() for week in holidays)
+
+            if year_end:
+                # A year only has one end
+                terms['ends'] = sorted(
+                    [end for end in terms.get('ends', []) if year_horizon(Date.fromisoformat(end)) != year_horizon(year_end)] + [year_end.isoformat()]
+                )
+
+            self._write(terms)
@@ -1,7 +1,19 @@
 # Copyright Paul Adams, 2020. All rights reserved.
 # Unauthorized reproduction is prohibited.
 
-from datetime import time as Time
+from __future__ import annotations
+
+import re
+import bisect
+import hashlib
+import calendar
+from .errors import ConfigError
+from configparser import ConfigParser
+from typing import List, Dict, Tuple
+from datetime import time as Time, datetime as DateTime, timedelta as TimeDelta
+
+# Label of a lesson without a subject
+FREE_PERIOD: str = 'Free Period'
 
 # Daily recurring event
 class DailyEvent():
@@ -10,7 +22,7 @@ class DailyEvent():
         self.start: Time = start
         self.end: Time = end
 
-# These constants are KGS specific
+# These constants are KGS specific, and are the bells used when none are configured
 BREAK: DailyEvent = DailyEvent(
     start=Time(10, 45),
     end=Time(11, 10)
@@ -18,4 +30,120 @@ BREAK: DailyEvent = DailyEvent(
 LUNCH: DailyEvent = DailyEvent(
     start=Time(12, 55),
     end=Time(14)
-)
\ No newline at end of file
+)
+
+# Get the seconds since midnight of a time
+def seconds(time: Time) -> int:
+    return time.hour * 3600 + time.minute * 60 + time.second
+
+# Bells of one weekday, as parallel lists of start and end seconds since midnight and labels, sorted by start
+class _BellTable():
+    # Create an instance
+    def __init__(self, bells: Dict[str, DailyEvent]):
+        rows: List[Tuple[int, int, str]] = sorted((seconds(bell.start), seconds(bell.end), label) for label, bell in bells.items())
+
+        self.starts: List[int] = [start for start, _, _ in rows]
+        self.ends: List[int] = [end for _, end, _ in rows]
+        self.labels: List[str] = [label for _, _, label in rows]
+
+        # The ends are binary searched, so they must be in order too
+        for i in range(1, len(rows)):
+            if self.starts[i] < self.ends[i - 1]:
+                raise ConfigError('The %s and %s bells overlap' % (self.labels[i - 1], self.labels[i]))
+
+# Times of the day that aren't lessons, such as break and lunch, which may vary by weekday. Compiled once into
+# a sorted table per weekday, so each planner event is split and labelled with a binary search and one pass.
+class BellSchedule():
+    # Config section of the bells, and the prefix of the sections that replace them on a weekday
+    SECTION: str = 'bells'
+
+    # Matches a time range such as 10:45-11:10
+    RANGE: re.Pattern = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$')
+
+    # Create an instance from the bells of every day, the KGS bells if none are given, and the bells that replace
+    # them on particular weekdays
+    def __init__(self, bells: Dict[str, DailyEvent] = None, weekdays: Dict[int, Dict[str, DailyEvent]] = None):
+        bells = {'Break': BREAK, 'Lunch': LUNCH} if bells is None else bells
+        weekdays = weekdays or {}
+
+        for label, bell in [(label, bell) for day in [bells, *weekdays.values()] for label, bell in day.items()]:
+            if bell.start >= bell.end:
+                raise ConfigError('The %s bell must end after it starts' % label)
+
+        self._tables: List[_BellTable] = [_BellTable(weekdays.get(weekday, bells)) for weekday in range(7)]
+        self.labels: List[str] = sorted({label for table in self._tables for label in table.labels})
+        # Identifies the schedule, so lessons split with different bells aren't mixed up
+        self.fingerprint: str = hashlib.sha1(repr([
+            list(zip(table.starts, table.ends, table.labels)) for table in self._tables
+        ]).encode('utf-8')).hexdigest()[:12]
+
+    # Create an instance from the config file, falling back to the KGS bells
+    @classmethod
+    def from_config(cls, parser: ConfigParser) -> BellSchedule:
+        bells: Dict[str, DailyEvent] = None
+
+        if parser.has_section(cls.SECTION):
+            bells = cls._parse_section(parser, cls.SECTION)
+
+        weekdays: Dict[int, Dict[str, DailyEvent]] = {}
+
+        for weekday, name in enumerate(calendar.day_name):
+            section: str = cls.SECTION + ':' + name.lower()
+
+            if parser.has_section(section):
+                weekdays[weekday] = cls._parse_section(parser, section)
+
+        return cls(bells, weekdays)
+
+    # Parse the bells in a config section
+    @classmethod
+    def _parse_section(cls, parser: ConfigParser, section: str) -> Dict[str, DailyEvent]:
+        bells: Dict[str, DailyEvent] = {}
+
+        for key, value in parser.items(section, raw=True):
+            match: re.Match = cls.RANGE.match(value)
+
+            if not match:
+                raise ConfigError('Please set the %s `%s` key to a time range such as 10:45-11:10' % (section, key))
+
+            try:
+                start_hour, start_minute, end_hour, end_minute = (int(group) for group in match.groups())
+                bells[key.title()] = DailyEvent(Time(start_hour, start_minute), Time(end_hour, end_minute))
+            except ValueError:
+                raise ConfigError('The %s `%s` key is not a valid time range' % (section, key))
+
+        return bells
+
+    # Split an event at the bells it overlaps. Returns the pieces in order as (start, end, label) tuples, where
+    # the label is the bell's name for pieces during a bell, or None for pieces outside the bells.
+    def split(self, start: DateTime, end: DateTime) -> List[Tuple[DateTime, DateTime, str]]:
+        table: _BellTable = self._tables[start.weekday()]
+        midnight: DateTime = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        from_seconds: int = int((start - midnight).total_seconds())
+        until_seconds: int = int((end - midnight).total_seconds())
+
+        # First bell that ends after the event starts
+        i: int = bisect.bisect_right(table.ends, from_seconds)
+
+        # Most events don't touch a bell
+        if i == len(table.starts) or table.starts[i] >= until_seconds:
+            return [(start, end, None)]
+
+        pieces: List[Tuple[int, int, str]] = []
+        cursor: int = from_seconds
+
+        while i < len(table.starts) and table.starts[i] < until_seconds:
+            bell_start: int = max(table.starts[i], cursor)
+            bell_end: int = min(table.ends[i], until_seconds)
+
+            if bell_start > cursor:
+                pieces.append((cursor, bell_start, None))
+
+            pieces.append((bell_start, bell_end, table.labels[i]))
+            cursor = bell_end
+            i += 1
+
+        if cursor < until_seconds:
+            pieces.append((cursor, until_seconds, None))
+
+        return [(midnight + TimeDelta(seconds=piece_start), midnight + TimeDelta(seconds=piece_end), label) for piece_start, piece_end, label in pieces]
@@ -0,0 +1,188 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator
+
+# Timed unit of work
+class Span():
+    # Create an instance
+    def __init__(self, tracer: Tracer, name: str, parent: Span = None, **attrs):
+        self.tracer: Tracer = tracer
+        self.name: str = name
+        self.parent: Span = parent
+        self.depth: int = parent.depth + 1 if parent else 0
+        self.attrs: Dict[str, Any] = attrs
+        self.start: float = None
+        self.end: float = None
+
+    # Record extra attributes on the span
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    # Get the span duration in seconds
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    # Start timing
+    def __enter__(self) -> Span:
+        self.start = time.perf_counter()
+        self.tracer._push(self)
+        return self
+
+    # Stop timing
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        self.tracer._pop(self)
+
+        if exc_type:
+            self.attrs['error'] = exc_type.__name__
+
+    # Spans are truthy so callers can skip computing attributes when tracing is off
+    def __bool__(self) -> bool:
+        return True
+
+# Stand-in for a span when tracing is disabled
+class _NullSpan():
+    # Discard the attributes
+    def set(self, **attrs):
+        pass
+
+    # Do nothing on entry
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    # Do nothing on exit
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    # Null spans are falsy
+    def __bool__(self) -> bool:
+        return False
+
+# Shared, stateless null span
+_NULL_SPAN: _NullSpan = _NullSpan()
+
+# Collects spans for a single run
+class Tracer():
+    # Create an instance
+    def __init__(self):
+        self.enabled: bool = False
+        self.spans: List[Span] = []
+        self._origin: float = time.perf_counter()
+        self._local: threading.local = threading.local()
+        self._lock: threading.Lock = threading.Lock()
+
+    # Start recording spans
+    def enable(self):
+        self.enabled = True
+        self._origin = time.perf_counter()
+
+    # Create a span, or the null span if tracing is disabled
+    def span(self, name: str, **attrs) -> Span:
+        if not self.enabled:
+            return _NULL_SPAN
+
+        stack: List[Span] = self._stack()
+
+        return Span(self, name, stack[-1] if stack else None, **attrs)
+
+    # Get the open spans for the current thread
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+
+        return self._local.stack
+
+    # Open a span
+    def _push(self, span: Span):
+        self._stack().append(span)
+
+        with self._lock:
+            self.spans.append(span)
+
+    # Close a span
+    def _pop(self, span: Span):
+        stack: List[Span] = self._stack()
+
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    # Convert the spans to JSON serialisable dicts
+    def to_dicts(self) -> List[Dict]:
+        return [
+            {
+                'name': span.name,
+                'depth': span.depth,
+                'start_ms': (span.start - self._origin) * 1000,
+                'duration_ms': span.duration * 1000,
+                **span.attrs
+            }
+            for span in sorted(self.spans, key=lambda span: span.start)
+        ]
+
+    # Render the spans as a waterfall
+    def waterfall(self, width: int = 30) -> str:
+        spans: List[Span] = sorted(self.spans, key=lambda span: span.start)
+
+        if not spans:
+            return 'No spans recorded'
+
+        total: float = max(span.start + span.duration for span in spans) - self._origin
+        lines: List[str] = []
+
+        for span in spans:
+            offset: float = span.start - self._origin
+            bar_start: int = int(offset / total * width) if total else 0
+            bar_width: int = max(1, int(span.duration / total * width)) if total else 1
+            bar: str = (' ' * bar_start + '█' * bar_width).ljust(width)[:width]
+            attrs: str = ' '.join('%s=%s' % (k, _format_attr(k, v)) for k, v in span.attrs.items())
+
+            lines.append('%8.1fms %8.1fms |%s| %s%s %s' % (
+                offset * 1000, span.duration * 1000, bar, '  ' * span.depth, span.name, attrs
+            ))
+
+        return '\n'.join(lines)
+
+# Format a span attribute for the waterfall
+def _format_attr(key: str, value: Any) -> str:
+    if key == 'bytes' and isinstance(value, int):
+        return '%.1fKB' % (value / 1024) if value >= 1024 else '%dB' % value
+    if isinstance(value, float):
+        return '%.1fms' % (value * 1000)
+
+    return str(value)
+
+# The tracer singleton
+tracer: Tracer = Tracer()
+
+# Create a span on the tracer singleton
+def span(name: str, **attrs) -> Span:
+    return tracer.span(name, **attrs) if tracer.enabled else _NULL_SPAN
+
+# Trace the enclosed code if asked to, printing a waterfall to stderr and/or writing the spans as JSON
+@contextmanager
+def tracing(waterfall: bool = False, json_path: str = None, name: str = 'command') -> Iterator[Span]:
+    if not waterfall and not json_path:
+        yield _NULL_SPAN
+        return
+
+    tracer.enable()
+
+    try:
+        with tracer.span(name) as root:
+            yield root
+    finally:
+        if waterfall:
+            print(tracer.waterfall(), file=sys.stderr)
+
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(tracer.to_dicts(), f, indent=2)
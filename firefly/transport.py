@@ -0,0 +1,117 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+from typing import List, Tuple, Iterator
+from http.client import HTTPMessage
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from .errors import ConfigError
+from requests import Session, PreparedRequest as Request, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from requests import exceptions
+
+# Names of the transports the `[firefly] transport` key may be set to
+TRANSPORTS: List[str] = ['http1', 'http2']
+
+# Headers that only mean something to a single HTTP/1.1 connection, which HTTP/2 forbids
+HOP_BY_HOP_HEADERS: List[str] = ['connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade']
+
+# Send the requests a session makes to a URL over a transport. HTTP/1.1 is the session's own.
+def mount(session: Session, url: str, transport: str):
+    if transport not in TRANSPORTS:
+        raise ConfigError('Please set the `[firefly] transport` key to either %s' % ' or '.join(TRANSPORTS))
+
+    if transport == 'http2':
+        session.mount(url, HTTP2Adapter(prior_knowledge=url.startswith('http://')))
+
+# Stands in for the urllib3 response that requests reads the cookies and body of a response from
+class _RawResponse():
+    # Create an instance
+    def __init__(self, headers: List[Tuple[str, str]], body: Iterator[bytes] = None, close=None):
+        self.msg: HTTPMessage = HTTPMessage()
+        # Cookies are read from the original response's headers, where each Set-Cookie is kept apart
+        self._original_response: _RawResponse = self
+        self._body: Iterator[bytes] = body or iter([])
+        self._close = close
+
+        for name, value in headers:
+            self.msg[name] = value
+
+    # Stream the decoded body, as requests does when a response is iterated
+    def stream(self, chunk_size: int = None, decode_content: bool = True) -> Iterator[bytes]:
+        yield from self._body
+
+    # Read what's left of the body
+    def read(self, *args, **kwargs) -> bytes:
+        return b''.join(self._body)
+
+    # Close the stream
+    def close(self):
+        if self._close:
+            self._close()
+
+# Sends the requests of a session over HTTP/2 with httpx, so the requests made at once share one connection per
+# host and their headers are compressed. requests still handles cookies and redirects, so the responses are the
+# same as those of HTTP/1.1.
+class HTTP2Adapter(BaseAdapter):
+    # Create an instance. Servers without TLS can't negotiate HTTP/2, so it's spoken to them from the start.
+    def __init__(self, prior_knowledge: bool = False):
+        super().__init__()
+
+        # HTTP/2 is an optional extra, and httpx takes a while to import, so it's only imported when it's used
+        try:
+            import httpx
+        except ImportError:
+            raise ConfigError('HTTP/2 needs httpx, so please run `pip install httpx[http2]` or set the `[firefly] transport` key to http1')
+
+        self._httpx = httpx
+        self._client: httpx.Client = httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            follow_redirects=False,
+            # The session's cookie jar is the only one, so httpx mustn't keep or send cookies of its own
+            cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[]))
+        )
+
+    # Send a request
+    def send(self, request: Request, stream: bool = False, timeout=None, verify=True, cert=None, proxies=None) -> Response:
+        headers: List[Tuple[str, str]] = [
+            (name, value) for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS
+        ]
+        httpx = self._httpx
+        # requests accepts a (connect, read) tuple
+        timeout = httpx.Timeout(timeout[1], connect=timeout[0]) if isinstance(timeout, tuple) else httpx.Timeout(timeout)
+
+        try:
+            reply = self._client.send(
+                self._client.build_request(request.method, request.url, headers=headers, content=request.body, timeout=timeout),
+                stream=stream
+            )
+        except httpx.TimeoutException as e:
+            raise exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise exceptions.ConnectionError(e, request=request)
+
+        response: Response = Response()
+        response.status_code = reply.status_code
+        response.reason = reply.reason_phrase
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+
+        if stream:
+            response.raw = _RawResponse(reply.headers.multi_items(), reply.iter_bytes(), reply.close)
+        else:
+            response.raw = _RawResponse(reply.headers.multi_items())
+            # httpx has already decoded the body, so requests mustn't try to read it from the raw response again
+            response._content = reply.content
+            response._content_consumed = True
+
+        return response
+
+    # Close the connections
+    def close(self):
+        self._client.close()
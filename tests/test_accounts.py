@@ -0,0 +1,94 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import time
+import unittest
+from typing import List
+from argparse import Namespace
+from contextlib import redirect_stdout
+from configparser import ConfigParser
+from firefly import config, accounts, InputError, ConfigError
+from firefly.accounts import ClientPool
+
+# Running a command for several accounts at once
+class TestClientPool(unittest.TestCase):
+    # Replace the config with one holding two accounts
+    def setUp(self):
+        self.parser: ConfigParser = config.Parser
+        config.Parser = ConfigParser()
+        config.Parser.read_string('[firefly]\nhostname = example.com\n[account:alice]\nusername = alice\n[account:bob]\nusername = bob\n')
+
+    # Restore the config
+    def tearDown(self):
+        config.Parser = self.parser
+
+    # Test the accounts are chosen from the config with --all-accounts, or by name with --accounts
+    def test_selected(self):
+        self.assertEqual(accounts.names(), ['alice', 'bob'])
+        self.assertEqual(accounts.selected(Namespace(all_accounts=True, accounts=None)), ['alice', 'bob'])
+        self.assertEqual(accounts.selected(Namespace(all_accounts=False, accounts=['bob'])), ['bob'])
+        self.assertIsNone(accounts.selected(Namespace()))
+
+    # Test accounts without a config section are refused
+    def test_unknown_account(self):
+        with self.assertRaises(ConfigError):
+            ClientPool(['carol'])
+
+        with self.assertRaises(ConfigError):
+            ClientPool([])
+
+    # Test every account runs at once, with its output printed under its name in the order given
+    def test_run(self):
+        # Print the current account, the first slower than the second
+        def callback():
+            account: str = accounts.current()
+            time.sleep(0.1 if account == 'alice' else 0)
+            print('Hello', account)
+
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output):
+            self.assertEqual(ClientPool(['alice', 'bob']).run(callback), 0)
+
+        lines: List[str] = output.getvalue().splitlines()
+
+        self.assertEqual([line for line in lines if line.startswith('Hello')], ['Hello alice', 'Hello bob'])
+        self.assertIn('alice', lines[0])
+        self.assertIsNone(accounts.current())
+
+    # Test an account that fails is reported and counted without stopping the others
+    def test_failure(self):
+        # Fail for the first account
+        def callback():
+            if accounts.current() == 'alice':
+                raise InputError('No lessons')
+
+            print('Hello', accounts.current())
+
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output):
+            self.assertEqual(ClientPool(['alice', 'bob']).run(callback), 1)
+
+        self.assertIn('No lessons', output.getvalue())
+        self.assertIn('Hello bob', output.getvalue())
+
+    # Test an unexpected error is raised once every account is done
+    def test_unexpected_error(self):
+        # Fail unexpectedly for the first account
+        def callback():
+            if accounts.current() == 'alice':
+                raise RuntimeError()
+
+            print('Hello', accounts.current())
+
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output), self.assertRaises(RuntimeError):
+            ClientPool(['alice', 'bob']).run(callback)
+
+        self.assertIn('Hello bob', output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from firefly.archive import Archive, ArchiveView
+from firefly import Lesson, Teacher, DatePeriod, InputError
+from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta
+
+MONDAY: Date = Date(2021, 3, 1)
+
+# Create the lessons of a week, one a day
+def week(monday: Date) -> List[Lesson]:
+    return [
+        Lesson(
+            start=DateTime.combine(monday + TimeDelta(days=i), DateTime.min.time()) + TimeDelta(hours=9),
+            end=DateTime.combine(monday + TimeDelta(days=i), DateTime.min.time()) + TimeDelta(hours=10),
+            subject=['Maths', 'Physics'][i % 2],
+            teacher=Teacher('Mr Smith') if i % 2 else None,
+            room='S%d' % i
+        ) for i in range(5)
+    ]
+
+# The columnar timetable archive
+class TestArchive(unittest.TestCase):
+    # Create an empty archive
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.archive: Archive = Archive(self.path.joinpath('archive'))
+
+    # Delete the archive
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Archive a week of lessons from a Monday
+    def append(self, monday: Date) -> int:
+        return self.archive.append(DatePeriod(monday, monday + TimeDelta(days=6)), week(monday))
+
+    # Get the subjects, teachers and rooms of the lessons archived within dates
+    def read(self, period: DatePeriod) -> List[tuple]:
+        with self.archive.view() as view:
+            return [
+                (lesson.start, lesson.subject, lesson.teacher.name if lesson.teacher else None, lesson.room)
+                for lesson in view.lessons(period)
+            ]
+
+    # Test lessons read back as they were archived, and only within the dates asked for
+    def test_round_trip(self):
+        self.assertEqual(self.append(MONDAY), 5)
+        self.assertEqual(self.append(MONDAY + TimeDelta(weeks=1)), 5)
+
+        lessons: List[tuple] = self.read(DatePeriod(MONDAY + TimeDelta(days=1), MONDAY + TimeDelta(days=7)))
+
+        self.assertEqual(len(lessons), 5)
+        self.assertEqual(lessons[0], (DateTime(2021, 3, 2, 9), 'Physics', 'Mr Smith', 'S1'))
+        self.assertEqual(lessons[-1], (DateTime(2021, 3, 8, 9), 'Maths', None, 'S0'))
+        self.assertEqual(self.archive.period().until_date, MONDAY + TimeDelta(days=13))
+
+    # Test the archive can only be extended from the day after it ends
+    def test_append_must_follow_on(self):
+        self.append(MONDAY)
+
+        with self.assertRaises(InputError):
+            self.append(MONDAY + TimeDelta(weeks=2))
+
+    # Test an append that was cut off part way through an item is ignored by readers, then cut off by the next append
+    def test_torn_append(self):
+        self.append(MONDAY)
+
+        for name in ['start', 'subject']:
+            with self.archive.column_path(name).open('ab') as f:
+                f.write(b'\x01\x02\x03')
+
+        self.assertEqual(len(self.read(DatePeriod(MONDAY, MONDAY + TimeDelta(days=6)))), 5)
+
+        self.append(MONDAY + TimeDelta(weeks=1))
+
+        self.assertEqual(len(self.read(DatePeriod(MONDAY, MONDAY + TimeDelta(days=13)))), 10)
+
+    # Test rows written after the metadata was last replaced aren't visible
+    def test_unrecorded_rows(self):
+        self.append(MONDAY)
+        meta_path: Path = self.archive.path.joinpath('meta.json')
+        meta: dict = json.loads(meta_path.read_text())
+        meta_path.write_text(json.dumps(dict(meta, rows=3)))
+
+        with self.archive.view() as view:
+            self.assertIsInstance(view, ArchiveView)
+            self.assertEqual(len(view.columns['start']), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import json
+import threading
+import unittest
+from typing import Dict
+from requests import Session, Response
+from bench.harness import Harness, Report
+from bench.server import Firefly, serve, USERNAME, PASSWORD
+
+# The simulated Firefly server
+class TestServer(unittest.TestCase):
+    # Serve an app for the test
+    def start(self, app: Firefly) -> str:
+        server = serve(app)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        return 'http://%s:%d' % server.server_address
+
+    # Log a session in
+    def login(self, url: str) -> Session:
+        session: Session = Session()
+        self.addCleanup(session.close)
+        session.post(url + '/login/login.aspx', data={'username': USERNAME, 'password': PASSWORD})
+
+        return session
+
+    # Test pages that need a session redirect to the login page until it's logged in
+    def test_login(self):
+        url: str = self.start(Firefly())
+        response: Response = Session().get(url + '/planner/week/2021-03-01', allow_redirects=False)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login/login.aspx?prelogin=', response.headers['Location'])
+
+        response = self.login(url).get(url + '/planner/week/2021-03-01')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('PLANNER_INITIAL_STATUS', response.text)
+
+    # Test a session expires once it's been idle for longer than the session lifetime
+    def test_session_expiry(self):
+        app: Firefly = Firefly(session_ttl=0)
+        url: str = self.start(app)
+        session: Session = self.login(url)
+        app.sessions = {session_id: last_used - 1 for session_id, last_used in app.sessions.items()}
+
+        self.assertEqual(session.get(url + '/pupil-portal', allow_redirects=False).status_code, 302)
+
+    # Test errors are injected at the configured rate, and requests over capacity are turned away with a Retry-After
+    def test_errors_and_capacity(self):
+        url: str = self.start(Firefly(error_rate=1.0))
+
+        self.assertEqual(Session().get(url + '/login/login.aspx').status_code, 503)
+
+        url = self.start(Firefly(capacity=0))
+        response: Response = Session().get(url + '/login/login.aspx')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+        stats: Dict[str, int] = json.loads(Session().get(url + '/__stats').text)
+
+        self.assertEqual(stats['rejected'], 1)
+
+# Running ff against the simulated server
+class TestHarness(unittest.TestCase):
+    # Test ff commands run against the server and are timed, with the requests they make
+    def test_run(self):
+        with Harness() as harness:
+            report: Report = harness.run(['timetable', '-d', '2021-03-01'], runs=2)
+
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(len(report.latencies), 2)
+        self.assertFalse(report.is_local)
+        self.assertEqual(sum(count for route, count in report.requests.items() if route.startswith('GET /planner')), 2)
+        self.assertIn('ff timetable -d 2021-03-01', str(report))
+
+    # Test the percentiles are taken by the nearest rank
+    def test_percentile(self):
+        report: Report = Report(['tasks'], [0.4, 0.1, 0.3, 0.2], 0, 1.0, {})
+
+        self.assertEqual(report.percentile(50), 0.2)
+        self.assertEqual(report.percentile(99), 0.4)
+        self.assertTrue(report.is_local)
+        self.assertEqual(report.throughput, 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+from firefly import Client, config
+from firefly.accounts import SilentSpinner
+from firefly.commands import Command
+from firefly.cache import CacheMode, CacheMiss, CacheRead
+
+# Create a client that's never asked to reach a server
+def offline_client(storage_path: Path) -> Client:
+    client: Client = Client('http://127.0.0.1:9', 'user', 'password', storage_path, cache_ttl={'directory': 60})
+    client.spinner = SilentSpinner()
+
+    return client
+
+# Reading the cache in a mode
+class TestCacheModes(unittest.TestCase):
+    # Create a client with an empty cache
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.client: Client = offline_client(self.path)
+        self.calls: List[str] = []
+
+    # Delete the cache
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Get the teachers with a surname through the cache
+    def search(self, surname: str = 'Smith') -> str:
+        # Record the search
+        def fetch() -> str:
+            self.calls.append(surname)
+            return 'Mr ' + surname
+
+        return self.client._cached('directory', surname, fetch)
+
+    # Test fresh entries are served normally, and refreshing always fetches
+    def test_normal_and_refresh(self):
+        self.assertEqual(self.search(), 'Mr Smith')
+        self.assertEqual(self.search(), 'Mr Smith')
+
+        with self.client.cache_mode(CacheMode.REFRESH):
+            self.search()
+
+        self.assertEqual(self.calls, ['Smith', 'Smith'])
+
+    # Test reading offline serves entries of any age, recording whether they were stale, and never fetches
+    def test_offline(self):
+        self.search()
+        self.client.cache_ttl['directory'] = 0
+        time.sleep(0.01)
+
+        with self.client.cache_mode(CacheMode.OFFLINE) as read:
+            self.assertEqual(self.search(), 'Mr Smith')
+
+            with self.assertRaises(CacheMiss):
+                self.search('Jones')
+
+        self.assertTrue(read.is_stale)
+        self.assertGreater(read.age, 0)
+        self.assertEqual(self.calls, ['Smith'])
+
+    # Test threads fanned out to read the cache in the mode of the thread that started them
+    def test_fan_out(self):
+        self.search()
+
+        with self.client.cache_mode(CacheMode.REFRESH), ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(self.client._in_cache_mode(self.search), ['Smith', 'Smith']))
+
+        self.assertEqual(self.calls, ['Smith', 'Smith', 'Smith'])
+
+# Command that prints the teachers found with a surname
+class SearchCommand(Command):
+    # Create an instance
+    def __init__(self, client: Client):
+        super().__init__(ArgumentParser())
+        self.client: Client = client
+        self.teachers: List[str] = ['Mr Smith', 'Ms Jones']
+
+    # Get the client
+    @property
+    def firefly_client(self) -> Client:
+        return self.client
+
+    # Print the teachers, from the cache if it's stale
+    def run(self):
+        self.print_stale_while_revalidate(
+            lambda client: client._cached('directory', 'S', lambda: list(self.teachers)),
+            lambda teachers: print('\n'.join(teachers))
+        )
+
+# Printing stale results at once, then revalidating them
+class TestStaleWhileRevalidate(unittest.TestCase):
+    # Create a command and replace the config with an empty one
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.command: SearchCommand = SearchCommand(offline_client(self.path))
+        self.parser: ConfigParser = config.Parser
+        config.Parser = ConfigParser()
+
+    # Restore the config and delete the cache
+    def tearDown(self):
+        config.Parser = self.parser
+        shutil.rmtree(self.path)
+
+    # Run the command, returning its output
+    def run_command(self) -> List[str]:
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output):
+            self.command.run()
+
+        return output.getvalue().splitlines()
+
+    # Test results are fetched first when nothing is cached, and fresh results are printed without fetching again
+    def test_fresh(self):
+        self.assertEqual(self.run_command(), ['Mr Smith', 'Ms Jones'])
+
+        self.command.teachers = ['Mr Brown']
+
+        self.assertEqual(self.run_command(), ['Mr Smith', 'Ms Jones'])
+
+    # Test stale results are printed, then only the lines that changed once they're fetched again
+    def test_stale(self):
+        self.run_command()
+        self.command.client.cache_ttl['directory'] = 0
+        self.command.teachers = ['Mr Smith', 'Mr Brown']
+        time.sleep(0.01)
+        lines: List[str] = self.run_command()
+
+        self.assertEqual(lines[:2], ['Mr Smith', 'Ms Jones'])
+        self.assertIn('Cached', lines[2])
+        self.assertEqual(lines[3:], ['-Ms Jones', '+Mr Brown'])
+
+    # Test stale results that haven't changed are confirmed as up to date
+    def test_up_to_date(self):
+        self.run_command()
+        self.command.client.cache_ttl['directory'] = 0
+        time.sleep(0.01)
+
+        self.assertIn('Up to date', self.run_command()[-1])
+
+if __name__ == '__main__':
+    unittest.main()
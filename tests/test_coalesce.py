@@ -0,0 +1,70 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import threading
+import unittest
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from firefly.coalesce import Coalescer
+
+# Sharing the result of identical calls in flight at once
+class TestCoalescer(unittest.TestCase):
+    # Create a coalescer and a callback that blocks until it's released
+    def setUp(self):
+        self.coalescer: Coalescer = Coalescer()
+        self.calls: List[str] = []
+        self.started: threading.Event = threading.Event()
+        self.release: threading.Event = threading.Event()
+
+    # Record a call, then wait to be released
+    def fetch(self, key: str) -> str:
+        self.calls.append(key)
+        self.started.set()
+        self.release.wait(5)
+
+        if key == 'missing':
+            raise KeyError(key)
+
+        return key.upper()
+
+    # Run calls with the keys at once, waiting for the first to start before making the rest
+    def run_all(self, keys: List[str]) -> List:
+        # Make a call, returning the exception raised instead of its result
+        def call(key: str):
+            try:
+                return self.coalescer.run(key, lambda: self.fetch(key))
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            first = executor.submit(call, keys[0])
+            self.started.wait(5)
+            rest = [executor.submit(call, key) for key in keys[1:]]
+            # Give the rest time to join the call in flight
+            threading.Event().wait(0.1)
+            self.release.set()
+
+            return [future.result() for future in [first] + rest]
+
+    # Test identical calls in flight at once are made once, while different ones are made separately
+    def test_identical_calls(self):
+        self.assertEqual(self.run_all(['week', 'week', 'week', 'day']), ['WEEK', 'WEEK', 'WEEK', 'DAY'])
+        self.assertEqual(sorted(self.calls), ['day', 'week'])
+
+    # Test an exception is raised in every caller
+    def test_exception(self):
+        results: List = self.run_all(['missing', 'missing'])
+
+        self.assertEqual(self.calls, ['missing'])
+        self.assertTrue(all(isinstance(result, KeyError) for result in results))
+
+    # Test a call made after the last one finished is made again
+    def test_sequential_calls(self):
+        self.release.set()
+
+        self.assertEqual(self.coalescer.run('week', lambda: self.fetch('week')), 'WEEK')
+        self.assertEqual(self.coalescer.run('week', lambda: self.fetch('week')), 'WEEK')
+        self.assertEqual(self.calls, ['week', 'week'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+from pathlib import Path
+from typing import List, Dict
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import date as Date
+from firefly import Task, User, Class, complete
+from firefly.complete import CompletionIndex, describe_parser, candidates, INDEX_NAME
+from firefly.commands import Command, tasks
+
+# Create a task set by Mr Smith to a class
+def task(id: int, title: str, is_done: bool = False) -> Task:
+    return Task(id, title, [Class('class-guid', '11X/Ma')], User('smith-guid', 'Mr Smith'), Date(2021, 3, 1), Date(2021, 3, 8), is_done)
+
+# Completing ff command lines from the indexes
+class TestCompletion(unittest.TestCase):
+    # Index the task commands and some tasks in an empty storage directory
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.storage_path: Path = complete.PATH
+        self.commands_path: Path = complete.COMMANDS_PATH
+        complete.PATH = self.path
+        complete.COMMANDS_PATH = self.path.joinpath('commands.json')
+
+        self.tree: Dict = describe_parser(Command(ArgumentParser(prog='ff'), subcommands=[tasks.GetTasks]).parser)
+        complete.index_commands(self.tree)
+        CompletionIndex(self.path.joinpath(INDEX_NAME)).add_tasks([task(1, 'Essay'), task(2, 'Lab report', is_done=True)])
+
+    # Restore the storage path and delete the directory
+    def tearDown(self):
+        complete.PATH = self.storage_path
+        complete.COMMANDS_PATH = self.commands_path
+        shutil.rmtree(self.path)
+
+    # Get the values that complete a command line
+    def values(self, words: List[str]) -> List[str]:
+        return [value for value, _ in candidates(words, self.tree)]
+
+    # Test commands and options are completed from what's typed so far
+    def test_commands_and_options(self):
+        self.assertEqual(self.values(['ta']), ['tasks'])
+        self.assertIn('watch', self.values(['tasks', '']))
+        self.assertEqual(self.values(['tasks', '--set-b']), ['--set-by'])
+
+    # Test task IDs are offered to the commands that can mark them, most recent first
+    def test_task_ids(self):
+        self.assertEqual(candidates(['tasks', 'done', ''], self.tree), [('1', 'Essay')])
+        self.assertEqual(self.values(['tasks', 'todo', '']), ['2'])
+        self.assertEqual(self.values(['tasks', 'files', '']), ['2', '1'])
+
+    # Test setters and classes are offered by GUID, and values already given aren't offered again
+    def test_guids(self):
+        self.assertEqual(candidates(['tasks', '--set-by', ''], self.tree), [('smith-guid', 'Mr Smith')])
+        self.assertEqual(self.values(['tasks', '--set-to', 'class-guid', '']), [])
+
+    # Test the candidates are printed in the format each shell reads
+    def test_main(self):
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output):
+            complete.main(['complete.py', 'zsh', 'tasks', 'done', ''])
+            complete.main(['complete.py', 'fish', 'tasks', 'done', ''])
+            complete.main(['complete.py', 'bash', 'tasks', 'done', ''])
+
+        self.assertEqual(output.getvalue().splitlines(), ['1:Essay', '1\tEssay', '1'])
+
+    # Test the script runs the way the completion scripts run it, without site packages or the rest of the package
+    def test_standard_library_only(self):
+        home: Path = self.path.joinpath('home')
+        shutil.copytree(self.path, home.joinpath('.ff-timetable'), ignore=shutil.ignore_patterns('home'))
+        output: str = subprocess.run(
+            [sys.executable, '-S', '-E', complete.__file__, 'bash', 'tasks', 'done', ''],
+            env=dict(os.environ, HOME=str(home)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+
+        self.assertEqual(output.splitlines(), ['1'])
+
+    # Test only the most recently retrieved tasks are kept
+    def test_max_tasks(self):
+        index: CompletionIndex = CompletionIndex(self.path.joinpath(INDEX_NAME))
+        index.add_tasks(task(i, 'Task %d' % i) for i in range(3, complete.MAX_TASKS + 3))
+        index.add_tasks([task(3, 'Task 3')])
+        task_ids: List[str] = list(index.read()['tasks'])
+
+        self.assertEqual(len(task_ids), complete.MAX_TASKS)
+        self.assertEqual(task_ids[-1], '3')
+        self.assertNotIn('1', task_ids)
+
+if __name__ == '__main__':
+    unittest.main()
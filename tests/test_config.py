@@ -0,0 +1,38 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import unittest
+from configparser import ConfigParser
+from firefly import config
+
+# Parse a config file
+def parser(text: str) -> ConfigParser:
+    parser: ConfigParser = ConfigParser()
+    parser.read_string(text)
+
+    return parser
+
+# Cache lifetimes from the config file
+class TestCacheTTL(unittest.TestCase):
+    # Test results aren't cached by default
+    def test_opt_in(self):
+        self.assertEqual(config.cache_ttl(parser('')), {namespace: 0 for namespace in config.CACHE_TTL})
+
+    # Test enabling prefetching turns on the default lifetimes, so the results it fetches are served
+    def test_prefetch_defaults(self):
+        self.assertEqual(config.cache_ttl(parser('[prefetch]\nenabled = true\n')), config.CACHE_TTL)
+
+    # Test the cache section overrides the defaults either way
+    def test_overrides(self):
+        ttl = config.cache_ttl(parser('[cache]\nlessons = 60\n'))
+
+        self.assertEqual(ttl['lessons'], 60)
+        self.assertEqual(ttl['tasks'], 0)
+
+        ttl = config.cache_ttl(parser('[prefetch]\nenabled = true\n[cache]\ntasks = 0\n'))
+
+        self.assertEqual(ttl['tasks'], 0)
+        self.assertEqual(ttl['lessons'], config.CACHE_TTL['lessons'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import unittest
+from typing import List, Iterator
+from firefly import Teacher
+from firefly.directory import parse_directory
+from bench import parsers
+
+# Header row of the results table
+HEADER: str = '<tr><th></th><th>Name</th><th>Roles</th><th>Departments</th><th>Contact</th></tr>'
+
+# Row of the results table for a teacher, with a table of its own in the contact cell
+ROW: str = (
+    '<tr><td><img src="/smith.jpg"></td><td><h3>Mr Smith</h3></td><td>Teacher<br>Head of Year</td><td>Maths, Physics</td>'
+    '<td>01234 567890<br><a href="mailto:smith@example.com">smith@example.com</a><table><tr><td>Nested</td></tr></table></td></tr>'
+)
+
+# Split a page into chunks of a few bytes, as it might arrive from the network
+def chunks(page: str, size: int = 7) -> Iterator[bytes]:
+    body: bytes = page.encode('utf-8')
+
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+# Parsing directory results as they arrive
+class TestParseDirectory(unittest.TestCase):
+    # Test the rows of the results table are parsed, skipping the header and tables inside cells
+    def test_rows(self):
+        page: str = '<html><body><table><tr><td>Menu</td></tr></table><div id="StaffResults"><table>%s%s%s</table></div></body></html>' % (HEADER, ROW, ROW.replace('Smith', 'Jones'))
+        teachers: List[Teacher] = list(parse_directory(chunks(page), 'utf-8'))
+
+        self.assertEqual([teacher.name for teacher in teachers], ['Mr Smith', 'Mr Jones'])
+        self.assertEqual(teachers[0].picture, '/smith.jpg')
+        self.assertEqual(teachers[0].roles, ['Teacher', 'Head of Year'])
+        self.assertEqual(teachers[0].departments, ['Maths', 'Physics'])
+        self.assertEqual((teachers[0].phone_number, teachers[0].email_address), ('01234 567890', 'smith@example.com'))
+
+    # Test nothing more is read once the results table ends
+    def test_stops_after_results(self):
+        # Send the results, then fail if anything more is asked for
+        def body() -> Iterator[bytes]:
+            yield from chunks('<html><body><div id="StaffResults"><table>%s%s</table>' % (HEADER, ROW))
+            raise AssertionError('Read past the results')
+
+        self.assertEqual(len(list(parse_directory(body(), 'utf-8'))), 1)
+
+    # Test pages without results give no teachers
+    def test_no_results(self):
+        self.assertEqual(list(parse_directory(chunks('<html><body><p>No staff found</p></body></html>'))), [])
+        self.assertEqual(list(parse_directory(chunks('<div id="StaffResults"><table>%s</table></div>' % HEADER))), [])
+
+    # Test the streaming parser agrees with the reference parser on a generated school
+    def test_matches_reference(self):
+        self.assertEqual(set(parsers.compare(staff=200, runs=1)), {'beautifulsoup', 'lxml'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import unittest
+from typing import Dict
+from bench import exports
+from bench.data import School
+from bench.harness import Harness
+from bench.server import Firefly
+
+# Timetable exports that sample the rota, checked against full exports of a school year from the simulated Firefly
+class TestSmartExport(unittest.TestCase):
+    # Compare the exports of a school with a rota of a number of weeks
+    def compare(self, rota: int) -> Dict[str, int]:
+        with Harness(Firefly(school=School(rota=rota)), config={'cache': {'lessons': '43200'}}) as harness:
+            return exports.compare(harness, '2020-09-07', None, 4)
+
+    # Check the exports of a school with a rota of a number of weeks
+    def check(self, rota: int):
+        result: Dict[str, int] = self.compare(rota)
+
+        self.assertGreater(result['events'], 0)
+        # Before the holidays are known, sampling still finds every lesson in far fewer requests, though it fills
+        # short holidays between sampled weeks from the rota
+        self.assertEqual(result['missing'], 0)
+        self.assertLess(result['smart_requests'], result['full_requests'] * 2 // 3)
+        # Once they are, it matches the full export in far fewer requests
+        self.assertEqual(result['remembered_missing'], 0)
+        self.assertEqual(result['remembered_extra'], 0)
+        self.assertLess(result['remembered_smart_requests'], result['remembered_full_requests'] // 2)
+
+    # Test a timetable that's the same every week
+    def test_weekly_rota(self):
+        self.check(1)
+
+    # Test a timetable that repeats every fortnight
+    def test_fortnightly_rota(self):
+        self.check(2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import threading
+import unittest
+from typing import List
+from http import HTTPStatus
+from http.client import HTTPConnection, HTTPResponse
+from datetime import date as Date, datetime as DateTime, timezone as TimeZone
+from firefly import ical, Task, User, Lesson
+from firefly.feed import Feed, FeedServer
+
+# Create a task due on a date
+def task(id: int, title: str, due: Date, is_done: bool = False) -> Task:
+    return Task(id, title, [], User('smith', 'Mr Smith'), Date(2021, 3, 1), due, is_done)
+
+# Feed of the lessons held in a list, which tests change between refreshes
+class ListFeed(Feed):
+    # Create an instance
+    def __init__(self, lessons: List[Lesson]):
+        super().__init__(None, 'Lessons')
+        self.lessons: List[Lesson] = lessons
+
+    # Get the single block key
+    def keys(self) -> List[str]:
+        return ['lessons']
+
+    # Serialise the lessons
+    def serialise(self, keys: List[str]) -> List[str]:
+        return [ical.lesson_events(self.lessons)]
+
+# Serialising events as iCalendar
+class TestCalendar(unittest.TestCase):
+    # Test text values are escaped and long lines folded at 75 octets without splitting characters
+    def test_escape_and_fold(self):
+        self.assertEqual(ical.escape('a,b;c\\d\ne'), 'a\\,b\\;c\\\\d\\ne')
+
+        folded: str = ical.fold('SUMMARY:' + 'é' * 60)
+        lines: List[str] = folded.split(ical.CRLF)[:-1]
+
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'SUMMARY:' + 'é' * 60)
+
+    # Test an event is stamped in UTC, from its start, so it serialises the same every time
+    def test_stamp(self):
+        start: DateTime = DateTime(2021, 3, 1, 9, tzinfo=TimeZone.utc)
+        block: str = ical.event('uid', start, start, 'Maths')
+
+        self.assertIn('DTSTAMP:20210301T090000Z', block)
+        self.assertEqual(block, ical.event('uid', start, start, 'Maths'))
+
+    # Test tasks are all day events on their due dates, marked when they're done, and untitled tasks still have a summary
+    def test_task_events(self):
+        blocks: str = ical.task_events([
+            task(1, 'Essay', Date(2021, 3, 5), is_done=True),
+            task(2, None, Date(2021, 3, 6)),
+            task(3, 'No due date', None)
+        ])
+
+        self.assertEqual(blocks.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:✔️ Essay', blocks)
+        self.assertIn('DTSTART;VALUE=DATE:20210305', blocks)
+        self.assertIn('SUMMARY:Untitled task', blocks)
+
+# Serving feeds with conditional responses
+class TestFeedServer(unittest.TestCase):
+    # Serve a feed of a lesson
+    def setUp(self):
+        self.feed: ListFeed = ListFeed([Lesson(DateTime(2021, 3, 1, 9), DateTime(2021, 3, 1, 10), 'Maths')])
+        self.server: FeedServer = FeedServer('127.0.0.1', 0, {'/timetable.ics': self.feed}, 3600)
+        self.server.start_refreshing()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    # Stop the server
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Request a path, returning the response and its body
+    def get(self, path: str, etag: str = None) -> (HTTPResponse, bytes):
+        connection: HTTPConnection = HTTPConnection(*self.server.server_address)
+        connection.request('GET', path, headers={'If-None-Match': etag} if etag else {})
+        response: HTTPResponse = connection.getresponse()
+        body: bytes = response.read()
+        connection.close()
+
+        return response, body
+
+    # Test the feed is served with an ETag, and a request with it is answered with 304 until the feed changes
+    def test_conditional_get(self):
+        response, body = self.get('/timetable.ics')
+        etag: str = response.getheader('ETag')
+
+        self.assertEqual(response.status, HTTPStatus.OK)
+        self.assertIn(b'SUMMARY:Maths', body)
+
+        response, body = self.get('/timetable.ics', etag)
+
+        self.assertEqual(response.status, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(body, b'')
+        self.assertFalse(self.feed.refresh())
+
+        self.feed.lessons.append(Lesson(DateTime(2021, 3, 1, 10), DateTime(2021, 3, 1, 11), 'Physics'))
+        self.assertTrue(self.feed.refresh())
+
+        response, body = self.get('/timetable.ics', etag)
+
+        self.assertEqual(response.status, HTTPStatus.OK)
+        self.assertNotEqual(response.getheader('ETag'), etag)
+        self.assertIn(b'SUMMARY:Physics', body)
+
+    # Test an unknown path is not found
+    def test_not_found(self):
+        response, _ = self.get('/other.ics')
+
+        self.assertEqual(response.status, HTTPStatus.NOT_FOUND)
+
+if __name__ == '__main__':
+    unittest.main()
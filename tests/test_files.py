@@ -0,0 +1,100 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import List, Dict
+from requests import Session, Response
+from firefly import FireflyError
+from firefly.files import FileStore
+from bench.server import Firefly, serve, USERNAME, PASSWORD
+
+# Client that streams files from the simulated server, recording the responses
+class FakeClient():
+    # Create an instance, logging in to the server
+    def __init__(self, url: str):
+        self.url: str = url
+        self.session: Session = Session()
+        self.session.post(url + '/login/login.aspx', data={'username': USERNAME, 'password': PASSWORD})
+        self.responses: List[Response] = []
+
+    # Stream a file
+    def stream(self, url: str, headers: Dict[str, str] = None) -> Response:
+        self.responses.append(self.session.get(self.url + url, headers=headers, stream=True))
+        return self.responses[-1]
+
+# Downloading task files
+class TestFileStore(unittest.TestCase):
+    # Serve the simulated Firefly and create an empty store
+    def setUp(self):
+        self.app: Firefly = Firefly()
+        server = serve(self.app)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.client: FakeClient = FakeClient('http://%s:%d' % server.server_address)
+        self.addCleanup(self.client.session.close)
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.store: FileStore = FileStore(self.path)
+        # Largest file, so there's plenty to resume
+        self.resource_id: int = max(self.app.school.resources, key=lambda resource_id: self.app.school.resources[resource_id][1])
+        self.url: str = '/resource.aspx?id=%d' % self.resource_id
+        self.data: bytes = self.app.school.resource(self.resource_id)
+
+    # Delete the store
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Write the start of a download as if it was interrupted, with the validator it was sent with
+    def interrupt(self, size: int, validator: str):
+        partial_path: Path = self.store.partial_path(self.url)
+        partial_path.parent.mkdir(parents=True)
+        partial_path.write_bytes(self.data[:size])
+        partial_path.with_suffix('.etag').write_text(validator)
+
+    # Test a file is downloaded once, and stored by the digest of its contents
+    def test_download(self):
+        path: Path = self.store.fetch(self.client, self.url)
+
+        self.assertEqual(path.read_bytes(), self.data)
+        self.assertEqual(path.name, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(self.store.fetch(self.client, self.url), path)
+        self.assertEqual(len(self.client.responses), 1)
+
+    # Test the same file at two URLs is only stored once
+    def test_same_contents(self):
+        path: Path = self.store.fetch(self.client, self.url)
+
+        self.assertEqual(self.store.fetch(self.client, self.url + '&download=1'), path)
+        self.assertEqual([stored for stored in self.path.joinpath('objects').rglob('*') if stored.is_file()], [path])
+
+    # Test an interrupted download only retrieves the bytes it's missing
+    def test_resume(self):
+        self.interrupt(10000, '"%d-%d"' % (self.resource_id, len(self.data)))
+        path: Path = self.store.fetch(self.client, self.url)
+
+        self.assertEqual(self.client.responses[0].status_code, 206)
+        self.assertEqual(int(self.client.responses[0].headers['Content-Length']), len(self.data) - 10000)
+        self.assertEqual(path.read_bytes(), self.data)
+        self.assertFalse(self.store.partial_path(self.url).exists())
+
+    # Test an interrupted download of a file that has changed since is started again
+    def test_changed(self):
+        self.interrupt(10000, '"changed"')
+        path: Path = self.store.fetch(self.client, self.url)
+
+        self.assertEqual(self.client.responses[0].status_code, 200)
+        self.assertEqual(path.read_bytes(), self.data)
+
+    # Test a file that can't be downloaded is reported
+    def test_not_found(self):
+        with self.assertRaises(FireflyError):
+            self.store.fetch(self.client, '/resource.aspx?id=0')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import re
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Dict
+from datetime import date as Date, timedelta as TimeDelta
+from firefly import Client, Task, User, Class, DatePeriod, TaskFilter
+from firefly.accounts import SilentSpinner
+
+# Date the first task was set
+FIRST_SET: Date = Date(2021, 1, 4)
+
+# Create a task set a number of days after the first, to a class
+def task(id: int, title: str, class_name: str = '11X/Ma', set_after: int = 0) -> Task:
+    return Task(id, title, [Class('class-%d' % id, class_name)], User('smith', 'Mr Smith'), FIRST_SET + TimeDelta(days=set_after), FIRST_SET + TimeDelta(days=set_after + 7), False)
+
+# Client that serves the task listing from a list of tasks, recording the pages asked for
+class PagedClient(Client):
+    # Create an instance
+    def __init__(self, storage_path: Path, tasks: List[Task]):
+        super().__init__('http://127.0.0.1:9', 'user', 'password', storage_path, concurrency=2)
+        self.spinner = SilentSpinner()
+        self.tasks: List[Task] = tasks
+        self.pages: List[int] = []
+
+    # Get a page of tasks
+    def _fetch_tasks(self, params: Dict) -> (List[Task], int):
+        self.pages.append(params['page'])
+        start: int = params['page'] * params['pageSize']
+
+        return self.tasks[start:start + params['pageSize']], len(self.tasks)
+
+# Filters the task listing endpoint doesn't understand
+class TestTaskFilter(unittest.TestCase):
+    # Test only the filters the endpoint can't apply make a filter partial
+    def test_is_partial(self):
+        self.assertFalse(TaskFilter(due=DatePeriod(FIRST_SET)).is_partial())
+        self.assertTrue(TaskFilter(subjects=['Maths']).is_partial())
+        self.assertNotIn('subjects', TaskFilter(subjects=['Maths']).server_filters())
+
+    # Test tasks are matched by the date they were set
+    def test_set_period(self):
+        task_filter: TaskFilter = TaskFilter(set_period=DatePeriod(FIRST_SET + TimeDelta(days=1), FIRST_SET + TimeDelta(days=2)))
+
+        self.assertEqual([task_filter.matches(task(1, 'Essay', set_after=days)) for days in range(4)], [False, True, True, False])
+
+    # Test subjects are looked for in the title and the class names, ignoring case
+    def test_subjects(self):
+        task_filter: TaskFilter = TaskFilter(subjects=['MA', 'physics'])
+
+        self.assertTrue(task_filter.matches(task(1, 'Essay', '11X/Ma')))
+        self.assertTrue(task_filter.matches(task(2, 'Physics revision', '11X/En')))
+        self.assertFalse(task_filter.matches(task(3, 'Essay', '11X/En')))
+
+    # Test titles are searched with a pattern, and tasks without a title only match an empty one
+    def test_title(self):
+        self.assertTrue(TaskFilter(title=re.compile('revision', re.I)).matches(task(1, 'Physics Revision')))
+        self.assertFalse(TaskFilter(title=re.compile('revision')).matches(task(2, None)))
+        self.assertTrue(TaskFilter(title=re.compile('')).matches(task(3, None)))
+
+# Finding tasks with filters applied as the pages arrive
+class TestFindTasks(unittest.TestCase):
+    # Create a client serving ten pages of tasks, with a revision task on every third page
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.client: PagedClient = PagedClient(self.path, [
+            task(i, 'Revision %d' % i if i % 300 == 0 else 'Homework %d' % i) for i in range(1000)
+        ])
+
+    # Delete the storage
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test a filter the endpoint applies fetches the page asked for
+    def test_server_filter(self):
+        tasks, total_count = self.client.find_tasks(TaskFilter(), offset=2, limit=10)
+
+        self.assertEqual(([task.id for task in tasks], total_count), (list(range(20, 30)), 1000))
+        self.assertEqual(self.client.pages, [2])
+
+    # Test a partial filter stops fetching pages once the page of matches is full
+    def test_stops_early(self):
+        tasks, total_count = self.client.find_tasks(TaskFilter(title=re.compile('Revision')), limit=2)
+
+        self.assertEqual(([task.id for task in tasks], total_count), ([0, 300], None))
+        self.assertLess(len(self.client.pages), 10)
+
+    # Test the offset of a partial filter counts pages of matches
+    def test_offset(self):
+        tasks, _ = self.client.find_tasks(TaskFilter(title=re.compile('Revision')), offset=1, limit=2)
+
+        self.assertEqual([task.id for task in tasks], [600, 900])
+
+if __name__ == '__main__':
+    unittest.main()
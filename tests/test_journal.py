@@ -0,0 +1,98 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Dict, Tuple
+from types import SimpleNamespace
+from requests.exceptions import ConnectionError
+from firefly import TaskEventEnum, InputError, ServerError
+from firefly.journal import TaskJournal
+
+DONE: TaskEventEnum = TaskEventEnum.DONE
+UNDONE: TaskEventEnum = TaskEventEnum.UNDONE
+
+# Client that records the responses sent, raising the errors given for some tasks
+class FakeClient():
+    # Create an instance
+    def __init__(self, errors: Dict[int, Exception] = None):
+        self.errors: Dict[int, Exception] = errors or {}
+        self.sent: List[Tuple[int, TaskEventEnum]] = []
+        self.spinner: SimpleNamespace = SimpleNamespace(text=None)
+        self.concurrency: int = 2
+
+    # Send a response to a task
+    def respond_to_task(self, task_id: int, event_type: TaskEventEnum, strict: bool = True):
+        if task_id in self.errors:
+            raise self.errors[task_id]
+
+        self.sent.append((task_id, event_type))
+
+# The journal of responses to tasks
+class TestTaskJournal(unittest.TestCase):
+    # Create an empty journal
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.journal: TaskJournal = TaskJournal(self.path.joinpath('tasks.journal'))
+
+    # Delete the journal
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test only the last response to each task is pending, and responses that cancel out aren't pending at all
+    def test_collapse(self):
+        for task_id, event_type in [(1, DONE), (2, DONE), (1, UNDONE), (1, DONE), (3, UNDONE), (3, DONE), (2, UNDONE)]:
+            self.journal.append(task_id, event_type)
+
+        self.assertEqual(self.journal.pending(), {1: DONE})
+
+    # Test a flush sends the pending responses and empties the journal, without sending responses that cancel out
+    def test_flush(self):
+        self.journal.append(1, DONE)
+        self.journal.append(2, DONE)
+        self.journal.append(2, UNDONE)
+        client: FakeClient = FakeClient()
+
+        self.assertEqual(self.journal.flush(client), {})
+        self.assertEqual(client.sent, [(1, DONE)])
+        self.assertEqual(self.journal.pending(), {})
+
+    # Test responses that failed because Firefly couldn't be reached are kept, and the rest are recorded as failures
+    def test_retry(self):
+        for task_id in [1, 2, 3, 4]:
+            self.journal.append(task_id, DONE)
+
+        client: FakeClient = FakeClient({
+            1: ConnectionError('unreachable'),
+            2: ServerError('Firefly is down'),
+            3: InputError('Task 3 does not exist')
+        })
+        errors: Dict[int, Exception] = self.journal.flush(client)
+
+        self.assertEqual(set(errors), {1, 2, 3})
+        self.assertEqual(client.sent, [(4, DONE)])
+        self.assertEqual(self.journal.pending(), {1: DONE, 2: DONE})
+        self.assertEqual(self.journal.failures(), [{'task': 3, 'event': DONE.foreign_name, 'error': 'Task 3 does not exist'}])
+
+        self.journal.clear_failures()
+        self.assertEqual(self.journal.failures(), [])
+
+        client = FakeClient()
+        self.journal.flush(client)
+
+        self.assertEqual(sorted(client.sent), [(1, DONE), (2, DONE)])
+        self.assertEqual(self.journal.pending(), {})
+
+    # Test a line torn by a killed process is skipped
+    def test_torn_line(self):
+        self.journal.append(1, DONE)
+
+        with self.journal.path.open('a') as f:
+            f.write('{"task": 2, "ev')
+
+        self.assertEqual(self.journal.pending(), {1: DONE})
+
+if __name__ == '__main__':
+    unittest.main()
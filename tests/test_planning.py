@@ -0,0 +1,52 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import unittest
+from typing import Dict
+from datetime import date as Date
+from bench.harness import Harness, Report
+from firefly import DatePeriod, TimetablePeriod
+from firefly.planning import plan_timetable_requests
+
+# Monday of the week planned
+MONDAY: Date = Date(2021, 3, 1)
+
+# Planning the planner requests for a range of dates
+class TestPlanTimetableRequests(unittest.TestCase):
+    # Test a single day is fetched through the day endpoint
+    def test_single_day(self):
+        self.assertEqual(plan_timetable_requests(DatePeriod(Date(2021, 3, 3))), [(Date(2021, 3, 3), TimetablePeriod.DAY)])
+
+    # Test weeks touched on more than one day are fetched whole, from their Monday
+    def test_whole_weeks(self):
+        self.assertEqual(plan_timetable_requests(DatePeriod(MONDAY, Date(2021, 3, 14))), [
+            (MONDAY, TimetablePeriod.WEEK),
+            (Date(2021, 3, 8), TimetablePeriod.WEEK)
+        ])
+        self.assertEqual(plan_timetable_requests(DatePeriod(Date(2021, 3, 3), Date(2021, 3, 9))), [
+            (MONDAY, TimetablePeriod.WEEK),
+            (Date(2021, 3, 8), TimetablePeriod.WEEK)
+        ])
+
+    # Test weeks touched on a single day at the edges of the range are fetched a day at a time
+    def test_edge_days(self):
+        self.assertEqual(plan_timetable_requests(DatePeriod(Date(2021, 3, 7), Date(2021, 3, 15))), [
+            (Date(2021, 3, 7), TimetablePeriod.DAY),
+            (Date(2021, 3, 8), TimetablePeriod.WEEK),
+            (Date(2021, 3, 15), TimetablePeriod.DAY)
+        ])
+
+# Showing the timetable for a range of dates
+class TestTimetableRange(unittest.TestCase):
+    # Test a fortnight takes a planner request a week
+    def test_fortnight(self):
+        with Harness() as harness:
+            report: Report = harness.run(['timetable', '--from', '2021-03-01', '--until', '2021-03-14'], runs=1)
+
+        requests: Dict[str, int] = report.requests
+
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(sum(count for route, count in requests.items() if route.startswith('GET /planner')), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from contextlib import redirect_stderr
+from firefly.profiler import SamplingProfiler, profiling
+
+# Keep the CPU busy for a while
+def spin(seconds: float):
+    end: float = time.perf_counter() + seconds
+
+    while time.perf_counter() < end:
+        pass
+
+# CPU and memory profiling of a command
+class TestProfiler(unittest.TestCase):
+    # Create a directory for the profiles
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+
+    # Delete the profiles
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test the sampler records the stacks of other threads, outermost call first
+    def test_samples(self):
+        profiler: SamplingProfiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        spin(0.1)
+        profiler.stop()
+
+        stacks: List[str] = [line.rsplit(' ', 1)[0] for line in profiler.collapsed().splitlines()]
+
+        self.assertTrue(any(stack.startswith('MainThread;') and 'spin (test_profiler.py:' in stack for stack in stacks))
+        self.assertFalse(any(stack.startswith('profiler;') for stack in stacks))
+
+    # Test nothing is written unless profiling is enabled
+    def test_disabled(self):
+        with profiling(False, self.path):
+            spin(0.01)
+
+        self.assertEqual(list(self.path.iterdir()), [])
+
+    # Test a collapsed stack file and an allocation report are written
+    def test_enabled(self):
+        with redirect_stderr(io.StringIO()), profiling(True, self.path.joinpath('profiles'), name='timetable'):
+            data: List[bytes] = [bytes(1024) for _ in range(100)]
+            spin(0.05)
+
+        paths: List[Path] = sorted(self.path.joinpath('profiles').iterdir())
+
+        self.assertEqual([path.name.endswith(suffix) for path, suffix in zip(paths, ['.alloc.txt', '.folded'])], [True, True])
+        self.assertTrue(paths[0].name.startswith('timetable-'))
+        self.assertTrue(paths[0].read_text().startswith('Current '))
+        self.assertIn('test_profiler.py', paths[0].read_text())
+        self.assertEqual(len(data), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import List, Dict
+from firefly.scheduler import TokenBucket, AdaptiveLimit, Scheduler, MAX_RETRY_AFTER
+
+# Response with just a status and headers
+class FakeResponse():
+    # Create an instance
+    def __init__(self, status_code: int, headers: Dict[str, str] = None):
+        self.status_code: int = status_code
+        self.headers: Dict[str, str] = headers or {}
+        self.is_closed: bool = False
+
+    # Close the response
+    def close(self):
+        self.is_closed = True
+
+# Rate limit shared through a state file
+class TestTokenBucket(unittest.TestCase):
+    # Create a directory for the state
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+
+    # Delete the directory
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Time taking a number of tokens
+    def time_takes(self, bucket: TokenBucket, count: int) -> float:
+        start: float = time.perf_counter()
+
+        for _ in range(count):
+            bucket.take()
+
+        return time.perf_counter() - start
+
+    # Test a burst is taken at once, then tokens are taken at the rate, shared between every bucket on the file
+    def test_rate(self):
+        bucket: TokenBucket = TokenBucket(self.path.joinpath('rate'), rate=20, burst=3)
+        other: TokenBucket = TokenBucket(self.path.joinpath('rate'), rate=20, burst=3)
+
+        self.assertLess(self.time_takes(bucket, 3), 0.05)
+        self.assertGreaterEqual(self.time_takes(other, 2), 0.09)
+
+    # Test a pause holds off every bucket on the file, and values are shared through it
+    def test_pause(self):
+        bucket: TokenBucket = TokenBucket(self.path.joinpath('rate'), rate=100)
+        bucket.pause(0.2)
+        bucket.set('concurrency', 3)
+        other: TokenBucket = TokenBucket(self.path.joinpath('rate'), rate=100)
+
+        self.assertGreaterEqual(self.time_takes(other, 1), 0.15)
+        self.assertEqual(other.get('concurrency'), 3)
+
+# Concurrency adjusted to what the server copes with
+class TestAdaptiveLimit(unittest.TestCase):
+    # Test the limit grows by one a round trip while responses are as quick as usual, up to the maximum
+    def test_increase(self):
+        limit: AdaptiveLimit = AdaptiveLimit(4, 2)
+
+        for _ in range(2):
+            limit.acquire()
+
+        for _ in range(2):
+            limit.release('/planner', 0.01)
+
+        # 2 + 1/2 + 1/2.5
+        self.assertAlmostEqual(limit.limit, 2.9)
+
+        for _ in range(20):
+            limit.acquire()
+            limit.release('/planner', 0.01)
+
+        self.assertEqual(limit.limit, 4)
+
+    # Test the limit is halved when the server is overloaded and cut less when it slows down, once per round trip
+    def test_decrease(self):
+        limit: AdaptiveLimit = AdaptiveLimit(8)
+        limit.acquire()
+        limit.release('/planner', 0.01, is_overloaded=True)
+
+        self.assertEqual(limit.limit, 4)
+
+        limit.acquire()
+        limit.release('/planner', 0.01, is_overloaded=True)
+
+        self.assertEqual(limit.limit, 4)
+
+        limit = AdaptiveLimit(8)
+        limit.acquire()
+        limit.release('/planner', 0.01)
+        limit.acquire()
+        limit.release('/planner', 0.5)
+
+        self.assertEqual(limit.limit, 6)
+
+    # Test requests past the limit wait for a free slot
+    def test_acquire_waits(self):
+        limit: AdaptiveLimit = AdaptiveLimit(1)
+        limit.acquire()
+        acquired: threading.Event = threading.Event()
+        thread: threading.Thread = threading.Thread(target=lambda: (limit.acquire(), acquired.set()))
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.1))
+
+        limit.release('/planner', 0.01)
+
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+# Sending requests again when the server says it's overloaded
+class TestScheduler(unittest.TestCase):
+    # Create a scheduler
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.scheduler: Scheduler = Scheduler(self.path.joinpath('rate'), rate=100, concurrency=4)
+
+    # Delete the state
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Send a request answered with each of the responses in turn, returning the response and the number sent
+    def send(self, responses: List[FakeResponse]) -> (FakeResponse, int):
+        sent: List[FakeResponse] = []
+        send = lambda: sent.append(responses[len(sent)]) or sent[-1]
+
+        return self.scheduler.send('https://example.com/planner/week/2021-03-01', send), len(sent)
+
+    # Test a request is sent again after the server's Retry-After, and the concurrency is cut and shared
+    def test_retry_after(self):
+        overloaded: FakeResponse = FakeResponse(429, {'Retry-After': '0'})
+        response, sent = self.send([overloaded, FakeResponse(200)])
+
+        self.assertEqual((response.status_code, sent), (200, 2))
+        self.assertTrue(overloaded.is_closed)
+        self.assertEqual(int(self.scheduler.limit.limit), 2)
+        self.assertEqual(self.scheduler.bucket.get('concurrency'), 2)
+        self.assertEqual(Scheduler(self.path.joinpath('rate'), rate=100, concurrency=4).limit.limit, 2)
+
+    # Test a Retry-After longer than is worth waiting for gives up at once
+    def test_long_retry_after(self):
+        response, sent = self.send([FakeResponse(503, {'Retry-After': str(MAX_RETRY_AFTER + 1)}), FakeResponse(200)])
+
+        self.assertEqual((response.status_code, sent), (503, 1))
+
+    # Test other errors aren't sent again
+    def test_no_retry(self):
+        response, sent = self.send([FakeResponse(500), FakeResponse(200)])
+
+        self.assertEqual((response.status_code, sent), (500, 1))
+
+if __name__ == '__main__':
+    unittest.main()
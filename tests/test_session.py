@@ -0,0 +1,170 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import time
+import threading
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Dict, List
+from firefly.lock import FileLock
+from bench.harness import Harness, Report
+from bench.server import Firefly
+from firefly.session import SessionStore
+from requests.cookies import RequestsCookieJar as CookieJar
+
+# Create a cookie jar holding a session cookie, optionally expiring at a time
+def session_cookies(expires: float = None) -> CookieJar:
+    cookies: CookieJar = CookieJar()
+    cookies.set('ASP.NET_SessionId', 'abc', domain='example.com', expires=expires)
+
+    return cookies
+
+# Tracking how long the session will last
+class TestSessionExpiry(unittest.TestCase):
+    # Create a session store in an empty directory
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.store: SessionStore = SessionStore(self.path, lifetime=1200, margin=60)
+
+    # Delete the directory
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test there's no session until there are cookies and a successful response
+    def test_no_session(self):
+        self.assertIsNone(self.store.expires_at(session_cookies()))
+        self.assertTrue(self.store.is_expiring(session_cookies()))
+
+        self.store.last_success = time.time()
+
+        self.assertIsNone(self.store.expires_at(CookieJar()))
+
+    # Test the session expires a lifetime after the last success, or when its cookie does if that's sooner
+    def test_expires_at(self):
+        self.store.last_success = 1000.0
+
+        self.assertEqual(self.store.expires_at(session_cookies()), 2200.0)
+        self.assertEqual(self.store.expires_at(session_cookies(expires=1500)), 1500.0)
+
+    # Test the session is refreshed within the margin of its expiry, and the margin never swallows a short lifetime
+    def test_is_expiring(self):
+        self.store.last_success = time.time() - 1200 + 120
+
+        self.assertFalse(self.store.is_expiring(session_cookies()))
+
+        self.store.last_success = time.time() - 1200 + 30
+
+        self.assertTrue(self.store.is_expiring(session_cookies()))
+
+        self.store.lifetime = 40
+        self.store.last_success = time.time() - 20
+
+        self.assertFalse(self.store.is_expiring(session_cookies()))
+
+    # Test successes are only written to disk every touch interval
+    def test_touch(self):
+        cookies: CookieJar = session_cookies()
+        self.store.touch(cookies)
+        saved_at: float = self.store.last_success
+        self.store.touch(cookies)
+
+        reloaded: SessionStore = SessionStore(self.path)
+        reloaded.load(CookieJar())
+
+        self.assertEqual(reloaded.last_success, saved_at)
+        self.assertGreaterEqual(self.store.last_success, saved_at)
+
+    # Test the login form is remembered without the page to return to, and survives a reload
+    def test_login_form(self):
+        self.store.remember_login_form('https://example.com/login/login.aspx?prelogin=%2Fplanner&kr=Cloud', 'https://example.com/login')
+        self.store.start(session_cookies())
+
+        reloaded: SessionStore = SessionStore(self.path)
+        cookies: CookieJar = CookieJar()
+        reloaded.load(cookies)
+
+        self.assertEqual(reloaded.login_url, 'https://example.com/login/login.aspx?kr=Cloud')
+        self.assertEqual(reloaded.login_referer, 'https://example.com/login')
+        self.assertEqual(cookies.get('ASP.NET_SessionId'), 'abc')
+
+# Logging in again before Firefly forgets the session
+class TestEarlyLogin(unittest.TestCase):
+    # Test a run after the session has expired logs in first, rather than being redirected to the login page
+    def test_expired_session(self):
+        with Harness(Firefly(session_ttl=2), config={'firefly': {'session_lifetime': '2'}}) as harness:
+            self.assertEqual(harness.invoke(['timetable', '-d', '2021-03-01']), 0)
+            time.sleep(2.2)
+            self.assertEqual(harness.invoke(['timetable', '-d', '2021-03-01']), 0)
+
+            stats: Dict[str, int] = harness.server_stats()
+
+        self.assertEqual(sum(count for route, count in stats.items() if route.startswith('GET /planner')), 2)
+        self.assertEqual(sum(count for route, count in stats.items() if route.startswith('POST /login')), 2)
+
+# Logging in once between every thread and process that finds the session has gone
+class TestSingleFlightLogin(unittest.TestCase):
+    # Create a directory for the session
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+
+    # Delete the directory
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test the lock can be taken again by the thread holding it, but excludes other threads until it's released
+    def test_file_lock(self):
+        lock: FileLock = FileLock(self.path.joinpath('session.lock'))
+        order: List[str] = []
+
+        # Take the lock from another thread
+        def other():
+            with lock:
+                order.append('other')
+
+        with lock:
+            with lock:
+                thread: threading.Thread = threading.Thread(target=other)
+                thread.start()
+                time.sleep(0.1)
+                order.append('holder')
+
+        thread.join()
+
+        self.assertEqual(order, ['holder', 'other'])
+
+    # Test a login by another process is noticed and its session loaded, and an older session never overwrites it
+    def test_login_by_another_process(self):
+        store: SessionStore = SessionStore(self.path)
+        other: SessionStore = SessionStore(self.path)
+        cookies: CookieJar = CookieJar()
+        store.load(cookies)
+        logged_in_at: float = store.logged_in_at
+
+        self.assertFalse(store.has_logged_in_since(logged_in_at, cookies))
+
+        other.start(session_cookies())
+
+        self.assertTrue(store.has_logged_in_since(logged_in_at, cookies))
+        self.assertEqual(store.logged_in_at, other.logged_in_at)
+        self.assertEqual(cookies.get('ASP.NET_SessionId'), 'abc')
+
+        stale: SessionStore = SessionStore(self.path)
+        stale.logged_in_at = other.logged_in_at - 60
+        stale_cookies: CookieJar = CookieJar()
+        stale.save(stale_cookies)
+
+        self.assertEqual(stale.logged_in_at, other.logged_in_at)
+        self.assertEqual(stale_cookies.get('ASP.NET_SessionId'), 'abc')
+
+    # Test runs started together without a session log in once between them
+    def test_concurrent_runs(self):
+        with Harness() as harness:
+            report: Report = harness.run(['timetable', '-d', '2021-03-01'], runs=8, concurrency=8, warmup=0)
+
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(sum(count for route, count in report.requests.items() if route.startswith('POST /login')), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import date as Date, datetime as DateTime, timedelta as TimeDelta
+from firefly import Task, User, Class, Lesson, Teacher, DatePeriod
+from firefly.archive import Archive
+from firefly.stats import TaskColumns, TaskGroup, LessonColumns, LessonGroup
+from firefly.commands.tasks.task_stats import TaskStats
+
+TODAY: Date = Date(2021, 3, 1)
+
+# Create a task set by a teacher a week ago, due a number of days from today
+def task(id: int, setter: User, due_in: int, is_done: bool = False, addressees: List[Class] = None) -> Task:
+    return Task(id, 'Task %d' % id, addressees or [], setter, TODAY - TimeDelta(days=7), TODAY + TimeDelta(days=due_in), is_done)
+
+# Create a lesson on a day of the week from Monday the 1st, lasting a number of hours from 9am
+def lesson(day: int, hours: int, subject: str, teacher: str = None) -> Lesson:
+    start: DateTime = DateTime(2021, 3, 1 + day, 9)
+    return Lesson(start=start, end=start + TimeDelta(hours=hours), subject=subject, teacher=Teacher(teacher) if teacher else None, room=None)
+
+# Contact time totals over lessons
+class TestLessonStats(unittest.TestCase):
+    # Create the lessons of a week
+    def setUp(self):
+        self.lessons: List[Lesson] = [
+            lesson(0, 1, 'Maths', 'Mr Smith'),
+            lesson(1, 2, 'Physics', 'Ms Jones'),
+            lesson(2, 1, 'Maths', 'Mr Smith'),
+            lesson(2, 1, 'Break')
+        ]
+
+    # Test the contact time is totalled by subject, largest first, leaving out lessons that aren't contact time
+    def test_group(self):
+        groups: List[LessonGroup] = LessonColumns.empty().extend(self.lessons).group('subject', ['Break'])
+
+        self.assertEqual([(group.label, group.count, group.seconds, group.share) for group in groups], [
+            ('Maths', 2, 7200.0, 0.5),
+            ('Physics', 1, 7200.0, 0.5)
+        ])
+
+    # Test weekdays are listed in day order, and lessons without a value are grouped together
+    def test_group_by_weekday_and_teacher(self):
+        columns: LessonColumns = LessonColumns.empty().extend(self.lessons)
+
+        self.assertEqual([(group.label, group.count) for group in columns.group('weekday', [])], [('Monday', 1), ('Tuesday', 1), ('Wednesday', 2)])
+        self.assertEqual([(group.label, group.count) for group in columns.group('teacher', [])], [('Mr Smith', 2), ('Ms Jones', 1), (None, 1)])
+
+    # Test lessons copied out of the archive are grouped along with lessons retrieved since
+    def test_from_archive(self):
+        path: Path = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, path)
+        archive: Archive = Archive(path)
+        archive.append(DatePeriod(Date(2021, 3, 1), Date(2021, 3, 2)), self.lessons[:2])
+
+        with archive.view() as view:
+            columns: LessonColumns = LessonColumns.from_archive(view, DatePeriod(Date(2021, 3, 1), Date(2021, 3, 2)))
+
+        columns = columns.extend(self.lessons[2:])
+
+        self.assertEqual(len(columns), 4)
+        self.assertEqual([(group.label, group.count) for group in columns.group('subject', ['Break'])], [('Maths', 2), ('Physics', 1)])
+
+# Workload analytics over a task history
+class TestTaskStats(unittest.TestCase):
+    # Create the fixtures
+    def setUp(self):
+        self.smith: User = User('smith', 'Mr Smith')
+        self.jones: User = User('jones', 'Ms Jones')
+        self.maths: Class = Class('maths', '11X/Ma')
+
+    # Print the report on tasks
+    def report(self, tasks: List[Task]) -> str:
+        output: io.StringIO = io.StringIO()
+
+        with redirect_stdout(output):
+            TaskStats(ArgumentParser()).print_report(TaskColumns.from_tasks(tasks, TODAY))
+
+        return output.getvalue()
+
+    # Test tasks are grouped by setter and addressee, busiest first
+    def test_groups(self):
+        columns: TaskColumns = TaskColumns.from_tasks([
+            task(1, self.smith, -3, addressees=[self.maths]),
+            task(2, self.smith, -2, is_done=True, addressees=[self.maths]),
+            task(3, self.jones, 4)
+        ], TODAY)
+        setters: List[TaskGroup] = columns.by_setter()
+
+        self.assertEqual([(group.label, group.count, group.overdue, group.past_due) for group in setters], [('Mr Smith', 2, 1, 2), ('Ms Jones', 1, 0, 0)])
+        self.assertEqual([(group.label, group.count) for group in columns.by_addressee()], [('11X/Ma', 2)])
+        self.assertEqual(columns.total().overdue_rate, 0.5)
+
+    # Test tasks outside the due dates are left out, along with their addressees
+    def test_where(self):
+        columns: TaskColumns = TaskColumns.from_tasks([task(1, self.smith, -3, addressees=[self.maths]), task(2, self.jones, 4)], TODAY)
+        columns = columns.where(columns.due >= TODAY.toordinal())
+
+        self.assertEqual(len(columns), 1)
+        self.assertEqual(columns.by_addressee(), [])
+
+    # Test a history without any addressees, such as personal tasks, is reported without a class breakdown
+    def test_report_without_addressees(self):
+        report: str = self.report([task(1, self.smith, -3), task(2, self.jones, 4)])
+
+        self.assertIn('By setter', report)
+        self.assertNotIn('By class', report)
+
+if __name__ == '__main__':
+    unittest.main()
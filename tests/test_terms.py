@@ -0,0 +1,93 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from datetime import date as Date, timedelta as TimeDelta
+from firefly.terms import TermStore, find_year_end, year_horizon
+
+# First Monday of the school year
+FIRST_MONDAY: Date = Date(2020, 9, 7)
+
+# Weeks of the year, from the first, that are holidays
+HOLIDAYS: List[int] = [7, 15, 16, 22, 28, 29, 35]
+
+# Number of weeks in the year up to the start of the summer holiday
+WEEKS: int = 42
+
+# Get the Monday of a week of the school year
+def week(i: int) -> Date:
+    return FIRST_MONDAY + TimeDelta(weeks=i)
+
+# Finding the end of the school year
+class TestFindYearEnd(unittest.TestCase):
+    # Record the weeks checked
+    def setUp(self):
+        self.checked: List[Date] = []
+
+    # Determine if a week of the school year has lessons, recording that it was checked
+    def is_active(self, monday: Date) -> bool:
+        self.checked.append(monday)
+        i: int = (monday - FIRST_MONDAY).days // 7
+
+        return 0 <= i < WEEKS and i not in HOLIDAYS
+
+    # Test the last whole week of the school year is the last one ending by the end of August
+    def test_year_horizon(self):
+        self.assertEqual(year_horizon(FIRST_MONDAY), Date(2021, 8, 23))
+        self.assertEqual(year_horizon(Date(2021, 8, 23)), Date(2021, 8, 23))
+        self.assertEqual(year_horizon(Date(2021, 8, 30)), Date(2022, 8, 22))
+
+    # Test the end is found past the holidays in far fewer checks than there are weeks, none past the horizon
+    def test_year_end(self):
+        self.assertEqual(find_year_end(FIRST_MONDAY, 4, self.is_active), week(WEEKS - 1))
+        self.assertLess(len(set(self.checked)), WEEKS // 2)
+        self.assertLessEqual(max(self.checked), year_horizon(FIRST_MONDAY))
+
+    # Test the search can start part way through the year, or in a holiday
+    def test_later_start(self):
+        self.assertEqual(find_year_end(week(15), 4, self.is_active), week(WEEKS - 1))
+        self.assertEqual(find_year_end(week(WEEKS - 1), 4, self.is_active), week(WEEKS - 1))
+
+    # Test there's no end when the year has no lessons left
+    def test_no_lessons(self):
+        self.assertIsNone(find_year_end(week(WEEKS), 4, self.is_active))
+
+# Term boundaries learned from exports
+class TestTermStore(unittest.TestCase):
+    # Create an empty store
+    def setUp(self):
+        self.path: Path = Path(tempfile.mkdtemp())
+        self.store: TermStore = TermStore(self.path.joinpath('terms.json'))
+
+    # Delete the store
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Test weeks without lessons between weeks with them are learned as holidays, until they're seen to have lessons
+    def test_holidays(self):
+        self.store.learn({week(0): ['lesson'], week(1): [], week(2): ['lesson'], week(3): []})
+
+        self.assertEqual(self.store.holidays(), {week(1)})
+
+        self.store.learn({week(1): ['lesson'], week(7): [], week(8): ['lesson']})
+
+        self.assertEqual(self.store.holidays(), {week(7)})
+
+    # Test the end of a year is known for every week of it, and replaced when it's learned again
+    def test_year_end(self):
+        self.assertIsNone(self.store.year_end(FIRST_MONDAY))
+
+        self.store.learn({}, week(40))
+        self.store.learn({}, week(WEEKS - 1))
+        self.store.learn({}, week(WEEKS + 52))
+
+        self.assertEqual(self.store.year_end(FIRST_MONDAY), week(WEEKS - 1))
+        self.assertIsNone(self.store.year_end(week(WEEKS)))
+        self.assertEqual(self.store.year_end(week(60)), week(WEEKS + 52))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import unittest
+from configparser import ConfigParser
+from firefly import ConfigError
+from firefly.times import BellSchedule, DailyEvent
+from datetime import time as Time, datetime as DateTime
+
+# Parse a config file
+def parser(text: str) -> ConfigParser:
+    parser: ConfigParser = ConfigParser()
+    parser.read_string(text)
+
+    return parser
+
+# Get a time on Monday 1 March 2021, or on the following Friday
+def at(hour: int, minute: int = 0, friday: bool = False) -> DateTime:
+    return DateTime(2021, 3, 5 if friday else 1, hour, minute)
+
+# Splitting planner events at the bells
+class TestBellSchedule(unittest.TestCase):
+    # Create a schedule with a break every day and a shorter day on Fridays
+    def setUp(self):
+        self.bells: BellSchedule = BellSchedule.from_config(parser(
+            '[bells]\nbreak = 10:45-11:10\nlunch = 12:55-14:00\n[bells:friday]\nlunch = 12:00-12:30\n'
+        ))
+
+    # Test events that don't touch a bell are left whole
+    def test_no_bells(self):
+        self.assertEqual(self.bells.split(at(9), at(10)), [(at(9), at(10), None)])
+        self.assertEqual(self.bells.split(at(11, 10), at(12)), [(at(11, 10), at(12), None)])
+
+    # Test an event is split at every bell it overlaps, in order
+    def test_split(self):
+        self.assertEqual(self.bells.split(at(10), at(14, 30)), [
+            (at(10), at(10, 45), None),
+            (at(10, 45), at(11, 10), 'Break'),
+            (at(11, 10), at(12, 55), None),
+            (at(12, 55), at(14), 'Lunch'),
+            (at(14), at(14, 30), None)
+        ])
+        self.assertEqual(self.bells.split(at(11), at(12)), [(at(11), at(11, 10), 'Break'), (at(11, 10), at(12), None)])
+
+    # Test a weekday section replaces the bells on that day
+    def test_weekday(self):
+        self.assertEqual(self.bells.split(at(10, friday=True), at(13, friday=True)), [
+            (at(10, friday=True), at(12, friday=True), None),
+            (at(12, friday=True), at(12, 30, friday=True), 'Lunch'),
+            (at(12, 30, friday=True), at(13, friday=True), None)
+        ])
+        self.assertEqual(self.bells.labels, ['Break', 'Lunch'])
+
+    # Test the KGS bells are used when none are configured, and the fingerprint tells the schedules apart
+    def test_defaults(self):
+        defaults: BellSchedule = BellSchedule.from_config(parser(''))
+
+        self.assertEqual(defaults.labels, ['Break', 'Lunch'])
+        self.assertEqual(defaults.fingerprint, BellSchedule().fingerprint)
+        self.assertNotEqual(defaults.fingerprint, self.bells.fingerprint)
+        self.assertEqual(BellSchedule({}).split(at(9), at(15)), [(at(9), at(15), None)])
+
+    # Test bells that can't be read, end before they start or overlap are refused
+    def test_invalid(self):
+        for text in ['[bells]\nbreak = 10.45\n', '[bells]\nbreak = 25:00-26:00\n', '[bells]\nbreak = 11:10-10:45\n', '[bells]\nbreak = 10:45-11:10\nlunch = 11:00-12:00\n']:
+            with self.subTest(text=text), self.assertRaises(ConfigError):
+                BellSchedule.from_config(parser(text))
+
+        with self.assertRaises(ConfigError):
+            BellSchedule({'Break': DailyEvent(Time(11), Time(11))})
+
+if __name__ == '__main__':
+    unittest.main()
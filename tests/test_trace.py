@@ -0,0 +1,85 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Dict
+from contextlib import redirect_stderr
+from firefly import trace
+from firefly.trace import Tracer
+
+# Spans timing the work done by a command
+class TestTracer(unittest.TestCase):
+    # Test spans aren't created unless tracing is enabled
+    def test_disabled(self):
+        tracer: Tracer = Tracer()
+
+        with tracer.span('request') as span:
+            span.set(status=200)
+
+        self.assertFalse(span)
+        self.assertEqual(tracer.spans, [])
+
+    # Test spans nest under the span that was open when they started, and record errors
+    def test_nesting(self):
+        tracer: Tracer = Tracer()
+        tracer.enable()
+
+        with tracer.span('command'):
+            with tracer.span('request', method='GET') as request:
+                request.set(status=200)
+
+            with self.assertRaises(ValueError), tracer.span('parse.json', bytes=2048):
+                raise ValueError()
+
+        spans: List[Dict] = tracer.to_dicts()
+
+        self.assertEqual([(span['name'], span['depth']) for span in spans], [('command', 0), ('request', 1), ('parse.json', 1)])
+        self.assertEqual((spans[1]['method'], spans[1]['status']), ('GET', 200))
+        self.assertEqual(spans[2]['error'], 'ValueError')
+        self.assertGreaterEqual(spans[0]['duration_ms'], spans[1]['duration_ms'] + spans[2]['duration_ms'])
+
+        waterfall: str = tracer.waterfall()
+
+        self.assertEqual(len(waterfall.splitlines()), 3)
+        self.assertIn('bytes=2.0KB', waterfall)
+
+# Tracing a command from the command line options
+class TestTracing(unittest.TestCase):
+    # Replace the tracer singleton with a fresh one
+    def setUp(self):
+        self.tracer: Tracer = trace.tracer
+        trace.tracer = Tracer()
+        self.path: Path = Path(tempfile.mkdtemp())
+
+    # Restore the tracer singleton
+    def tearDown(self):
+        trace.tracer = self.tracer
+        shutil.rmtree(self.path)
+
+    # Test nothing is recorded unless a waterfall or JSON is asked for
+    def test_off(self):
+        with trace.tracing() as root:
+            self.assertFalse(trace.span('request'))
+
+        self.assertFalse(root)
+        self.assertEqual(trace.tracer.spans, [])
+
+    # Test the spans are printed as a waterfall and written as JSON
+    def test_on(self):
+        json_path: Path = self.path.joinpath('trace.json')
+        stderr: io.StringIO = io.StringIO()
+
+        with redirect_stderr(stderr), trace.tracing(waterfall=True, json_path=str(json_path), name='timetable'):
+            with trace.span('request'):
+                pass
+
+        self.assertIn('timetable', stderr.getvalue())
+        self.assertEqual([span['name'] for span in json.loads(json_path.read_text())], ['timetable', 'request'])
+
+if __name__ == '__main__':
+    unittest.main()
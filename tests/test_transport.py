@@ -0,0 +1,58 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import threading
+import unittest
+import importlib.util
+from requests import Session, Request, PreparedRequest, Response
+from bench.server import Firefly, serve, USERNAME, PASSWORD
+from firefly.transport import mount
+
+# HTTP/2 needs httpx, and serving it needs Hypercorn, both of which are optional
+HAS_HTTP2: bool = all(importlib.util.find_spec(name) for name in ['httpx', 'h2', 'hypercorn'])
+
+# Requests sent over HTTP/2 to the simulated Firefly
+@unittest.skipUnless(HAS_HTTP2, 'HTTP/2 needs `pip install httpx[http2] hypercorn`')
+class TestHTTP2Transport(unittest.TestCase):
+    # Serve the simulated Firefly over HTTP/2 and mount the transport on a session
+    def setUp(self):
+        self.app: Firefly = Firefly()
+        self.server = serve(self.app, server='hypercorn')
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url: str = 'http://%s:%d' % self.server.server_address
+        self.session: Session = Session()
+        mount(self.session, self.url, 'http2')
+
+    # Stop the server
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Test the session's cookies and redirects work as over HTTP/1.1
+    def test_login(self):
+        response: Response = self.session.post(self.url + '/login/login.aspx', data={'username': USERNAME, 'password': PASSWORD})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.url.endswith('/pupil-portal'))
+        self.assertEqual(len(response.history), 1)
+        self.assertIn('ff_globals.initialPageData', response.text)
+
+    # Test a response the adapter read whole is iterated from its content, as it is before the session touches it
+    # in a response hook, rather than from the raw response it was read from
+    def test_iter_content(self):
+        request: PreparedRequest = Request('GET', self.url + '/login/login.aspx').prepare()
+        response: Response = self.session.get_adapter(request.url).send(request, timeout=(5, 5))
+        body: bytes = b''.join(response.iter_content(16))
+
+        self.assertIn(b'ff-login-box', body)
+        self.assertEqual(body, response.content)
+
+    # Test a streamed response is read as it arrives
+    def test_stream(self):
+        response: Response = self.session.get(self.url + '/login/login.aspx', stream=True)
+
+        self.assertIn(b'ff-login-box', b''.join(response.iter_content(16)))
+
+if __name__ == '__main__':
+    unittest.main()
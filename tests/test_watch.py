@@ -0,0 +1,82 @@
+# Copyright Paul Adams, 2020. All rights reserved.
+# Unauthorized reproduction is prohibited.
+
+import io
+import sys
+import shlex
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Dict
+from argparse import ArgumentParser, Namespace as Arguments
+from contextlib import redirect_stdout
+from datetime import date as Date
+from firefly import Task, User
+from firefly.commands.tasks.watch_tasks import WatchTasks
+
+# Client that answers polls with a fixed to do list
+class FakeClient():
+    # Create an instance
+    def __init__(self, tasks: List[Task]):
+        self.tasks: List[Task] = tasks
+        self.limits: List[int] = []
+
+    # Get the soonest due tasks
+    def poll_tasks(self, validator: str = None, completion_status=None, limit: int = None) -> (List[Task], str):
+        self.limits.append(limit)
+        return self.tasks[:limit], None
+
+# Create a to do task
+def task(id: int, title: str = 'Essay') -> Task:
+    return Task(id, title, [], User('smith', 'Mr Smith'), Date(2021, 3, 1), Date(2021, 3, id), False)
+
+# Printing the changes between polls of the to do list
+class TestWatchTasks(unittest.TestCase):
+    # Create the command
+    def setUp(self):
+        self.command: WatchTasks = WatchTasks(ArgumentParser())
+
+    # Print the changes between the tasks last polled and the tasks polled now, returning the output
+    def changes(self, old: List[Task], new: List[Task], client: FakeClient = None, limit: int = 100, hook: str = None) -> str:
+        output: io.StringIO = io.StringIO()
+        digests = lambda tasks: {task.id: self.command.digest(task) for task in tasks}
+
+        with redirect_stdout(output):
+            self.command.print_changes(
+                Arguments(limit=limit, hook=hook), client or FakeClient(new), digests(old), digests(new), {task.id: task for task in new}
+            )
+
+        return output.getvalue()
+
+    # Test added, changed and completed tasks are printed, and unchanged ones aren't
+    def test_changes(self):
+        output: str = self.changes([task(1), task(2), task(3)], [task(1), task(2, 'Lab report'), task(4)])
+        lines: List[str] = output.splitlines()
+
+        self.assertEqual([line.split()[0] for line in lines], ['✏️', '🆕', '✔️'])
+        self.assertIn('Lab report', lines[0])
+
+    # Test a task pushed out of a full window by one due sooner is reported as having left it, not as completed
+    def test_pushed_out(self):
+        client: FakeClient = FakeClient([task(1), task(2), task(3)])
+        output: str = self.changes([task(2), task(3)], [task(1), task(2)], client, limit=2)
+
+        self.assertIn('⤵️', output)
+        self.assertNotIn('✔️', output)
+        self.assertEqual(client.limits, [3])
+
+    # Test a task without a title is printed and passed to the hook
+    def test_untitled_task(self):
+        path: Path = Path(tempfile.mkdtemp()).joinpath('hook')
+        hook: str = '%s -c %s' % (
+            shlex.quote(sys.executable),
+            shlex.quote('import os; open(%r, "w").write(os.environ["FF_CHANGE"] + ":" + os.environ["FF_TASK_TITLE"])' % str(path))
+        )
+
+        output: str = self.changes([], [task(1, None)], hook=hook)
+
+        self.assertIn('🆕', output)
+        self.assertEqual(path.read_text(), 'added:')
+
+if __name__ == '__main__':
+    unittest.main()